@@ -1,8 +1,13 @@
 import os
-import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from dotenv import load_dotenv
 from jobs import start_scheduler
+from src.dependencies.db import async_db_controller
+from src.dependencies.buffer import interaction_buffer
+from src.dependencies.log import configure_logging, log_request_timing
+from src.dependencies.metrics import record_request_metrics, register_route_prefix
+from src.dependencies.profiling import sampler
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.routes import (
@@ -11,6 +16,7 @@ from src.routes import (
     place_router,
     recommendation_router,
     default_router,
+    admin_router,
     api_key,
 )
 
@@ -19,15 +25,26 @@ from uvicorn.main import Server
 
 
 load_dotenv()
-logging.getLogger("app_logger")
-logging.basicConfig(
-    datefmt="%Y-%m-%d | %H:%M:%S |",
-    level=logging.DEBUG,
-    filename="app.log",
-    format="%(asctime)s | %(levelname)s | %(message)s",
-)
+log_listener = configure_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await async_db_controller.connect()
+    scheduler = start_scheduler()
+    try:
+        yield
+    finally:
+        scheduler.shutdown()
+        await async_db_controller.close_connection()
+        if interaction_buffer is not None:
+            interaction_buffer.close()
+        sampler.stop()
+        # Last, so records logged by the other shutdown handlers are written too.
+        log_listener.stop()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 config = Config(app, loop="asyncio", timeout_keep_alive=600)
 server = Server(config=config)
@@ -41,16 +58,19 @@ app.add_middleware(
 )
 
 app.middleware("http")(api_key.api_key_middleware)
+app.middleware("http")(log_request_timing)
+app.middleware("http")(record_request_metrics)
 
-app.include_router(default_router.router, tags=["default"])
-app.include_router(user_router.router, prefix="/user", tags=["user"])
-app.include_router(place_router.router, prefix="/place", tags=["place"])
-app.include_router(label_router.router, prefix="/label", tags=["label"])
-app.include_router(
-    recommendation_router.router, prefix="/recommendation", tags=["recommendation"]
-)
-
-start_scheduler(app)
+for module, prefix, tag in (
+    (default_router, "", "default"),
+    (user_router, "/user", "user"),
+    (place_router, "/place", "place"),
+    (label_router, "/label", "label"),
+    (recommendation_router, "/recommendation", "recommendation"),
+    (admin_router, "/admin", "admin"),
+):
+    app.include_router(module.router, prefix=prefix, tags=[tag])
+    register_route_prefix(module.router, prefix)
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,31 +1,82 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from src.dependencies.db import get_db_controller
-from src.models.custom_recommendation_model import CustomRecommendationModel
-from fastapi import FastAPI
+from src.dependencies.model import RecommendationModelSingleton
 from datetime import datetime
 import logging
+import os
 
 logger = logging.getLogger("app_logger")
 
 
-def get_all_users_recommendation():
+def _get_model():
+    db_controller = next(get_db_controller())
+    return RecommendationModelSingleton.get_instance(db_controller=db_controller)
+
+
+def load_model():
+    """
+    Build the model at startup instead of on the first request. It loads the
+    saved neighbor index; only when there is none is one built right away.
+    """
+    recommendation_model = _get_model()
+    if recommendation_model.neighbor_index is None:
+        recommendation_model.refresh_neighbor_index()
+
+
+def refresh_neighbor_index():
     logger.info(f"Job executed at: {datetime.now()}")
+    _get_model().refresh_neighbor_index()
+
+
+def refresh_users():
+    # Only a model that is already serving has anything to refresh.
+    recommendation_model = RecommendationModelSingleton._instance
+    if recommendation_model is not None:
+        recommendation_model.refresh_users()
+
+
+def reconcile_users():
+    recommendation_model = RecommendationModelSingleton._instance
+    if recommendation_model is not None:
+        recommendation_model.reconcile_users()
 
-    db_controller = next(get_db_controller())
-    try:
-        recommendation_model = CustomRecommendationModel(db_controller=db_controller)
-        recommendation_model.clear_cache()
-        recommendation_model.recommend_all_users()
-    finally:
-        del recommendation_model
 
+def refresh_popularity():
+    recommendation_model = RecommendationModelSingleton._instance
+    if recommendation_model is not None:
+        recommendation_model.refresh_popularity()
 
-def start_scheduler(app: FastAPI):
+
+def start_scheduler() -> BackgroundScheduler:
     scheduler = BackgroundScheduler()
+    scheduler.add_job(load_model)
+    # First rebuild one interval after startup: the saved index is loaded.
+    scheduler.add_job(
+        refresh_neighbor_index,
+        "interval",
+        hours=float(os.environ.get("NEIGHBOR_INDEX_REFRESH_HOURS", 4)),
+    )
+    scheduler.add_job(
+        refresh_users,
+        "interval",
+        seconds=int(os.environ.get("USER_REFRESH_SECONDS", 5)),
+        max_instances=1,
+        coalesce=True,
+    )
+    # Full scan, only a safety net: refresh_users reads the change log.
+    scheduler.add_job(
+        reconcile_users,
+        "interval",
+        hours=float(os.environ.get("USER_RECONCILE_HOURS", 24)),
+        max_instances=1,
+        coalesce=True,
+    )
     scheduler.add_job(
-        get_all_users_recommendation,
+        refresh_popularity,
         "interval",
-        hours=4,
-        next_run_time=datetime.now(),
+        seconds=int(os.environ.get("POPULARITY_REFRESH_SECONDS", 600)),
+        max_instances=1,
+        coalesce=True,
     )
-    # scheduler.start()
+    scheduler.start()
+    return scheduler
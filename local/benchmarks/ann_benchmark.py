@@ -0,0 +1,127 @@
+"""
+Recall@k and latency of the LSH neighbor search against the exact path.
+
+Synthetic users belong to taste communities: most of their places and tags
+come from their community's pool, the rest from anywhere, so true neighbors
+exist and are worth finding. Each (tables, bits, probes) setting is scored
+on the same sample of query users.
+
+    python -m local.benchmarks.ann_benchmark
+    python -m local.benchmarks.ann_benchmark --users 100000 --settings 16x8x3 32x8x4
+"""
+
+import time
+import random
+import argparse
+import numpy as np
+from src.types.basic_types import User, Metrics, FavoritePlaces
+from src.models.similarity_engine import SimilarityEngine, UserFeatureMatrix
+from src.models.ann_index import LSHIndex, recall_at_k
+
+
+def generate_users(
+    n_users: int, n_places: int, n_communities: int, seed: int, n_tags: int = 50
+):
+    rng = random.Random(seed)
+    genres = ["Rock", "Pop", "Jazz", "Metal", "Funk", "Samba"]
+    pools = [
+        (
+            [f"place-{rng.randrange(n_places)}" for _ in range(40)],
+            [f"tag-{rng.randrange(n_tags)}" for _ in range(4)],
+        )
+        for _ in range(n_communities)
+    ]
+    for i in range(n_users):
+        user_id = f"{i:08d}-user"
+        places, tags = pools[rng.randrange(n_communities)]
+
+        def place():
+            if rng.random() < 0.8:
+                return rng.choice(places)
+            return f"place-{rng.randrange(n_places)}"
+
+        yield User(
+            user_id=user_id,
+            name=f"User {i}",
+            age=rng.randint(15, 70),
+            gender=rng.choice("MF"),
+            music_genre=rng.choice(genres),
+            metrics=[
+                Metrics(
+                    place_id=place(),
+                    user_id=user_id,
+                    interactions=rng.randint(1, 10),
+                    interest=rng.choice(tags),
+                )
+                for _ in range(rng.randint(1, 15))
+            ],
+            favorite_places=[
+                FavoritePlaces(user_id=user_id, place_id=place())
+                for _ in range(rng.randint(0, 4))
+            ],
+        )
+
+
+def mean_latency_ms(search, users) -> float:
+    started = time.perf_counter()
+    for user in users:
+        search(user)
+    return (time.perf_counter() - started) / len(users) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--places", type=int, default=5_000)
+    parser.add_argument("--communities", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--min-similarity", type=float, default=0.1)
+    parser.add_argument(
+        "--settings",
+        nargs="+",
+        default=["8x6x2", "16x6x3", "16x8x3", "24x8x4"],
+        help="tables x bits x probes",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = SimilarityEngine(
+        UserFeatureMatrix(
+            generate_users(args.users, args.places, args.communities, args.seed)
+        )
+    )
+    features = engine.features
+    rows = np.random.default_rng(args.seed).choice(
+        features.n_users, size=min(args.queries, features.n_users), replace=False
+    )
+    # Views carry everything `encode` reads from a User.
+    from src.models.user_store import UserStore
+
+    queries = [UserStore(features).view(row) for row in rows]
+
+    exact_ms = mean_latency_ms(
+        lambda user: engine.top_k(user, args.k, args.min_similarity), queries
+    )
+    print(f"{args.users} users, k={args.k}")
+    print(f"{'exact':>10}: {exact_ms:7.2f} ms/query")
+
+    for setting in args.settings:
+        n_tables, n_bits, probes = (int(value) for value in setting.split("x"))
+        started = time.perf_counter()
+        index = LSHIndex.build(features, n_tables, n_bits, probes, seed=args.seed)
+        build_s = time.perf_counter() - started
+
+        ann_ms = mean_latency_ms(
+            lambda user: index.top_k(engine, user, args.k, args.min_similarity),
+            queries,
+        )
+        candidates = np.mean(
+            [len(index.candidates(features.encode([user]))) for user in queries]
+        )
+        recall = recall_at_k(engine, index, queries, args.k, args.min_similarity)
+        print(
+            f"{setting:>10}: {ann_ms:7.2f} ms/query, recall@{args.k} {recall:.3f}, "
+            f"{candidates:.0f} candidates, {exact_ms / ann_ms:.1f}x, "
+            f"built in {build_s:.2f}s"
+        )
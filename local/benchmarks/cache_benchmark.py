@@ -0,0 +1,73 @@
+"""
+Compare CacheWithTTL against LRUCacheWithTTL.
+
+Simulates a stream of users where most requests hit a small hot set and the
+rest keep introducing new keys, as in production, and reports throughput,
+the cost of keys() and how many entries each cache ends up holding.
+
+    python -m local.benchmarks.cache_benchmark
+"""
+
+import time
+import random
+import argparse
+import threading
+from src.controllers.cache import CacheWithTTL, LRUCacheWithTTL
+
+
+def workload(n_operations: int, hot_keys: int, seed: int):
+    rng = random.Random(seed)
+    new_key = hot_keys
+    for _ in range(n_operations):
+        if rng.random() < 0.8:
+            yield f"user-{rng.randrange(hot_keys)}"
+        else:
+            new_key += 1
+            yield f"user-{new_key}"
+
+
+def run(cache, n_operations: int, hot_keys: int, threads: int, seed: int):
+    value = list(range(50))
+
+    def worker(offset: int):
+        for key in workload(n_operations // threads, hot_keys, seed + offset):
+            if cache.get(key) is None:
+                cache[key] = value
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    keys_started = time.perf_counter()
+    for _ in range(100):
+        cache.keys()
+    keys_elapsed = (time.perf_counter() - keys_started) / 100
+
+    return {
+        "operations_per_second": round(n_operations / elapsed),
+        "keys_ms": round(keys_elapsed * 1000, 3),
+        "entries": len(cache.cache) if hasattr(cache, "cache") else len(cache),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--operations", type=int, default=400_000)
+    parser.add_argument("--hot-keys", type=int, default=2_000)
+    parser.add_argument("--max-entries", type=int, default=10_000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    caches = {
+        "CacheWithTTL": CacheWithTTL(ttl=300),
+        "LRUCacheWithTTL": LRUCacheWithTTL(ttl=300, max_entries=args.max_entries),
+    }
+    for name, cache in caches.items():
+        result = run(cache, args.operations, args.hot_keys, args.threads, args.seed)
+        print(f"{name:>16}: {result}")
+    print(f"{'stats':>16}: {caches['LRUCacheWithTTL'].stats()}")
@@ -0,0 +1,103 @@
+"""
+Exact top-k from the shared-item candidates against scoring every user, and
+patching the inverted indexes on upsert against rebuilding them.
+
+Uses the community-structured users of ann_benchmark. Tags are what makes
+candidate sets large, so --tags controls how sparse the graph is.
+
+    python -m local.benchmarks.candidate_benchmark
+    python -m local.benchmarks.candidate_benchmark --users 200000 --tags 2000
+"""
+
+import time
+import argparse
+import numpy as np
+from local.benchmarks.ann_benchmark import generate_users
+from src.models.similarity_engine import (
+    SimilarityEngine,
+    UserFeatureMatrix,
+    select_top_k,
+)
+from src.models.user_store import UserStore
+
+
+def full_scan_top_k(engine: SimilarityEngine, user, k: int, min_similarity: float):
+    """`SimilarityEngine.top_k` as it was: every user scored."""
+    scores = engine.score(engine.features.encode([user]))[0]
+    scores[~engine.features.active] = -np.inf
+    own_row = engine.features.row_by_user_id.get(user.user_id)
+    if own_row is not None:
+        scores[own_row] = -np.inf
+    return select_top_k(scores, k, min_similarity)
+
+
+def mean_ms(fn, items) -> float:
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - started) / len(items) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--places", type=int, default=20_000)
+    parser.add_argument("--communities", type=int, default=500)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--upserts", type=int, default=100)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = SimilarityEngine(
+        UserFeatureMatrix(
+            generate_users(
+                args.users, args.places, args.communities, args.seed, args.tags
+            )
+        )
+    )
+    features = engine.features
+    store = UserStore(features)
+    rows = np.random.default_rng(args.seed).choice(
+        features.n_users, size=min(args.queries, features.n_users), replace=False
+    )
+    queries = [store.view(row) for row in rows]
+
+    candidate_counts = []
+    for user in queries:
+        candidates = engine.candidates(
+            features.encode([user]), args.k, features.row_by_user_id[user.user_id]
+        )
+        candidate_counts.append(
+            features.n_users if candidates is None else len(candidates)
+        )
+        exact = full_scan_top_k(engine, user, args.k, 0.1)
+        found = engine.top_k(user, args.k, 0.1)
+        assert np.array_equal(exact[0], found[0]), user.user_id
+
+    full_ms = mean_ms(lambda user: full_scan_top_k(engine, user, args.k, 0.1), queries)
+    candidate_ms = mean_ms(lambda user: engine.top_k(user, args.k, 0.1), queries)
+    print(f"{args.users} users, k={args.k}, same neighbors on every query")
+    print(f"{'full scan':>18}: {full_ms:7.2f} ms/query")
+    print(
+        f"{'candidates':>18}: {candidate_ms:7.2f} ms/query, "
+        f"{np.mean(candidate_counts):.0f} scored on average "
+        f"({np.mean(candidate_counts) / features.n_users:.1%}), "
+        f"{full_ms / candidate_ms:.1f}x"
+    )
+
+    changed = [
+        store.view(row).to_user()
+        for row in np.random.default_rng(args.seed + 1).choice(
+            features.n_users, size=args.upserts, replace=False
+        )
+    ]
+    started = time.perf_counter()
+    SimilarityEngine(features.upserted(changed))
+    rebuild_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    engine.upserted(changed)
+    patch_ms = (time.perf_counter() - started) * 1000
+    print(f"{'upsert, rebuild':>18}: {rebuild_ms:7.1f} ms for {args.upserts} users")
+    print(f"{'upsert, patch':>18}: {patch_ms:7.1f} ms for {args.upserts} users")
@@ -0,0 +1,170 @@
+"""
+Cold-start time to first recommendation, eager versus lazy loading
+(RECOMMENDATION_LOAD_MODE), on a synthetic dataset held in a
+`MemoryController`.
+
+Each run builds a fresh model and times its construction plus the first
+`recommend`. Lazy runs also time more first-time users (cold: their
+neighborhood is loaded) and repeat users (warm: already hot). The lazy runs
+go without a neighbor index, then with one built beforehand, as it would be
+by an eager instance. Exits with status 1 when a lazy first recommendation
+exceeds --target-ms.
+
+    python -m local.benchmarks.cold_start_benchmark
+    python -m local.benchmarks.cold_start_benchmark --users 100000 \\
+        --target-ms 500 --output cold-start-100k.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import platform
+import tempfile
+import numpy as np
+from datetime import datetime, timezone
+from local.benchmarks.synthetic import SyntheticConfig, build_repository
+from local.benchmarks.recommendation_benchmark import (
+    current_commit,
+    latency_stats,
+    timed,
+)
+from src.models.custom_recommendation_model import CustomRecommendationModel
+
+
+def first_recommendation(repository, load_mode: str, user_ids, args) -> dict:
+    model, init_s = timed(CustomRecommendationModel, repository, load_mode=load_mode)
+    first, first_s = timed(
+        model.recommend,
+        user_ids[0],
+        items_per_page=args.items_per_page,
+        k_neighboors=args.k,
+    )
+    result = {
+        "init_s": init_s,
+        "first_recommend_s": first_s,
+        "time_to_first_s": init_s + first_s,
+        "first_page": [place.place_id for place in first],
+    }
+    print(
+        f"{load_mode:>5} {'init':>6}: {init_s * 1000:9.1f} ms, first recommend "
+        f"{first_s * 1000:8.1f} ms, total {(init_s + first_s) * 1000:9.1f} ms"
+    )
+    if load_mode != "lazy":
+        return result
+
+    cold = [
+        timed(
+            model.recommend,
+            user_id,
+            items_per_page=args.items_per_page,
+            k_neighboors=args.k,
+        )[1]
+        for user_id in user_ids[1:]
+    ]
+    model.clear_cache()
+    warm = [
+        timed(
+            model.recommend,
+            user_id,
+            items_per_page=args.items_per_page,
+            k_neighboors=args.k,
+        )[1]
+        for user_id in user_ids[1:]
+    ]
+    result["cold"] = latency_stats(cold)
+    result["warm"] = latency_stats(warm)
+    result["loaded_users"] = len(model.user_store)
+    for name in ("cold", "warm"):
+        stats = result[name]
+        print(
+            f"{'':>5} {name:>6}: p50 {stats['p50_ms']:7.2f} ms, "
+            f"p99 {stats['p99_ms']:7.2f} ms"
+        )
+    return result
+
+
+def run(args) -> dict:
+    config = SyntheticConfig(
+        n_users=args.users, n_places=args.places, n_tags=args.tags, seed=args.seed
+    )
+    repository, generate_s = timed(build_repository, config)
+    print(f"{args.users} users, {config.places} places generated in {generate_s:.2f}s")
+
+    rng = np.random.default_rng(args.seed)
+    all_user_ids = repository.get_user_ids()
+    user_ids = [
+        all_user_ids[i]
+        for i in rng.choice(
+            len(all_user_ids), size=min(args.queries, len(all_user_ids)), replace=False
+        )
+    ]
+
+    results = {}
+    if not args.no_eager:
+        results["eager"] = first_recommendation(repository, "eager", user_ids, args)
+    results["lazy"] = first_recommendation(repository, "lazy", user_ids, args)
+
+    # What an eager instance leaves on disk for lazy ones to read.
+    indexer = CustomRecommendationModel(repository, load_mode="eager")
+    indexer.refresh_neighbor_index()
+    del indexer
+    print("with a neighbor index:")
+    results["lazy_indexed"] = first_recommendation(repository, "lazy", user_ids, args)
+
+    return {
+        "commit": current_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cpus": os.cpu_count(),
+        "config": vars(args),
+        "dataset": {
+            "users": args.users,
+            "places": config.places,
+            "generate_s": generate_s,
+        },
+        "timings": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--places", type=int, default=None)
+    parser.add_argument("--tags", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--items-per-page", type=int, default=10)
+    parser.add_argument("-k", type=int, default=7)
+    parser.add_argument("--no-eager", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--target-ms",
+        type=float,
+        default=500,
+        help="fail when a lazy time to first recommendation exceeds this",
+    )
+    parser.add_argument("--output", help="write the results as JSON here")
+    args = parser.parse_args()
+
+    os.environ["NEIGHBOR_INDEX_PATH"] = os.path.join(
+        tempfile.mkdtemp(prefix="cold-start-benchmark-"), "neighbor_index.npz"
+    )
+    os.environ["SIMILARITY_MODE"] = "exact"
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+    slowest = max(
+        results["timings"][name]["time_to_first_s"] for name in ("lazy", "lazy_indexed")
+    )
+    if slowest * 1000 > args.target_ms:
+        print(
+            f"Lazy time to first recommendation {slowest * 1000:.1f} ms "
+            f"exceeds the {args.target_ms:g} ms target",
+            file=sys.stderr,
+        )
+        sys.exit(1)
@@ -0,0 +1,107 @@
+"""
+Load benchmark for PostgressController against a local Postgres stand-in.
+
+Seeds a throwaway schema with places and likes, then runs concurrent
+readers through a controller limited to a single connection and through a
+pooled one, printing throughput and latency percentiles for each.
+
+    docker run --rm -e POSTGRES_PASSWORD=moody -p 5432:5432 postgres:16
+    DB_USER=postgres DB_PASSWORD=moody DB_HOST=localhost DB_PORT=5432 \\
+        DB_NAME=postgres python -m local.benchmarks.db_pool_benchmark
+"""
+
+import os
+import time
+import random
+import argparse
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCHEMA = "moody_bench"
+# libpq reads PGOPTIONS, so every pooled connection lands on the bench schema.
+os.environ["PGOPTIONS"] = f"-c search_path={SCHEMA}"
+
+from src.controllers.moodydb import PostgressController  # noqa: E402
+
+
+def seed(controller: PostgressController, n_places: int, n_likes: int):
+    controller._execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    controller._execute(f"CREATE SCHEMA {SCHEMA}")
+    controller._execute("""
+        CREATE TABLE locals (
+            id TEXT PRIMARY KEY, slug TEXT, name TEXT,
+            rating REAL, price_level INTEGER
+        )
+        """)
+    controller._execute("CREATE TABLE locals_likes (local_id TEXT, user_id TEXT)")
+    controller._execute("CREATE INDEX ON locals_likes (local_id)")
+    controller._execute(
+        """
+        INSERT INTO locals
+        SELECT g::text, 'place-' || g, 'Place ' || g, random() * 5, 1
+        FROM generate_series(1, %s) g
+        """,
+        (n_places,),
+    )
+    controller._execute(
+        """
+        INSERT INTO locals_likes
+        SELECT (1 + floor(random() * %s))::int::text, 'user-' || g
+        FROM generate_series(1, %s) g
+        """,
+        (n_places, n_likes),
+    )
+
+
+def run(controller: PostgressController, threads: int, requests: int, n_places: int):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        rng = random.Random()
+        local = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            if rng.random() < 0.5:
+                controller.get_place_by_id(str(rng.randint(1, n_places)))
+            else:
+                controller.get_top_places(start=rng.randint(0, 50), limit=10)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--places", type=int, default=5_000)
+    parser.add_argument("--likes", type=int, default=100_000)
+    args = parser.parse_args()
+
+    single = PostgressController(min_connections=1, max_connections=1)
+    seed(single, args.places, args.likes)
+    pooled = PostgressController(min_connections=4, max_connections=args.threads)
+
+    for name, controller in (("single connection", single), ("pooled", pooled)):
+        result = run(controller, args.threads, args.requests, args.places)
+        print(f"{name:>17}: {result}")
+        controller.close_connection()
@@ -0,0 +1,203 @@
+"""
+Write throughput of the ingest paths.
+
+SQLite (always run, on a temporary file): the old read-modify-write
+interaction (read the user's metrics, delete them, reinsert them all, each
+statement autocommitted) against `interact` (one upsert) and `interact_many`
+(batched transactions), plus `create_users` against row-at-a-time inserts.
+
+Postgres (with --postgres, same setup as db_pool_benchmark): `interact` per
+row against the COPY-based `interact_many` and `create_users`.
+
+    python -m local.benchmarks.ingest_benchmark
+    DB_USER=postgres DB_PASSWORD=moody DB_HOST=localhost DB_PORT=5432 \\
+        DB_NAME=postgres python -m local.benchmarks.ingest_benchmark --postgres
+"""
+
+import os
+import time
+import random
+import argparse
+import tempfile
+from src.types.basic_types import User, Interaction
+
+SCHEMA = "moody_bench"
+
+
+def make_users(n_users: int, seed: int):
+    rng = random.Random(seed)
+    return [
+        User(
+            user_id=f"user-{i}",
+            name=f"User {i}",
+            age=rng.randint(15, 70),
+            gender=rng.choice("MF"),
+            music_genre=rng.choice(["Rock", "Pop", "Jazz"]),
+            metrics=[],
+            favorite_places=[],
+        )
+        for i in range(n_users)
+    ]
+
+
+def make_interactions(n: int, n_users: int, n_places: int, seed: int):
+    rng = random.Random(seed)
+    return [
+        Interaction(
+            user_id=f"user-{rng.randrange(n_users)}",
+            place_id=f"{1 + rng.randrange(n_places)}",
+            interactions=rng.randint(1, 3),
+        )
+        for _ in range(n)
+    ]
+
+
+def timed(label: str, n: int, fn):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:>34}: {n / elapsed:>10.0f} rows/s ({elapsed:.2f}s)")
+
+
+def legacy_interact(conn, interaction: Interaction):
+    """What `SqliteController.interact` used to do, minus the pydantic models."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM usuarios WHERE user_id = ?", (interaction.user_id,))
+    if cursor.fetchone() is None:
+        return
+    cursor.execute("SELECT * FROM metrics WHERE user_id = ?", (interaction.user_id,))
+    metrics = {row[1]: row[2] for row in cursor.fetchall()}
+    metrics[interaction.place_id] = (
+        metrics.get(interaction.place_id, 0) + interaction.interactions
+    )
+    cursor.execute("DELETE FROM metrics WHERE user_id = ?", (interaction.user_id,))
+    for place_id, interactions in metrics.items():
+        cursor.execute(
+            "INSERT OR REPLACE INTO metrics (user_id, place_id, interactions) VALUES (?, ?, ?)",
+            (interaction.user_id, place_id, interactions),
+        )
+
+
+def bench_sqlite(args):
+    from src.controllers.sqldb import SqliteController
+
+    users = make_users(args.users, args.seed)
+    interactions = make_interactions(
+        args.interactions, args.users, args.places, args.seed
+    )
+    legacy_n = min(len(interactions), args.legacy_limit)
+
+    with tempfile.TemporaryDirectory() as directory:
+        rowwise = SqliteController(os.path.join(directory, "rowwise.db"))
+
+        def insert_rowwise():
+            cursor = rowwise.conn.cursor()
+            for user in users:
+                cursor.execute(
+                    "INSERT OR IGNORE INTO usuarios (user_id, age, music_genre, perfil) VALUES (?, ?, ?, ?)",
+                    (user.user_id, user.age, user.music_genre, user.perfil),
+                )
+
+        timed("sqlite users, row at a time", len(users), insert_rowwise)
+        timed(
+            "sqlite legacy interact",
+            legacy_n,
+            lambda: [legacy_interact(rowwise.conn, i) for i in interactions[:legacy_n]],
+        )
+
+        controller = SqliteController(os.path.join(directory, "bulk.db"))
+        timed(
+            "sqlite users, create_users",
+            len(users),
+            lambda: controller.create_users(users),
+        )
+        timed(
+            "sqlite interact",
+            legacy_n,
+            lambda: [controller.interact(i) for i in interactions[:legacy_n]],
+        )
+        timed(
+            "sqlite interact_many",
+            len(interactions),
+            lambda: controller.interact_many(interactions),
+        )
+
+
+def bench_postgres(args):
+    # libpq reads PGOPTIONS, so every pooled connection lands on the bench schema.
+    os.environ["PGOPTIONS"] = f"-c search_path={SCHEMA}"
+    from src.controllers.moodydb import PostgressController
+
+    controller = PostgressController()
+    controller._execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    controller._execute(f"CREATE SCHEMA {SCHEMA}")
+    controller._execute("""
+        CREATE TABLE users (
+            id TEXT PRIMARY KEY, name TEXT, email TEXT, role TEXT,
+            age INTEGER, music_genre TEXT, gender TEXT
+        )
+        """)
+    controller._execute("CREATE TABLE tags (id SERIAL PRIMARY KEY, label TEXT)")
+    controller._execute("CREATE TABLE tags_in_locals (local_id TEXT, tag_id INTEGER)")
+    controller._execute("CREATE INDEX ON tags_in_locals (local_id)")
+    controller._execute("CREATE TABLE locals_favorites (local_id TEXT, user_id TEXT)")
+    controller._execute("""
+        CREATE TABLE user_metrics (
+            id SERIAL PRIMARY KEY, "userId" TEXT, "tagsId" INTEGER,
+            interest INTEGER, UNIQUE ("userId", "tagsId")
+        )
+        """)
+    controller._execute(
+        "INSERT INTO tags (label) SELECT 'tag-' || g FROM generate_series(1, 50) g"
+    )
+    controller._execute(
+        """
+        INSERT INTO tags_in_locals
+        SELECT p::text, 1 + (p * t) % 50
+        FROM generate_series(1, %s) p, generate_series(1, 3) t
+        """,
+        (args.places,),
+    )
+
+    users = make_users(args.users, args.seed)
+    interactions = make_interactions(
+        args.interactions, args.users, args.places, args.seed
+    )
+    legacy_n = min(len(interactions), args.legacy_limit)
+
+    timed(
+        "postgres users, create_users",
+        len(users),
+        lambda: controller.create_users(users),
+    )
+    timed(
+        "postgres interact",
+        legacy_n,
+        lambda: [controller.interact(i) for i in interactions[:legacy_n]],
+    )
+    timed(
+        "postgres interact_many",
+        len(interactions),
+        lambda: controller.interact_many(interactions),
+    )
+    controller.close_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--places", type=int, default=2_000)
+    parser.add_argument("--interactions", type=int, default=100_000)
+    parser.add_argument(
+        "--legacy-limit",
+        type=int,
+        default=5_000,
+        help="interactions sent through the row-at-a-time paths",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--postgres", action="store_true")
+    args = parser.parse_args()
+
+    bench_sqlite(args)
+    if args.postgres:
+        bench_postgres(args)
@@ -0,0 +1,74 @@
+"""
+What logging costs the request thread: one debug line per scored user, as
+`calculate_similarity` used to log, against one summary line per request.
+
+"sync" is the old setup (DEBUG written straight to the file by the caller),
+"queue" is `configure_logging`, at DEBUG and at the default INFO.
+
+    python -m local.benchmarks.logging_benchmark
+    python -m local.benchmarks.logging_benchmark --users 100000 --requests 5
+"""
+
+import os
+import time
+import logging
+import argparse
+import tempfile
+from src.dependencies.log import LOG_DATE_FORMAT, LOG_FORMAT, configure_logging
+from src.models.stage_timer import StageTimer
+
+logger = logging.getLogger("app_logger")
+
+
+def sync_logging(path: str) -> None:
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(logging.DEBUG)
+
+
+def per_pair_request(user_ids) -> None:
+    for user_id in user_ids:
+        logger.debug("Calculating similarity between %s and %s", "query", user_id)
+
+
+def summary_request(user_ids) -> None:
+    timer = StageTimer()
+    with timer.stage("neighbors"):
+        pass
+    timer.log(logger, "Recommended %s places (%s filled) to user %s", 10, 0, "query")
+
+
+def mean_ms(request, user_ids, n_requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(n_requests):
+        request(user_ids)
+    return (time.perf_counter() - started) / n_requests * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    user_ids = [f"{i:08d}-user" for i in range(args.users)]
+    directory = tempfile.mkdtemp(prefix="logging-benchmark-")
+    os.environ["LOG_FILE"] = os.path.join(directory, "queue.log")
+    print(f"{args.users} users per request, request-thread time only")
+
+    for name, request in (("per pair", per_pair_request), ("summary", summary_request)):
+        sync_logging(os.path.join(directory, "sync.log"))
+        sync_ms = mean_ms(request, user_ids, args.requests)
+
+        results = [f"sync DEBUG {sync_ms:8.2f}"]
+        for level in ("DEBUG", "INFO"):
+            os.environ["LOG_LEVEL"] = level
+            listener = configure_logging()
+            queue_ms = mean_ms(request, user_ids, args.requests)
+            listener.stop()
+            results.append(f"queue {level} {queue_ms:8.2f}")
+        print(f"{name:>9}: " + " | ".join(results) + " ms/request")
@@ -0,0 +1,86 @@
+"""
+Ranking and scoring the places of a user's neighbors: the per-place loops
+the model used to run against `rank_places`. Both score every ranked
+place; the loops used to score only the page being served.
+
+    python -m local.benchmarks.ranking_benchmark
+    python -m local.benchmarks.ranking_benchmark --users 50000 -k 50
+"""
+
+import time
+import argparse
+import numpy as np
+from collections import defaultdict
+from local.benchmarks.ann_benchmark import generate_users
+from src.models.similarity_engine import UserFeatureMatrix
+from src.models.place_ranking import rank_places
+
+
+def loop_rank_places(features: UserFeatureMatrix, neighbors, similarities):
+    """Dict aggregation, then a scan of every neighbor per ranked place."""
+    recommendations = defaultdict(int)
+    for row in neighbors:
+        start, stop = features.metric_places.indptr[row : row + 2]
+        for place, interactions in zip(
+            features.metric_places.indices[start:stop].tolist(),
+            features.metric_interactions[start:stop].tolist(),
+        ):
+            recommendations[place] += interactions
+    ranked = sorted(recommendations, key=recommendations.get, reverse=True)
+
+    scores = []
+    for place in ranked:
+        total_similarity = 0.0
+        total_weight = 0.0
+        for row, similarity in zip(neighbors, similarities):
+            start, stop = features.metric_places.indptr[row : row + 2]
+            matches = np.flatnonzero(
+                features.metric_places.indices[start:stop] == place
+            )
+            if len(matches):
+                weight = int(features.metric_interactions[start + matches[-1]])
+                total_similarity += similarity * weight
+                total_weight += weight
+        scores.append(total_similarity / total_weight if total_weight else 0.0)
+    return ranked, scores
+
+
+def mean_ms(fn, items) -> float:
+    started = time.perf_counter()
+    for item in items:
+        fn(*item)
+    return (time.perf_counter() - started) / len(items) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--places", type=int, default=5_000)
+    parser.add_argument("--communities", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    features = UserFeatureMatrix(
+        generate_users(args.users, args.places, args.communities, args.seed)
+    )
+    rng = np.random.default_rng(args.seed)
+    queries = [
+        (
+            np.sort(rng.choice(features.n_users, size=args.k, replace=False)),
+            np.sort(rng.random(args.k))[::-1],
+        )
+        for _ in range(args.queries)
+    ]
+
+    for neighbors, similarities in queries:
+        codes, scores = rank_places(features, neighbors, similarities)
+        expected = loop_rank_places(features, neighbors, similarities)
+        assert codes.tolist() == expected[0] and scores.tolist() == expected[1]
+
+    loop_ms = mean_ms(lambda *query: loop_rank_places(features, *query), queries)
+    vector_ms = mean_ms(lambda *query: rank_places(features, *query), queries)
+    print(f"{args.users} users, k={args.k}, same ranking and scores on every query")
+    print(f"{'loops':>12}: {loop_ms:7.3f} ms/query")
+    print(f"{'rank_places':>12}: {vector_ms:7.3f} ms/query, {loop_ms / vector_ms:.1f}x")
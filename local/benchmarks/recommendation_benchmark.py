@@ -0,0 +1,167 @@
+"""
+End-to-end timings of the recommendation path on a synthetic dataset held
+in a `MemoryController`: model construction, `find_similar_users`,
+`recommend` page by page and `recommend_all_users`.
+
+Results go to stdout and, with --output, to a JSON file tagged with the
+current commit so runs can be compared across commits.
+
+    python -m local.benchmarks.recommendation_benchmark
+    python -m local.benchmarks.recommendation_benchmark --users 100000 \\
+        --output bench-100k.json
+    python -m local.benchmarks.recommendation_benchmark --users 1000000 --no-batch
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import numpy as np
+from datetime import datetime, timezone
+from local.benchmarks.synthetic import SyntheticConfig, build_repository
+from src.models.custom_recommendation_model import CustomRecommendationModel
+
+
+def latency_stats(seconds) -> dict:
+    milliseconds = np.asarray(seconds) * 1000
+    return {
+        "n": len(milliseconds),
+        "mean_ms": float(milliseconds.mean()),
+        "p50_ms": float(np.percentile(milliseconds, 50)),
+        "p95_ms": float(np.percentile(milliseconds, 95)),
+        "p99_ms": float(np.percentile(milliseconds, 99)),
+        "max_ms": float(milliseconds.max()),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict:
+    config = SyntheticConfig(
+        n_users=args.users, n_places=args.places, n_tags=args.tags, seed=args.seed
+    )
+    repository, generate_s = timed(build_repository, config)
+    model, init_s = timed(CustomRecommendationModel, repository)
+    n_metrics = len(model.similarity_engine.features.metric_interactions)
+    print(
+        f"{args.users} users, {config.places} places, {n_metrics} metrics "
+        f"generated in {generate_s:.2f}s"
+    )
+    print(f"{'model init':>22}: {init_s:8.2f} s")
+
+    rng = np.random.default_rng(args.seed)
+    user_ids = repository.get_user_ids()
+    sample = rng.choice(
+        len(user_ids), size=min(args.queries, len(user_ids)), replace=False
+    )
+    users = [repository.get_user_by_id(user_ids[i]) for i in sample]
+
+    neighbor_seconds = [
+        timed(model.find_similar_users, user, args.k)[1] for user in users
+    ]
+    neighbor_stats = latency_stats(neighbor_seconds)
+    print(
+        f"{'find_similar_users':>22}: p50 {neighbor_stats['p50_ms']:7.2f} ms, "
+        f"p99 {neighbor_stats['p99_ms']:7.2f} ms"
+    )
+
+    # Page 0 misses the caches, later pages slice the cached ranking.
+    model.clear_cache()
+    page_seconds = [[] for _ in range(args.pages)]
+    for user in users:
+        for page in range(args.pages):
+            page_seconds[page].append(
+                timed(
+                    model.recommend,
+                    user.user_id,
+                    page=page,
+                    items_per_page=args.items_per_page,
+                    k_neighboors=args.k,
+                )[1]
+            )
+    recommend_stats = {}
+    for page, seconds in enumerate(page_seconds):
+        recommend_stats[f"page_{page}"] = stats = latency_stats(seconds)
+        print(
+            f"{f'recommend page {page}':>22}: p50 {stats['p50_ms']:7.2f} ms, "
+            f"p99 {stats['p99_ms']:7.2f} ms"
+        )
+
+    batch_s = None
+    if not args.no_batch:
+        model.clear_cache()
+        thread, _ = timed(model.recommend_all_users, args.workers, args.k)
+        started = time.perf_counter()
+        thread.join()
+        batch_s = time.perf_counter() - started
+        print(f"{'recommend_all_users':>22}: {batch_s:8.2f} s")
+
+    return {
+        "commit": current_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cpus": os.cpu_count(),
+        "config": vars(args),
+        "dataset": {
+            "users": args.users,
+            "places": config.places,
+            "metrics": n_metrics,
+            "generate_s": generate_s,
+        },
+        "timings": {
+            "model_init_s": init_s,
+            "find_similar_users": neighbor_stats,
+            "recommend": recommend_stats,
+            "recommend_all_users_s": batch_s,
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--places", type=int, default=None)
+    parser.add_argument("--tags", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--items-per-page", type=int, default=10)
+    parser.add_argument("-k", type=int, default=7)
+    parser.add_argument("--mode", choices=("exact", "ann"), default="exact")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-batch", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the results as JSON here")
+    args = parser.parse_args()
+
+    # No precomputed neighbor index: every query runs the configured search.
+    os.environ["NEIGHBOR_INDEX_PATH"] = os.path.join(
+        tempfile.mkdtemp(prefix="recommendation-benchmark-"), "none.npz"
+    )
+    os.environ["SIMILARITY_MODE"] = args.mode
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
@@ -0,0 +1,157 @@
+"""
+Seeded synthetic dataset for benchmarks: places with tags, ratings and
+likes, and users whose metrics and favorites follow power laws.
+
+Place popularity is Zipfian, so a few places collect most interactions;
+the number of metrics per user and the interactions per metric are
+Zipf-distributed too. The same arguments always produce the same data.
+
+    from local.benchmarks.synthetic import SyntheticConfig, build_repository
+    repository = build_repository(SyntheticConfig(n_users=100_000, seed=1))
+"""
+
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+from src.types.basic_types import User, Metrics, FavoritePlaces, Place
+from src.controllers.memorydb import MemoryController
+
+GENRES = ["Rock", "Pop", "Jazz", "Metal", "Funk", "Samba", "MPB", "Sertanejo"]
+GENDERS = ["M", "F"]
+MAX_TAGS_PER_PLACE = 3
+CHUNK_SIZE = 10_000
+
+
+@dataclass
+class SyntheticConfig:
+    n_users: int = 1_000
+    # Default: one place per 10 users, at least 200.
+    n_places: Optional[int] = None
+    n_tags: int = 60
+    seed: int = 0
+    # Zipf exponents: place popularity, metrics per user, interactions.
+    place_skew: float = 1.1
+    metrics_skew: float = 1.6
+    interactions_skew: float = 2.0
+    max_metrics: int = 200
+    mean_favorites: float = 1.5
+
+    @property
+    def places(self) -> int:
+        return self.n_places or max(200, self.n_users // 10)
+
+
+def generate_places(config: SyntheticConfig) -> Tuple[List[Place], np.ndarray]:
+    """
+    Places in popularity order, and their tag codes as a (places,
+    MAX_TAGS_PER_PLACE) array padded with -1.
+    """
+    rng = np.random.default_rng([config.seed, 0])
+    n_places = config.places
+    # Popular places get more likes; ratings are noisy and some are missing.
+    likes = (5000 / (np.arange(n_places) + 1) ** config.place_skew).astype(int)
+    likes += rng.integers(0, 20, n_places)
+    ratings = np.round(np.clip(rng.normal(3.8, 0.7, n_places), 1.0, 5.0), 1)
+    rated = rng.random(n_places) > 0.05
+
+    tag_weights = 1 / (np.arange(config.n_tags) + 1)
+    tag_weights /= tag_weights.sum()
+    tags = np.full((n_places, MAX_TAGS_PER_PLACE), -1, dtype=np.int64)
+    for place in range(n_places):
+        count = rng.integers(1, MAX_TAGS_PER_PLACE + 1)
+        tags[place, :count] = rng.choice(
+            config.n_tags, size=count, replace=False, p=tag_weights
+        )
+
+    places = [
+        Place(
+            place_id=place_id(place),
+            slug=f"place-{place}",
+            likes=int(likes[place]),
+            rating=float(ratings[place]) if rated[place] else None,
+        )
+        for place in range(n_places)
+    ]
+    return places, tags
+
+
+def generate_users(config: SyntheticConfig, place_tags: np.ndarray) -> Iterator[User]:
+    """Users in chunks drawn from their own seeded stream, never all held."""
+    n_places = len(place_tags)
+    popularity = np.cumsum(1 / (np.arange(n_places) + 1) ** config.place_skew)
+    popularity /= popularity[-1]
+    tag_counts = (place_tags >= 0).sum(axis=1)
+
+    for chunk, start in enumerate(range(0, config.n_users, CHUNK_SIZE)):
+        rng = np.random.default_rng([config.seed, 1, chunk])
+        n_users = min(CHUNK_SIZE, config.n_users - start)
+
+        n_metrics = np.minimum(
+            rng.zipf(config.metrics_skew, n_users), config.max_metrics
+        )
+        places = np.minimum(
+            np.searchsorted(popularity, rng.random(n_metrics.sum())), n_places - 1
+        )
+        interactions = np.minimum(rng.zipf(config.interactions_skew, len(places)), 1000)
+        # One of the place's own tags, as a metric joined through tags_in_locals.
+        tag_slots = (rng.random(len(places)) * tag_counts[places]).astype(int)
+        tags = place_tags[places, tag_slots]
+        metric_ends = np.cumsum(n_metrics)
+
+        n_favorites = rng.poisson(config.mean_favorites, n_users)
+        favorites = np.minimum(
+            np.searchsorted(popularity, rng.random(n_favorites.sum())), n_places - 1
+        )
+        favorite_ends = np.cumsum(n_favorites)
+
+        ages = np.clip(rng.normal(30, 10, n_users), 15, 80).astype(int)
+        genres = rng.integers(0, len(GENRES), n_users)
+        genders = rng.integers(0, len(GENDERS), n_users)
+
+        for i in range(n_users):
+            user_id = f"user-{start + i:08d}"
+            metric_slice = slice(metric_ends[i] - n_metrics[i], metric_ends[i])
+            favorite_slice = slice(favorite_ends[i] - n_favorites[i], favorite_ends[i])
+            yield User(
+                user_id=user_id,
+                name=f"User {start + i}",
+                age=int(ages[i]),
+                gender=GENDERS[genders[i]],
+                music_genre=GENRES[genres[i]],
+                metrics=[
+                    Metrics(
+                        place_id=place_id(place),
+                        user_id=user_id,
+                        interactions=count,
+                        interest=tag_label(tag),
+                    )
+                    for place, count, tag in zip(
+                        places[metric_slice].tolist(),
+                        interactions[metric_slice].tolist(),
+                        tags[metric_slice].tolist(),
+                    )
+                ],
+                favorite_places=[
+                    FavoritePlaces(user_id=user_id, place_id=place_id(place))
+                    for place in favorites[favorite_slice].tolist()
+                ],
+            )
+
+
+def build_repository(config: SyntheticConfig) -> MemoryController:
+    places, place_tags = generate_places(config)
+    tags_by_place: Dict[str, List[str]] = {
+        place.place_id: [tag_label(tag) for tag in tags if tag >= 0]
+        for place, tags in zip(places, place_tags.tolist())
+    }
+    repository = MemoryController(places, tags_by_place)
+    repository.create_users(generate_users(config, place_tags))
+    return repository
+
+
+def place_id(place: int) -> str:
+    return f"place-{place:07d}"
+
+
+def tag_label(tag: int) -> str:
+    return f"tag-{tag:03d}"
@@ -0,0 +1,96 @@
+"""
+Memory per user: dict of pydantic User objects vs the columnar user store.
+
+Generates synthetic users with a few metrics and favorites each and measures,
+with tracemalloc, what stays allocated once each representation is built.
+
+    python -m local.benchmarks.user_store_benchmark
+"""
+
+import gc
+import time
+import random
+import argparse
+import tracemalloc
+from src.types.basic_types import User, Metrics, FavoritePlaces
+from src.models.similarity_engine import UserFeatureMatrix
+from src.models.user_store import UserStore
+
+
+def generate_users(n_users: int, n_places: int, n_tags: int, seed: int):
+    rng = random.Random(seed)
+    genres = ["Rock", "Pop", "Jazz", "Metal", "Funk", "Samba"]
+    tags = [f"tag-{i}" for i in range(n_tags)]
+    for i in range(n_users):
+        user_id = f"{i:08d}-user"
+        yield User(
+            user_id=user_id,
+            name=f"User {i}",
+            age=rng.randint(15, 70),
+            gender=rng.choice("MF"),
+            music_genre=rng.choice(genres),
+            metrics=[
+                Metrics(
+                    place_id=f"place-{rng.randrange(n_places)}",
+                    user_id=user_id,
+                    interactions=rng.randint(1, 10),
+                    interest=rng.choice(tags),
+                )
+                for _ in range(rng.randint(0, 30))
+            ],
+            favorite_places=[
+                FavoritePlaces(
+                    user_id=user_id, place_id=f"place-{rng.randrange(n_places)}"
+                )
+                for _ in range(rng.randint(0, 5))
+            ],
+        )
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained, peak, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--places", type=int, default=5_000)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    def users():
+        return generate_users(args.users, args.places, args.tags, args.seed)
+
+    user_data, dict_bytes, dict_peak, dict_elapsed = measure(
+        lambda: {user.user_id: user for user in users()}
+    )
+    n_interactions = sum(len(user.metrics) for user in user_data.values())
+    del user_data
+
+    store, store_bytes, store_peak, store_elapsed = measure(
+        lambda: UserStore(UserFeatureMatrix(users()))
+    )
+
+    print(f"{args.users} users, {n_interactions} interactions")
+    for name, retained, peak, elapsed in (
+        ("Dict[str, User]", dict_bytes, dict_peak, dict_elapsed),
+        ("UserStore", store_bytes, store_peak, store_elapsed),
+    ):
+        result = {
+            "bytes_per_user": round(retained / args.users),
+            "bytes_per_interaction": round(retained / max(n_interactions, 1), 1),
+            "retained_mb": round(retained / 2**20, 1),
+            "peak_mb": round(peak / 2**20, 1),
+            "build_s": round(elapsed, 2),
+        }
+        print(f"{name:>16}: {result}")
+    print(f"{'reduction':>16}: {dict_bytes / store_bytes:.1f}x")
@@ -0,0 +1,31 @@
+-- One metrics row per (user, tag), which the interaction upserts in
+-- src/controllers/moodydb.py rely on for ON CONFLICT ("userId", "tagsId").
+-- Duplicate rows left by the old read-delete-reinsert writes are merged
+-- first, summing their interest into the oldest row.
+--
+--     psql "$DATABASE_URL" -f migrations/001_user_metrics_unique.sql
+
+BEGIN;
+
+LOCK TABLE user_metrics IN SHARE ROW EXCLUSIVE MODE;
+
+UPDATE user_metrics um
+SET interest = totals.interest
+FROM (
+    SELECT "userId", "tagsId", MIN(ctid) AS keep, SUM(interest) AS interest
+    FROM user_metrics
+    GROUP BY "userId", "tagsId"
+    HAVING COUNT(*) > 1
+) totals
+WHERE um.ctid = totals.keep;
+
+DELETE FROM user_metrics um
+USING user_metrics other
+WHERE um."userId" = other."userId"
+  AND um."tagsId" = other."tagsId"
+  AND um.ctid > other.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS user_metrics_user_tag
+    ON user_metrics ("userId", "tagsId");
+
+COMMIT;
@@ -0,0 +1,53 @@
+-- Change log of users, read by every instance of the service from its own
+-- cursor (`PostgressController.get_user_changes`), so writes from other
+-- instances or straight into the database reach the in-memory model
+-- within USER_REFRESH_SECONDS. Triggers on the tables a user is built from
+-- append the user's id on every insert, update and delete.
+--
+--     psql "$DATABASE_URL" -f migrations/002_user_changes.sql
+--
+-- Rows are only needed until every instance has read them. Prune them
+-- periodically, e.g. daily:
+--
+--     DELETE FROM user_changes WHERE changed_at < now() - interval '1 day';
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS user_changes (
+    id BIGSERIAL PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS user_changes_changed_at
+    ON user_changes (changed_at);
+
+-- TG_ARGV[0] names the table's user id column.
+CREATE OR REPLACE FUNCTION record_user_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        INSERT INTO user_changes (user_id) VALUES (to_jsonb(OLD) ->> TG_ARGV[0]);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        INSERT INTO user_changes (user_id) VALUES (to_jsonb(NEW) ->> TG_ARGV[0]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_changed ON users;
+CREATE TRIGGER users_changed
+    AFTER INSERT OR UPDATE OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION record_user_change('id');
+
+DROP TRIGGER IF EXISTS user_metrics_changed ON user_metrics;
+CREATE TRIGGER user_metrics_changed
+    AFTER INSERT OR UPDATE OR DELETE ON user_metrics
+    FOR EACH ROW EXECUTE FUNCTION record_user_change('userId');
+
+DROP TRIGGER IF EXISTS locals_favorites_changed ON locals_favorites;
+CREATE TRIGGER locals_favorites_changed
+    AFTER INSERT OR UPDATE OR DELETE ON locals_favorites
+    FOR EACH ROW EXECUTE FUNCTION record_user_change('user_id');
+
+COMMIT;
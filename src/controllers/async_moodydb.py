@@ -0,0 +1,143 @@
+import os
+import asyncio
+import logging
+import asyncpg
+from dotenv import load_dotenv
+from src.types.repository import AsyncRepository
+from src.types.basic_types import User, Place, Metrics, FavoritePlaces
+
+logger = logging.getLogger("app_logger")
+load_dotenv()
+
+
+class AsyncPostgressController(AsyncRepository):
+    """
+    Non-blocking counterpart of `PostgressController` for the request path,
+    backed by an asyncpg pool. Selected ids are cast to text so rows map onto
+    the same pydantic models.
+    """
+
+    def __init__(self):
+        # Created once by `connect` at startup (the app's lifespan).
+        self.pool: asyncpg.Pool | None = None
+
+        self.user_props = (
+            "u.id::text, u.name, u.email, u.role, u.age, u.music_genre, u.gender"
+        )
+        self.place_props = "l.id::text, l.slug, l.name, l.rating, l.price_level"
+
+    async def connect(self) -> None:
+        if self.pool is not None:
+            return
+        logger.info("Opening async database pool.")
+        self.pool = await asyncpg.create_pool(
+            user=os.environ.get("DB_USER"),
+            password=os.environ.get("DB_PASSWORD"),
+            host=os.environ.get("DB_HOST"),
+            port=os.environ.get("DB_PORT"),
+            database=os.environ.get("DB_NAME"),
+            min_size=int(os.environ.get("DB_POOL_MIN", 1)),
+            max_size=int(os.environ.get("DB_POOL_MAX", 10)),
+        )
+
+    async def close_connection(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+            logger.info("Async database pool closed.")
+
+    async def get_user_by_id(self, user_id: str) -> User:
+        user, metrics, favorites = await asyncio.gather(
+            self.pool.fetchrow(
+                f"""SELECT {self.user_props} FROM users u WHERE u.id = $1""",
+                user_id,
+            ),
+            self.get_user_metrics(user_id),
+            self.get_user_favorite_places(user_id),
+        )
+
+        if not user:
+            logger.warning("User not found.")
+            return None
+
+        return User(
+            user_id=user[0],
+            name=user[1],
+            metrics=metrics,
+            age=user[4],
+            music_genre=user[5],
+            gender=user[6],
+            favorite_places=favorites,
+        )
+
+    async def get_user_metrics(self, user_id: str) -> list[Metrics]:
+        user_metrics = await self.pool.fetch(
+            """
+            SELECT um.id, um."userId"::text, til."local_id"::text, um."tagsId",
+                   um.interest, t.label
+            FROM user_metrics um
+            INNER JOIN tags t ON um."tagsId" = t.id
+            INNER JOIN tags_in_locals til ON t.id = til."tag_id"
+            WHERE um."userId" = $1
+            """,
+            user_id,
+        )
+        return [
+            Metrics(
+                place_id=metric[2],
+                user_id=metric[1],
+                interactions=metric[4],
+                interest=metric[5],
+            )
+            for metric in user_metrics
+        ]
+
+    async def get_user_favorite_places(self, user_id: str) -> list[FavoritePlaces]:
+        favorites = await self.pool.fetch(
+            """
+            SELECT local_id::text, user_id::text
+            FROM locals_favorites
+            WHERE user_id = $1
+            """,
+            user_id,
+        )
+        return [
+            FavoritePlaces(place_id=favorite[0], user_id=favorite[1])
+            for favorite in favorites
+        ]
+
+    async def get_top_places(self, start: int, limit: int) -> list[Place]:
+        return await self._select_places(
+            tail="ORDER BY l.rating DESC LIMIT $1 OFFSET $2", params=(limit, start)
+        )
+
+    async def get_places_by_ids(self, place_ids: list[str]) -> list[Place]:
+        if not place_ids:
+            return []
+
+        places = {
+            place.place_id: place
+            for place in await self._select_places(
+                where="WHERE l.id = ANY($1)", params=(list(place_ids),)
+            )
+        }
+        return [places[place_id] for place_id in place_ids if place_id in places]
+
+    async def _select_places(
+        self, where: str = "", tail: str = "", params: tuple = ()
+    ) -> list[Place]:
+        places = await self.pool.fetch(
+            f"""
+            SELECT {self.place_props}, COUNT(ll.local_id)
+            FROM locals l
+            LEFT JOIN locals_likes ll ON ll.local_id = l.id
+            {where}
+            GROUP BY l.id
+            {tail}
+            """,
+            *params,
+        )
+        return [
+            Place(place_id=place[0], likes=place[5], slug=place[1], rating=place[3])
+            for place in places
+        ]
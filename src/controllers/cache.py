@@ -1,4 +1,8 @@
+import sys
 import time
+import threading
+import numpy as np
+from collections import OrderedDict
 
 
 class CacheWithTTL:
@@ -44,3 +48,152 @@ class CacheWithTTL:
             for key, (_, timestamp) in self.cache.items()
             if time.time() - timestamp < self.ttl
         ]
+
+
+class LRUCacheWithTTL:
+    """
+    Cache thread-safe com TTL, limite de entradas/bytes e despejo LRU.
+
+    A leitura só confere o prazo da própria entrada, contra um único
+    `time.monotonic()`, e acertos não tomam o lock; entradas vencidas que
+    ninguém lê são removidas nas escritas. Como o TTL é o mesmo para todas
+    as entradas, a ordem de escrita já é a ordem de expiração: `_expires`
+    guarda essa ordem e a limpeza remove só do início, em O(1) por entrada.
+    `_entries` guarda a ordem de uso (LRU). O tamanho dos valores só é
+    medido com `max_bytes`.
+    """
+
+    def __init__(self, ttl=300, max_entries=10_000, max_bytes=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._expires = OrderedDict()  # key -> expires_at, em ordem de escrita
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __getitem__(self, key):
+        """Permite acessar valores como cache[key]"""
+        # Acerto sem o lock: `get` e `move_to_end` do OrderedDict são atômicos
+        # e a entrada é uma tupla imutável. `hits` pode perder incrementos sob
+        # concorrência; é só uma métrica.
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                pass  # removida por outra thread depois de lida
+            self.hits += 1
+            return entry[0]
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    get = __getitem__
+
+    def __setitem__(self, key, value):
+        """Permite atribuir valores como cache[key] = value"""
+        size = _sizeof(value) if self.max_bytes is not None else 0
+        now = time.monotonic()
+        expires_at = now + self.ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, size)
+            self._expires[key] = expires_at
+            self._bytes += size
+            self._expire(now)
+            if len(self._entries) > self.max_entries or size:
+                self._evict()
+
+    def __delitem__(self, key):
+        """Permite remover valores com del cache[key]"""
+        with self._lock:
+            self._remove(key)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[1] > time.monotonic()
+
+    def __len__(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._entries)
+
+    def clear(self, key=None):
+        """Limpa o cache"""
+        with self._lock:
+            if key:
+                self._remove(key)
+            else:
+                self._entries.clear()
+                self._expires.clear()
+                self._bytes = 0
+
+    def keys(self):
+        """Retorna as chaves válidas no cache."""
+        with self._lock:
+            self._expire(time.monotonic())
+            return list(self._entries)
+
+    def stats(self):
+        """Retorna métricas de uso do cache."""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                # None: sem max_bytes os tamanhos não são medidos.
+                "bytes": self._bytes if self.max_bytes is not None else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            del self._expires[key]
+            self._bytes -= entry[2]
+
+    def _expire(self, now):
+        expires = self._expires
+        while expires:
+            key, expires_at = next(iter(expires.items()))
+            if expires_at > now:
+                break
+            self._remove(key)
+            self.expirations += 1
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+
+def _sizeof(value, depth=3):
+    """Tamanho aproximado em bytes, descendo alguns níveis em coleções."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    size = sys.getsizeof(value)
+    if depth and isinstance(value, (list, tuple, set)):
+        size += sum(_sizeof(item, depth - 1) for item in value)
+    elif depth and isinstance(value, dict):
+        size += sum(
+            _sizeof(k, depth - 1) + _sizeof(v, depth - 1) for k, v in value.items()
+        )
+    return size
@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+import functools
+from typing import Any, Iterable, List, Optional, Protocol
+from src.controllers.cache import LRUCacheWithTTL
+
+logger = logging.getLogger("app_logger")
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> Any: ...
+    def __getitem__(self, key: str) -> Any: ...
+    def __setitem__(self, key: str, value: Any) -> None: ...
+    def __delitem__(self, key: str) -> None: ...
+    def clear(self, key: Optional[str] = None) -> None: ...
+    def keys(self) -> List[str]: ...
+    def stats(self) -> dict: ...
+
+
+def _private_path(path: str) -> str:
+    """
+    `path`, once its directory exists with mode 0700 and belongs to this
+    user, so no other user can plant or read cache entries.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(
+            f"Cache directory {directory} must be private (mode 0700) and "
+            "owned by this user"
+        )
+    return path
+
+
+class SqliteCache:
+    """
+    Cache shared by every process on the host through one SQLite file in WAL
+    mode, so uvicorn workers reuse each other's results. The file must be in
+    a private directory. Values are stored as JSON, so tuples come back as
+    lists, and each thread gets its own connection.
+    """
+
+    def __init__(self, path: str, namespace: str, ttl: float = 300):
+        self.path = _private_path(path)
+        self.namespace = namespace
+        self.ttl = ttl
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    namespace TEXT,
+                    key TEXT,
+                    value TEXT,
+                    expires_at REAL,
+                    PRIMARY KEY (namespace, key)
+                )
+                """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __getitem__(self, key: str) -> Any:
+        row = (
+            self._connection()
+            .execute(
+                """
+                SELECT value FROM cache
+                WHERE namespace = ? AND key = ? AND expires_at > ?
+                """,
+                (self.namespace, key, time.time()),
+            )
+            .fetchone()
+        )
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def get(self, key: str) -> Any:
+        return self.__getitem__(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (
+                    self.namespace,
+                    key,
+                    json.dumps(value),
+                    time.time() + self.ttl,
+                ),
+            )
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._purge_expired()
+
+    def __delitem__(self, key: str) -> None:
+        self.clear(key)
+
+    def clear(self, key: Optional[str] = None) -> None:
+        with self._connection() as conn:
+            if key:
+                conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                )
+            else:
+                conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+    def keys(self) -> List[str]:
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT key FROM cache WHERE namespace = ? AND expires_at > ?",
+                (self.namespace, time.time()),
+            )
+            .fetchall()
+        )
+        return [row[0] for row in rows]
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "entries": len(self.keys()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+        }
+
+    def _purge_expired(self) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+
+class NetworkCacheClient(Protocol):
+    """Subset of a Redis-style client needed by `NetworkCache`."""
+
+    def get(self, key: str) -> Optional[bytes]: ...
+    def set(self, key: str, value: str, ex: Optional[int] = None) -> Any: ...
+    def delete(self, *keys: str) -> Any: ...
+    def scan_iter(self, match: str) -> Iterable: ...
+
+
+class NetworkCache:
+    """
+    Cache over a networked key-value store (e.g. a `redis.Redis` instance),
+    for sharing results across hosts. Values are stored as JSON, as in
+    `SqliteCache`. Expiry is left to the store.
+    """
+
+    def __init__(self, client: NetworkCacheClient, namespace: str, ttl: float = 300):
+        self.client = client
+        self.prefix = f"moody:{namespace}:"
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)
+
+    def get(self, key: str) -> Any:
+        return self.__getitem__(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(self.ttl))
+
+    def __delitem__(self, key: str) -> None:
+        self.clear(key)
+
+    def clear(self, key: Optional[str] = None) -> None:
+        if key:
+            self.client.delete(self.prefix + key)
+            return
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def keys(self) -> List[str]:
+        keys = []
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            key = key.decode() if isinstance(key, bytes) else key
+            keys.append(key[len(self.prefix) :])
+        return keys
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def network_client(url: str) -> NetworkCacheClient:
+    """One Redis client (and connection pool) per URL, shared by namespaces."""
+    try:
+        import redis
+    except ImportError as e:
+        raise ImportError(
+            "CACHE_BACKEND=network needs the redis package: pip install redis"
+        ) from e
+    return redis.Redis.from_url(url)
+
+
+def create_cache(
+    namespace: str,
+    ttl: float = 300,
+    client: Optional[NetworkCacheClient] = None,
+    max_entries: Optional[int] = None,
+) -> CacheBackend:
+    """
+    Build the cache selected by CACHE_BACKEND: "memory" (per process, the
+    default), "sqlite" (shared by processes on this host, at CACHE_PATH in a
+    private directory) or "network" (a Redis server at CACHE_URL, unless a
+    `client` is given).
+
+    `max_entries` sizes a memory cache that must hold that many entries,
+    instead of CACHE_MAX_ENTRIES and CACHE_MAX_BYTES.
+    """
+    backend = os.environ.get("CACHE_BACKEND", "memory").lower()
+
+    if backend == "sqlite":
+        path = os.environ.get("CACHE_PATH")
+        if not path:
+            raise ValueError("CACHE_BACKEND=sqlite requires CACHE_PATH")
+        logger.info("Using SQLite cache for %s at %s", namespace, path)
+        return SqliteCache(path, namespace=namespace, ttl=ttl)
+
+    if backend == "network":
+        if client is None:
+            url = os.environ.get("CACHE_URL")
+            if not url:
+                raise ValueError("CACHE_BACKEND=network requires CACHE_URL")
+            client = network_client(url)
+        logger.info("Using network cache for %s", namespace)
+        return NetworkCache(client, namespace=namespace, ttl=ttl)
+
+    if max_entries is not None:
+        return LRUCacheWithTTL(ttl=ttl, max_entries=max_entries)
+
+    max_bytes = os.environ.get("CACHE_MAX_BYTES")
+    return LRUCacheWithTTL(
+        ttl=ttl,
+        max_entries=int(os.environ.get("CACHE_MAX_ENTRIES", 10_000)),
+        max_bytes=int(max_bytes) if max_bytes else None,
+    )
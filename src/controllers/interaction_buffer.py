@@ -0,0 +1,288 @@
+import time
+import logging
+import threading
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+from src.types.basic_types import Interaction
+from src.types.repository import Repository
+from src.exceptions.httpExceptions import ServiceUnavailableException
+
+logger = logging.getLogger("app_logger")
+
+InteractionKey = Tuple[str, str]
+
+
+class InteractionBuffer:
+    """
+    Write-behind buffer for interactions and likes.
+
+    Interactions are coalesced per (user, place) and likes per (place, user),
+    then written by a background thread in one `interact_many`/`like_many`
+    batch when `flush_size` keys are pending or every `flush_interval`
+    seconds.
+
+    When the database is unreachable (one of the repository's
+    `transient_errors`), the batch is merged back and retried with backoff;
+    once `max_pending` keys are waiting, `add` raises instead of growing
+    without bound, so a slow database pushes back on clients. Any other
+    error means the batch holds rows the database rejects: it is written
+    again row by row and the rejected rows are logged and dropped, as the
+    synchronous routes would fail only those requests.
+
+    `on_add` runs outside the lock but still sees every accepted interaction
+    before any flush can include it; `on_flush` gets the coalesced counts
+    that were written and `on_drop` those that were dropped.
+    """
+
+    def __init__(
+        self,
+        repository: Repository,
+        flush_size: int = 500,
+        flush_interval: float = 1.0,
+        max_pending: int = 50_000,
+        on_add: Optional[Callable[[List[Interaction]], None]] = None,
+        on_flush: Optional[Callable[[Dict[InteractionKey, int]], None]] = None,
+        on_drop: Optional[Callable[[Dict[InteractionKey, int]], None]] = None,
+    ):
+        self.repository = repository
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.on_add = on_add
+        self.on_flush = on_flush
+        self.on_drop = on_drop
+        self.transient_errors = getattr(
+            repository, "transient_errors", (ConnectionError, TimeoutError)
+        )
+
+        self._interactions: Counter = Counter()
+        self._likes: Counter = Counter()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._failures = 0
+        # Accepted adds whose `on_add` has not returned yet.
+        self._adding = 0
+
+        self.flushed_interactions = 0
+        self.flushed_likes = 0
+        self.rejected = 0
+        self.dropped = 0
+
+    def add(self, interaction: Interaction) -> None:
+        self.add_many([interaction])
+
+    def add_many(self, interactions: List[Interaction]) -> None:
+        """All or nothing, so a rejected batch can simply be resent."""
+        with self._condition:
+            self._check_capacity()
+            for interaction in interactions:
+                key = (interaction.user_id, interaction.place_id)
+                self._interactions[key] += interaction.interactions
+            self._accepted()
+        self._after_add(interactions)
+
+    def add_like(self, place_id: str, user_id: str) -> None:
+        """A like is also a single interaction with the place."""
+        with self._condition:
+            self._check_capacity()
+            self._likes[(place_id, user_id)] += 1
+            self._interactions[(user_id, place_id)] += 1
+            self._accepted()
+        self._after_add(
+            [Interaction(user_id=user_id, place_id=place_id, interactions=1)]
+        )
+
+    def _check_capacity(self) -> None:
+        if self._closed:
+            raise ServiceUnavailableException("Interaction buffer is closed")
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ServiceUnavailableException("Too many pending interactions")
+
+    def _accepted(self) -> None:
+        self._adding += 1
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="interaction-flusher", daemon=True
+            )
+            self._thread.start()
+
+    def _after_add(self, interactions: List[Interaction]) -> None:
+        try:
+            if self.on_add is not None:
+                self.on_add(interactions)
+        finally:
+            with self._condition:
+                self._adding -= 1
+                # Wakes the flusher on a full buffer and flushes waiting for
+                # callbacks to finish.
+                self._condition.notify_all()
+
+    @property
+    def pending(self) -> int:
+        return len(self._interactions) + len(self._likes)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                # Back off while the database keeps failing.
+                delay = min(self.flush_interval * 2**self._failures, 30.0)
+                self._condition.wait_for(
+                    lambda: self._closed
+                    or (
+                        not self._failures
+                        and not self._adding
+                        and self.pending >= self.flush_size
+                    ),
+                    timeout=delay,
+                )
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self) -> bool:
+        """
+        Write everything pending now. Returns False if the database was
+        unreachable; what was not written then stays pending.
+        """
+        with self._flush_lock:
+            with self._condition:
+                # So `on_add` has seen everything this flush takes.
+                self._condition.wait_for(lambda: not self._adding)
+                interactions, self._interactions = self._interactions, Counter()
+                likes, self._likes = self._likes, Counter()
+            if not interactions and not likes:
+                return True
+
+            started = time.perf_counter()
+            written: Dict[InteractionKey, int] = {}
+            dropped: Dict[InteractionKey, int] = {}
+            try:
+                try:
+                    self._write_batches(likes, interactions, written)
+                except self.transient_errors:
+                    raise
+                except Exception as e:
+                    logger.warning("Interaction batch rejected, writing rows: %s", e)
+                    self._write_rows(likes, interactions, written, dropped)
+            except self.transient_errors as e:
+                # Whatever was not written goes back, merged with newer adds.
+                with self._condition:
+                    self._interactions.update(interactions)
+                    self._likes.update(likes)
+                    self._failures += 1
+                logger.error(
+                    "Interaction flush failed (%s pending, attempt %s): %s",
+                    self.pending,
+                    self._failures,
+                    e,
+                )
+                return False
+            finally:
+                self._flushed(written, dropped)
+
+            self._failures = 0
+            logger.debug(
+                "Flushed %s interactions in %.3fs",
+                len(written),
+                time.perf_counter() - started,
+            )
+            return True
+
+    def _write_batches(
+        self, likes: Counter, interactions: Counter, written: dict
+    ) -> None:
+        """Both batches in one write each; each write is all or nothing."""
+        if likes:
+            self.repository.like_many(
+                [key for key, count in likes.items() for _ in range(count)]
+            )
+            self.flushed_likes += sum(likes.values())
+            likes.clear()
+        if interactions:
+            self.repository.interact_many(
+                Interaction(user_id=user_id, place_id=place_id, interactions=count)
+                for (user_id, place_id), count in interactions.items()
+            )
+            written.update(interactions)
+            interactions.clear()
+
+    def _write_rows(
+        self, likes: Counter, interactions: Counter, written: dict, dropped: dict
+    ) -> None:
+        """
+        One write per key, dropping the keys the database rejects. Keys are
+        removed from `likes` and `interactions` once done with, so a
+        transient error leaves only the unwritten ones behind.
+        """
+        for key, count in list(likes.items()):
+            try:
+                self.repository.like_many([key] * count)
+                self.flushed_likes += count
+            except self.transient_errors:
+                raise
+            except Exception as e:
+                self.dropped += count
+                logger.error("Dropping %s likes of %s: %s", count, key, e)
+            del likes[key]
+
+        for (user_id, place_id), count in list(interactions.items()):
+            try:
+                self.repository.interact_many(
+                    [
+                        Interaction(
+                            user_id=user_id, place_id=place_id, interactions=count
+                        )
+                    ]
+                )
+                written[(user_id, place_id)] = count
+            except self.transient_errors:
+                raise
+            except Exception as e:
+                self.dropped += count
+                dropped[(user_id, place_id)] = count
+                logger.error(
+                    "Dropping %s interactions of %s with %s: %s",
+                    count,
+                    user_id,
+                    place_id,
+                    e,
+                )
+            del interactions[(user_id, place_id)]
+
+    def _flushed(
+        self, written: Dict[InteractionKey, int], dropped: Dict[InteractionKey, int]
+    ) -> None:
+        self.flushed_interactions += len(written)
+        for callback, interactions in (
+            (self.on_flush, written),
+            (self.on_drop, dropped),
+        ):
+            if callback is None or not interactions:
+                continue
+            try:
+                callback(interactions)
+            except Exception as e:
+                logger.error("Interaction flush callback failed: %s", e)
+
+    def close(self) -> None:
+        """Stop the flusher and write what is still pending."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        if not self.flush():
+            logger.error("Dropping %s interactions at shutdown", self.pending)
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "flushed_interactions": self.flushed_interactions,
+            "flushed_likes": self.flushed_likes,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "consecutive_failures": self._failures,
+        }
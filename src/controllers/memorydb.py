@@ -0,0 +1,362 @@
+import logging
+import threading
+from itertools import islice
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+from src.types.repository import Repository
+from src.types.basic_types import (
+    User,
+    Place,
+    Metrics,
+    FavoritePlaces,
+    Interaction,
+    Label,
+)
+
+logger = logging.getLogger("app_logger")
+
+# (place_id, interactions, interest) per metric.
+MetricRow = Tuple[str, int, str | None]
+
+
+class MemoryController(Repository):
+    """
+    Repository kept entirely in process memory, for load tests, benchmarks
+    and local runs without a database (DB_BACKEND=memory).
+
+    Users are stored as plain tuples rather than `User` objects, which are
+    only built when read, so a million users fit in a few hundred bytes
+    each. Besides the primary dicts by user_id, place_id and label, it
+    keeps inverted indexes from places and tags to the users who interacted
+    with them and from tags to places, updated on every write.
+
+    Interactions add to the user's first metric for the place, or start one
+    tagged with the place's first tag. Writes take one lock; reads don't.
+    Every write to a user is appended to a change log, read by position.
+    """
+
+    def __init__(self, places: Iterable[Place] = (), place_tags=None):
+        self._users: Dict[str, tuple] = {}
+        self._metrics: Dict[str, List[MetricRow]] = {}
+        self._favorites: Dict[str, List[str]] = {}
+        self._places: Dict[str, Place] = {}
+        self._place_tags: Dict[str, List[str]] = {}
+        self._labels: Dict[str, Label] = {}
+
+        self._users_by_place: Dict[str, Set[str]] = defaultdict(set)
+        self._users_by_tag: Dict[str, Set[str]] = defaultdict(set)
+        self._places_by_tag: Dict[str, Set[str]] = defaultdict(set)
+        # Places by rating, rebuilt on the first read after a place changes.
+        self._ranked: List[Place] | None = None
+        # Ids of changed users in write order; positions are 1-based.
+        self._changes: List[str] = []
+
+        self._lock = threading.RLock()
+        self.create_places(places, place_tags)
+
+    # Users
+
+    def create_user(self, data: User) -> None:
+        self.create_users([data])
+
+    def create_users(self, users: Iterable[User]) -> None:
+        with self._lock:
+            for user in users:
+                self._unindex_user(user.user_id)
+                self._users[user.user_id] = (
+                    user.name,
+                    user.age,
+                    user.gender,
+                    user.music_genre,
+                )
+                self._metrics[user.user_id] = [
+                    (metric.place_id, metric.interactions, metric.interest)
+                    for metric in user.metrics or []
+                ]
+                self._favorites[user.user_id] = [
+                    favorite.place_id for favorite in user.favorite_places or []
+                ]
+                self._index_user(user.user_id)
+                self._changes.append(user.user_id)
+
+    def update(self, user_id: str, data: User) -> None:
+        with self._lock:
+            self.delete(user_id)
+            self.create_users([data.model_copy(update={"user_id": user_id})])
+
+    def delete(self, user_id: str) -> None:
+        with self._lock:
+            self._unindex_user(user_id)
+            self._users.pop(user_id, None)
+            self._metrics.pop(user_id, None)
+            self._favorites.pop(user_id, None)
+            self._changes.append(user_id)
+
+    def get_all_users(self) -> list[User]:
+        return [self._user(user_id) for user_id in self.get_user_ids()]
+
+    def iter_user_chunks(self, chunk_size: int | None = None) -> Iterator[list[User]]:
+        user_ids = iter(self.get_user_ids())
+        while chunk := list(islice(user_ids, chunk_size or 5000)):
+            yield [self._user(user_id) for user_id in chunk if user_id in self._users]
+
+    def get_user_ids(self) -> list[str]:
+        with self._lock:
+            return list(self._users)
+
+    def get_user_page(self, page: int, items_per_page: int) -> list[User]:
+        with self._lock:
+            start = page * items_per_page
+            user_ids = list(islice(self._users, start, start + items_per_page))
+        return self.get_users_by_ids(user_ids)
+
+    def get_user_by_id(self, user_id: str) -> User | None:
+        try:
+            return self._user(user_id)
+        except KeyError:
+            return None
+
+    def get_users_by_ids(self, user_ids: list[str]) -> list[User]:
+        users = (self.get_user_by_id(user_id) for user_id in user_ids)
+        return [user for user in users if user is not None]
+
+    def get_user_metrics(self, user_id: str) -> list[Metrics]:
+        user = self.get_user_by_id(user_id)
+        return user.metrics if user is not None else []
+
+    def get_user_favorite_places(self, user_id: str) -> list[FavoritePlaces]:
+        user = self.get_user_by_id(user_id)
+        return user.favorite_places if user is not None else []
+
+    def get_users_by_place(self, place_id: str) -> list[str]:
+        """Ids of the users with a metric or favorite for the place."""
+        return list(self._users_by_place.get(place_id, ()))
+
+    def get_users_by_tag(self, tag: str) -> list[str]:
+        return list(self._users_by_tag.get(tag, ()))
+
+    def get_users_sharing_places(self, place_ids: list[str], limit: int) -> list[str]:
+        """Users on the most of `place_ids` first, at most `limit`."""
+        shared: Counter = Counter()
+        for place_id in set(place_ids):
+            shared.update(self._users_by_place.get(place_id, ()))
+        return [user_id for user_id, _ in shared.most_common(limit)]
+
+    def last_user_change(self) -> int:
+        return len(self._changes)
+
+    def get_user_changes(self, after: int, limit: int = 10000) -> tuple[list[str], int]:
+        """Ids of the users changed after position `after`, and the next one."""
+        changes = self._changes[after : after + limit]
+        return list(dict.fromkeys(changes)), after + len(changes)
+
+    def _user(self, user_id: str) -> User:
+        name, age, gender, music_genre = self._users[user_id]
+        return User(
+            user_id=user_id,
+            name=name,
+            age=age,
+            gender=gender,
+            music_genre=music_genre,
+            metrics=[
+                Metrics(
+                    place_id=place_id,
+                    user_id=user_id,
+                    interactions=interactions,
+                    interest=interest,
+                )
+                for place_id, interactions, interest in self._metrics[user_id]
+            ],
+            favorite_places=[
+                FavoritePlaces(user_id=user_id, place_id=place_id)
+                for place_id in self._favorites[user_id]
+            ],
+        )
+
+    def _index_user(self, user_id: str) -> None:
+        for place_id, _, interest in self._metrics[user_id]:
+            self._users_by_place[place_id].add(user_id)
+            if interest is not None:
+                self._users_by_tag[interest].add(user_id)
+        for place_id in self._favorites[user_id]:
+            self._users_by_place[place_id].add(user_id)
+
+    def _unindex_user(self, user_id: str) -> None:
+        for place_id, _, interest in self._metrics.get(user_id, ()):
+            _discard(self._users_by_place, place_id, user_id)
+            if interest is not None:
+                _discard(self._users_by_tag, interest, user_id)
+        for place_id in self._favorites.get(user_id, ()):
+            _discard(self._users_by_place, place_id, user_id)
+
+    # Places
+
+    def create_place(self, place: Place) -> None:
+        self.create_places([place])
+
+    def create_places(
+        self, places: Iterable[Place], place_tags: Dict[str, List[str]] | None = None
+    ) -> None:
+        with self._lock:
+            for place in places:
+                self._places[place.place_id] = place
+            for place_id, tags in (place_tags or {}).items():
+                for tag in self._place_tags.get(place_id, ()):
+                    _discard(self._places_by_tag, tag, place_id)
+                self._place_tags[place_id] = list(tags)
+                for tag in tags:
+                    self._places_by_tag[tag].add(place_id)
+            self._ranked = None
+
+    def update_place(self, place_id: str, place: Place) -> None:
+        with self._lock:
+            tags = self._place_tags.get(place_id, [])
+            self.delete_place(place_id)
+            self.create_places(
+                [place.model_copy(update={"place_id": place_id})], {place_id: tags}
+            )
+
+    def delete_place(self, place_id: str) -> None:
+        with self._lock:
+            self._places.pop(place_id, None)
+            for tag in self._place_tags.pop(place_id, ()):
+                _discard(self._places_by_tag, tag, place_id)
+            self._ranked = None
+
+    def get_all_places(self) -> list[Place]:
+        with self._lock:
+            return list(self._places.values())
+
+    def get_place_by_id(self, place_id: str) -> Place | None:
+        return self._places.get(place_id)
+
+    def get_places_by_ids(self, place_ids: list[str]) -> list[Place]:
+        places = self._places
+        return [places[place_id] for place_id in place_ids if place_id in places]
+
+    def get_places_by_tag(self, tag: str) -> list[Place]:
+        return self.get_places_by_ids(list(self._places_by_tag.get(tag, ())))
+
+    def get_place_tags(self, place_id: str) -> list[str]:
+        return list(self._place_tags.get(place_id, ()))
+
+    def get_top_places(self, start: int, limit: int) -> list[Place]:
+        ranked = self._ranked
+        if ranked is None:
+            with self._lock:
+                ranked = self._ranked = sorted(
+                    self._places.values(),
+                    key=lambda place: (place.rating is None, -(place.rating or 0)),
+                )
+        return ranked[start : start + limit]
+
+    def get_metric_place_tags(self) -> list[tuple[str, str]]:
+        """(tag, place_id) of every tagged user metric, without repeats."""
+        return list(
+            {
+                (interest, place_id)
+                for metrics in list(self._metrics.values())
+                for place_id, _, interest in metrics
+                if interest is not None
+            }
+        )
+
+    def get_place_likes(self, place_id: str) -> int:
+        place = self._places.get(place_id)
+        return place.likes if place is not None else 0
+
+    # Interactions and likes
+
+    def interact(self, interaction: Interaction) -> None:
+        self.interact_many([interaction])
+
+    def interact_many(self, interactions: Iterable[Interaction]) -> None:
+        with self._lock:
+            for interaction in interactions:
+                self._interact(interaction)
+
+    def _interact(self, interaction: Interaction) -> None:
+        user_id, place_id = interaction.user_id, interaction.place_id
+        metrics = self._metrics.get(user_id)
+        if metrics is None:
+            logger.warning("User not found: %s", user_id)
+            return
+        self._changes.append(user_id)
+        for i, (metric_place_id, count, interest) in enumerate(metrics):
+            if metric_place_id == place_id:
+                metrics[i] = (place_id, count + interaction.interactions, interest)
+                return
+
+        tags = self._place_tags.get(place_id)
+        interest = tags[0] if tags else None
+        metrics.append((place_id, interaction.interactions, interest))
+        self._users_by_place[place_id].add(user_id)
+        if interest is not None:
+            self._users_by_tag[interest].add(user_id)
+
+    def like_place(self, place_id: str, user_id: str | None = None) -> None:
+        self.like_many([(place_id, user_id)])
+
+    def like_many(self, likes: Iterable[tuple[str, str]]) -> None:
+        with self._lock:
+            for place_id, _ in likes:
+                place = self._places.get(place_id)
+                if place is not None:
+                    self._places[place_id] = place.model_copy(
+                        update={"likes": place.likes + 1}
+                    )
+            self._ranked = None
+
+    # Labels, keyed by their text
+
+    def get_all_labels(self) -> list[Label]:
+        return list(self._labels.values())
+
+    def create_label(self, label: Label) -> None:
+        with self._lock:
+            self._labels[label.label] = label
+
+    def get_label_by_id(self, label_id: str) -> Label | None:
+        return self._labels.get(label_id)
+
+    def update_label(self, label_id: str, label: Label) -> None:
+        with self._lock:
+            self._labels.pop(label_id, None)
+            self._labels[label.label] = label
+
+    def delete_label(self, label_id: str) -> None:
+        with self._lock:
+            self._labels.pop(label_id, None)
+
+    def close_connection(self) -> None:
+        pass
+
+
+class AsyncMemoryController:
+    """`AsyncRepository` over a `MemoryController`, for the async routes."""
+
+    def __init__(self, repository: MemoryController):
+        self.repository = repository
+
+    async def connect(self) -> None:
+        pass
+
+    async def close_connection(self) -> None:
+        pass
+
+    async def get_user_by_id(self, user_id: str) -> User | None:
+        return self.repository.get_user_by_id(user_id)
+
+    async def get_top_places(self, start: int, limit: int) -> list[Place]:
+        return self.repository.get_top_places(start, limit)
+
+    async def get_places_by_ids(self, place_ids: list[str]) -> list[Place]:
+        return self.repository.get_places_by_ids(place_ids)
+
+
+def _discard(index: Dict[str, Set[str]], key: str, value: str) -> None:
+    values = index.get(key)
+    if values is not None:
+        values.discard(value)
+        if not values:
+            del index[key]
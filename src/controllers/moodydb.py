@@ -1,9 +1,15 @@
 from collections import defaultdict
-from typing import Dict
+from contextlib import ExitStack, contextmanager
+from itertools import groupby, islice
+from typing import Dict, Iterable, Iterator
+import io
+import csv
+import threading
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
 import os
-from src.types.basic_types import User, Place, Metrics, FavoritePlaces
+from src.types.basic_types import User, Place, Metrics, FavoritePlaces, Interaction
 import logging
 
 logger = logging.getLogger("app_logger")
@@ -11,16 +17,26 @@ load_dotenv()
 
 
 class PostgressController:
-    def __init__(self):
+    # The database was unreachable, not the data wrong: worth writing again.
+    transient_errors = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+    def __init__(
+        self, min_connections: int | None = None, max_connections: int | None = None
+    ):
         logger.info("Connecting to the database.")
-        self.connection = psycopg2.connect(
+        min_connections = min_connections or int(os.environ.get("DB_POOL_MIN", 1))
+        max_connections = max_connections or int(os.environ.get("DB_POOL_MAX", 10))
+        self.pool = ThreadedConnectionPool(
+            min_connections,
+            max_connections,
             user=os.environ.get("DB_USER"),
             password=os.environ.get("DB_PASSWORD"),
             host=os.environ.get("DB_HOST"),
             port=os.environ.get("DB_PORT"),
             database=os.environ.get("DB_NAME"),
         )
-        self.cursor = self.connection.cursor()
+        # ThreadedConnectionPool raises when exhausted; make callers wait instead.
+        self._available = threading.BoundedSemaphore(max_connections)
 
         self.user_props = (
             "u.id, u.name, u.email, u.role, u.age, u.music_genre, u.gender"
@@ -29,10 +45,167 @@ class PostgressController:
         self.place_props = "l.id, l.slug, l.name, l.rating, l.price_level"
         self.metrics_props = "id, userId, tagsId, interest, label"
 
+        # Optional materialized like counts, kept current by like_place.
+        self.like_counts: Dict[str, int] | None = None
+        if os.environ.get("LIKE_COUNT_CACHE", "false").lower() == "true":
+            self.like_counts = self._load_like_counts()
+
     def get_all_users(self) -> list[User]:
-        self.cursor.execute(f"""SELECT {self.user_props} FROM users u""")
-        all_users = self.cursor.fetchall()
+        return [user for chunk in self.iter_user_chunks() for user in chunk]
+
+    def iter_user_chunks(self, chunk_size: int | None = None) -> Iterator[list[User]]:
+        """
+        Stream every user with metrics and favorites, `chunk_size` users at a
+        time, through named (server-side) cursors.
+
+        The three queries share one REPEATABLE READ snapshot and are each
+        driven by `users ORDER BY id` with LEFT JOINs, so every stream holds
+        the same users in the same order and is merged group by group instead
+        of through per-user dicts of the whole table.
+        """
+        chunk_size = chunk_size or int(os.environ.get("DB_ITERSIZE", 2000))
+
+        # Named cursors are closed before the connection goes back to the pool.
+        with self._connection() as connection, ExitStack() as cursors:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"
+                )
+
+            def stream(name: str, query: str):
+                cursor = cursors.enter_context(connection.cursor(name=name))
+                cursor.itersize = chunk_size
+                cursor.execute(query)
+                return cursor
 
+            users = stream(
+                "users_stream",
+                f"""SELECT {self.user_props} FROM users u ORDER BY u.id""",
+            )
+            metrics = stream(
+                "metrics_stream",
+                """
+                SELECT u.id, til."local_id", um.interest, t.label
+                FROM users u
+                LEFT JOIN (
+                    user_metrics um
+                    INNER JOIN tags t ON um."tagsId" = t.id
+                    INNER JOIN tags_in_locals til ON t.id = til."tag_id"
+                ) ON um."userId" = u.id
+                ORDER BY u.id
+                """,
+            )
+            favorites = stream(
+                "favorites_stream",
+                """
+                SELECT u.id, lf.local_id
+                FROM users u
+                LEFT JOIN locals_favorites lf ON lf.user_id = u.id
+                ORDER BY u.id
+                """,
+            )
+
+            chunk = []
+            for user, (metrics_id, user_metrics), (favorites_id, user_favorites) in zip(
+                users,
+                groupby(metrics, key=lambda row: row[0]),
+                groupby(favorites, key=lambda row: row[0]),
+            ):
+                if not user[0] == metrics_id == favorites_id:
+                    raise RuntimeError("User streams went out of step")
+
+                chunk.append(
+                    User(
+                        user_id=user[0],
+                        name=user[1],
+                        age=user[4],
+                        music_genre=user[5],
+                        gender=user[6],
+                        metrics=[
+                            Metrics(
+                                place_id=metric[1],
+                                user_id=user[0],
+                                interactions=metric[2],
+                                interest=metric[3],
+                            )
+                            for metric in user_metrics
+                            if metric[1] is not None
+                        ],
+                        favorite_places=[
+                            FavoritePlaces(place_id=favorite[1], user_id=user[0])
+                            for favorite in user_favorites
+                            if favorite[1] is not None
+                        ],
+                    )
+                )
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+    def get_users_by_ids(self, user_ids: list[str]) -> list[User]:
+        """Users with their metrics and favorites, in three queries total."""
+        if not user_ids:
+            return []
+        users = self._fetchall(
+            f"""SELECT {self.user_props} FROM users u WHERE u.id = ANY(%s)""",
+            (list(user_ids),),
+        )
+        return self._build_users(users)
+
+    def get_users_sharing_places(self, place_ids: list[str], limit: int) -> list[str]:
+        """
+        Ids of the users with a metric or favorite on any of `place_ids`,
+        those sharing the most first, at most `limit`.
+        """
+        if not place_ids:
+            return []
+        rows = self._fetchall(
+            """
+            SELECT shared.user_id
+            FROM (
+                SELECT um."userId" AS user_id
+                FROM user_metrics um
+                INNER JOIN tags_in_locals til ON um."tagsId" = til."tag_id"
+                WHERE til."local_id" = ANY(%s)
+                UNION ALL
+                SELECT lf.user_id
+                FROM locals_favorites lf
+                WHERE lf.local_id = ANY(%s)
+            ) shared
+            GROUP BY shared.user_id
+            ORDER BY COUNT(*) DESC
+            LIMIT %s
+            """,
+            (list(place_ids), list(place_ids), limit),
+        )
+        return [row[0] for row in rows]
+
+    def last_user_change(self) -> int:
+        """Position of the newest entry in the user change log."""
+        return self._fetchone("""SELECT COALESCE(MAX(id), 0) FROM user_changes""")[0]
+
+    def get_user_changes(self, after: int, limit: int = 10000) -> tuple[list[str], int]:
+        """
+        Ids of the users changed after position `after` of the change log
+        kept by migrations/002_user_changes.sql, at most `limit` entries, and
+        the position to read from next.
+        """
+        rows = self._fetchall(
+            """
+            SELECT id, user_id FROM user_changes
+            WHERE id > %s
+            ORDER BY id
+            LIMIT %s
+            """,
+            (after, limit),
+        )
+        if not rows:
+            return [], after
+        return list(dict.fromkeys(row[1] for row in rows)), rows[-1][0]
+
+    def _build_users(self, all_users: list[tuple]) -> list[User]:
         user_ids = [user[0] for user in all_users]
 
         # Lazy loading
@@ -53,7 +226,7 @@ class PostgressController:
         ]
 
     def get_all_metrics(self, user_ids: list[str]) -> Dict[str, list[Metrics]]:
-        self.cursor.execute(
+        metrics = self._fetchall(
             f"""
             SELECT um.id, um."userId", til."local_id", um."tagsId", um.interest, t.label
             FROM user_metrics um
@@ -63,7 +236,6 @@ class PostgressController:
             """,
             (user_ids,),
         )
-        metrics = self.cursor.fetchall()
 
         metrics_by_user = defaultdict(list)
         for metric in metrics:
@@ -78,7 +250,7 @@ class PostgressController:
         return metrics_by_user
 
     def get_all_favorites(self, user_ids: list[str]) -> Dict[str, list[FavoritePlaces]]:
-        self.cursor.execute(
+        favorites = self._fetchall(
             """
             SELECT local_id, user_id
             FROM locals_favorites 
@@ -86,7 +258,6 @@ class PostgressController:
             """,
             (user_ids,),
         )
-        favorites = self.cursor.fetchall()
 
         favorites_by_user = defaultdict(list)
         for favorite in favorites:
@@ -96,11 +267,10 @@ class PostgressController:
         return favorites_by_user
 
     def get_user_by_id(self, user_id: str) -> User:
-        self.cursor.execute(
+        user = self._fetchone(
             f"""SELECT {self.user_props} FROM users u WHERE u.id = %s""",
             (user_id,),
         )
-        user = self.cursor.fetchone()
 
         if not user:
             logger.warning("User not found.")
@@ -117,7 +287,7 @@ class PostgressController:
         )
 
     def get_user_metrics(self, user_id: str) -> list[Metrics]:
-        self.cursor.execute(
+        user_metrics = self._fetchall(
             f"""
             SELECT um.id, um."userId", til."local_id", um."tagsId", um.interest, t.label
             FROM user_metrics um
@@ -127,7 +297,6 @@ class PostgressController:
             """,
             (user_id,),
         )
-        user_metrics = self.cursor.fetchall()
         m = [
             Metrics(
                 place_id=metric[2],
@@ -140,7 +309,7 @@ class PostgressController:
         return m
 
     def get_user_favorite_places(self, user_id: str) -> list[FavoritePlaces]:
-        self.cursor.execute(
+        favorites = self._fetchall(
             """
             SELECT local_id, user_id
             FROM locals_favorites 
@@ -148,7 +317,6 @@ class PostgressController:
             """,
             (user_id,),
         )
-        favorites = self.cursor.fetchall()
 
         return [
             FavoritePlaces(place_id=favorite[0], user_id=favorite[1])
@@ -156,65 +324,315 @@ class PostgressController:
         ]
 
     def get_all_places(self) -> list[Place]:
-        self.cursor.execute(f"""SELECT {self.place_props} FROM locals l""")
-        all_places = self.cursor.fetchall()
-        return [
-            Place(
-                place_id=place[0],
-                likes=self.get_place_likes(place[0]),
-                slug=place[1],
-            )
-            for place in all_places
-        ]
+        return self._select_places()
 
     def get_top_places(self, start: int, limit: int) -> list[Place]:
-        self.cursor.execute(
-            f"""SELECT {self.place_props} FROM locals l ORDER BY l.rating DESC LIMIT %s OFFSET %s""",
-            (limit, start),
+        return self._select_places(
+            tail="ORDER BY l.rating DESC LIMIT %s OFFSET %s", params=(limit, start)
         )
-        top_places = self.cursor.fetchall()
-        return [
-            Place(
-                place_id=place[0],
-                likes=self.get_place_likes(place[0]),
-                slug=place[1],
+
+    def get_metric_place_tags(self) -> list[tuple[str, str]]:
+        """
+        (tag, place_id) of every user metric, without repeats: a user's
+        interest in a tag is a metric on each place with that tag.
+        """
+        return self._fetchall("""
+            SELECT DISTINCT t.label, til."local_id"
+            FROM tags t
+            INNER JOIN tags_in_locals til ON t.id = til."tag_id"
+            WHERE EXISTS (SELECT 1 FROM user_metrics um WHERE um."tagsId" = t.id)
+            """)
+
+    def get_place_by_id(self, place_id: str) -> Place:
+        places = self._select_places(where="WHERE l.id = %s", params=(place_id,))
+        if not places:
+            logger.warning("Place not found.")
+            return None
+        return places[0]
+
+    def get_places_by_ids(self, place_ids: list[str]) -> list[Place]:
+        if not place_ids:
+            return []
+
+        places = {
+            place.place_id: place
+            for place in self._select_places(
+                where="WHERE l.id = ANY(%s)", params=(list(place_ids),)
             )
-            for place in top_places
+        }
+        return [places[place_id] for place_id in place_ids if place_id in places]
+
+    def _select_places(
+        self, where: str = "", tail: str = "", params: tuple = ()
+    ) -> list[Place]:
+        """
+        Places and their like counts in a single statement: read from the
+        like-count cache when enabled, otherwise aggregated with a LEFT JOIN.
+        """
+        if self.like_counts is not None:
+            places = self._fetchall(
+                f"""SELECT {self.place_props} FROM locals l {where} {tail}""",
+                params,
+            )
+            return [
+                Place(
+                    place_id=place[0],
+                    likes=self.like_counts.get(place[0], 0),
+                    slug=place[1],
+                    rating=place[3],
+                )
+                for place in places
+            ]
+
+        places = self._fetchall(
+            f"""
+            SELECT {self.place_props}, COUNT(ll.local_id)
+            FROM locals l
+            LEFT JOIN locals_likes ll ON ll.local_id = l.id
+            {where}
+            GROUP BY l.id
+            {tail}
+            """,
+            params,
+        )
+        return [
+            Place(place_id=place[0], likes=place[5], slug=place[1], rating=place[3])
+            for place in places
         ]
 
-    def get_place_by_id(self, place_id: str) -> Place:
-        self.cursor.execute(
-            f"""SELECT {self.place_props} FROM locals l WHERE l.id = %s""",
-            (place_id,),
+    def _load_like_counts(self) -> Dict[str, int]:
+        like_counts = defaultdict(int)
+        like_counts.update(
+            self._fetchall(
+                """SELECT local_id, COUNT(*) FROM locals_likes GROUP BY local_id"""
+            )
         )
+        logger.info("Like-count cache loaded for %s places.", len(like_counts))
+        return like_counts
 
-        place = self.cursor.fetchone()
-        if not place:
-            logger.warning("Place not found.")
-            return None
+    def like_place(self, place_id: str, user_id: str | None = None) -> None:
+        self._execute(
+            """INSERT INTO locals_likes (local_id, user_id) VALUES (%s, %s)""",
+            (place_id, user_id),
+        )
+
+        if self.like_counts is not None:
+            self.like_counts[place_id] += 1
+
+    def like_many(self, likes: Iterable[tuple[str, str]]) -> None:
+        """Insert (place_id, user_id) likes with a single COPY."""
+        likes = list(likes)
+        with self._cursor() as cursor:
+            self._copy_rows(cursor, "locals_likes (local_id, user_id)", likes)
+
+        if self.like_counts is not None:
+            for place_id, _ in likes:
+                self.like_counts[place_id] += 1
+
+    # Metrics are counters per (user, tag): an interaction with a place adds
+    # to every tag of that place. Upserts rely on the unique index on
+    # user_metrics ("userId", "tagsId") created by
+    # migrations/001_user_metrics_unique.sql. Writes are never retried, since
+    # replaying them would count interactions twice.
+    _upsert_interactions = """
+        INSERT INTO user_metrics ("userId", "tagsId", interest)
+        SELECT s.user_id, til."tag_id", SUM(s.interactions)
+        FROM staged_interactions s
+        INNER JOIN tags_in_locals til ON til."local_id" = s.local_id
+        GROUP BY s.user_id, til."tag_id"
+        ON CONFLICT ("userId", "tagsId")
+        DO UPDATE SET interest = user_metrics.interest + EXCLUDED.interest
+    """
+
+    def interact(self, interaction: Interaction) -> None:
+        with self._cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO user_metrics ("userId", "tagsId", interest)
+                SELECT %s, til."tag_id", %s
+                FROM tags_in_locals til
+                WHERE til."local_id" = %s
+                GROUP BY til."tag_id"
+                ON CONFLICT ("userId", "tagsId")
+                DO UPDATE SET interest = user_metrics.interest + EXCLUDED.interest
+                """,
+                (interaction.user_id, interaction.interactions, interaction.place_id),
+            )
+
+    def interact_many(
+        self, interactions: Iterable[Interaction], batch_size: int | None = None
+    ) -> None:
+        """
+        COPY interactions into a staging table, `batch_size` rows at a time,
+        and upsert them with a single statement. One transaction covers the
+        whole call, so it either counts every interaction or none of them.
+        """
+        batch_size = batch_size or int(os.environ.get("DB_INGEST_BATCH", 5000))
+        interactions = iter(interactions)
+        with self._cursor() as cursor:
+            self._create_staging_table(cursor)
+            while batch := list(islice(interactions, batch_size)):
+                self._stage_interactions(
+                    cursor,
+                    (
+                        (
+                            interaction.user_id,
+                            interaction.place_id,
+                            interaction.interactions,
+                        )
+                        for interaction in batch
+                    ),
+                )
+            cursor.execute(self._upsert_interactions)
+
+    def create_user(self, data: User) -> None:
+        self.create_users([data])
+
+    def create_users(
+        self, users: Iterable[User], batch_size: int | None = None
+    ) -> None:
+        """
+        Bulk insert users, their favorites and metrics with COPY, `batch_size`
+        users at a time, in one transaction.
+        """
+        batch_size = batch_size or int(os.environ.get("DB_INGEST_BATCH", 5000))
+        users = iter(users)
+        with self._cursor() as cursor:
+            self._create_staging_table(cursor)
+            while batch := list(islice(users, batch_size)):
+                self._copy_rows(
+                    cursor,
+                    "users (id, name, age, music_genre, gender)",
+                    (
+                        (
+                            user.user_id,
+                            user.name,
+                            user.age,
+                            user.music_genre,
+                            user.gender,
+                        )
+                        for user in batch
+                    ),
+                )
+                self._copy_rows(
+                    cursor,
+                    "locals_favorites (local_id, user_id)",
+                    (
+                        (favorite.place_id, user.user_id)
+                        for user in batch
+                        for favorite in user.favorite_places or []
+                    ),
+                )
+                self._stage_interactions(
+                    cursor,
+                    (
+                        (user.user_id, metric.place_id, metric.interactions)
+                        for user in batch
+                        for metric in user.metrics or []
+                    ),
+                )
+            cursor.execute(self._upsert_interactions)
+
+    @staticmethod
+    def _create_staging_table(cursor) -> None:
+        # Built from the real columns so COPY parses ids into their own types.
+        cursor.execute("""
+            CREATE TEMP TABLE staged_interactions ON COMMIT DROP AS
+            SELECT um."userId" AS user_id, til."local_id" AS local_id,
+                   um.interest AS interactions
+            FROM user_metrics um, tags_in_locals til
+            WITH NO DATA
+            """)
 
-        return Place(
-            place_id=place[0], likes=self.get_place_likes(place[0]), slug=place[1]
+    def _stage_interactions(self, cursor, rows: Iterable[tuple]) -> None:
+        self._copy_rows(
+            cursor, "staged_interactions (user_id, local_id, interactions)", rows
         )
 
+    @staticmethod
+    def _copy_rows(cursor, target: str, rows: Iterable[tuple]) -> None:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {target} FROM STDIN WITH (FORMAT csv)", buffer)
+
     def get_place_likes(self, place_id: str) -> int:
-        self.cursor.execute(
+        likes = self._fetchone(
             """SELECT COUNT(*) FROM locals_likes WHERE local_id = %s""", (place_id,)
-        )
-        likes = self.cursor.fetchone()[0]
+        )[0]
         return likes
 
     def close_connection(self):
-        self.cursor.close()
-        self.connection.close()
+        self.pool.closeall()
         logger.info("Database connection closed.")
 
+    @contextmanager
+    def _cursor(self):
+        """Check out a pooled connection for one operation and yield a cursor."""
+        with self._connection() as connection:
+            with connection.cursor() as cursor:
+                yield cursor
+
+    @contextmanager
+    def _connection(self):
+        """
+        Check out a pooled connection for one transaction. Commits on success,
+        rolls back on errors and discards connections that turned out to be
+        broken.
+        """
+        with self._available:
+            connection = self._checkout()
+            try:
+                yield connection
+                connection.commit()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                self.pool.putconn(connection, close=True)
+                connection = None
+                raise
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                if connection is not None:
+                    self.pool.putconn(connection)
+
+    def _checkout(self):
+        connection = self.pool.getconn()
+        if connection.closed:
+            logger.warning("Discarding closed database connection.")
+            self.pool.putconn(connection, close=True)
+            connection = self.pool.getconn()
+        return connection
+
+    def _run(self, query: str, params: tuple, fetch):
+        # Reads only: one retry on a fresh connection when the first one was
+        # broken.
+        for attempt in range(2):
+            try:
+                with self._cursor() as cursor:
+                    cursor.execute(query, params)
+                    return fetch(cursor)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                if attempt:
+                    raise
+                logger.warning("Database connection lost, reconnecting: %s", e)
+
+    def _fetchall(self, query: str, params: tuple = ()) -> list[tuple]:
+        return self._run(query, params, lambda cursor: cursor.fetchall())
+
+    def _fetchone(self, query: str, params: tuple = ()) -> tuple | None:
+        return self._run(query, params, lambda cursor: cursor.fetchone())
+
+    def _execute(self, query: str, params: tuple = ()) -> None:
+        # Not retried: the connection may break after the write committed.
+        with self._cursor() as cursor:
+            cursor.execute(query, params)
+
     def get_user_page(self, page: int, items_per_page: int) -> list[User]:
-        self.cursor.execute(
+        users = self._fetchall(
             f"""SELECT {self.user_props} FROM users u LIMIT %s OFFSET %s""",
             (items_per_page, page),
         )
-        users = self.cursor.fetchall()
         return [
             User(
                 user_id=user[0],
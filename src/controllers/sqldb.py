@@ -1,6 +1,9 @@
 import sqlite3
 import logging
-from typing import Iterable
+import threading
+from itertools import islice
+from contextlib import contextmanager
+from typing import Iterable, Iterator
 from dotenv import load_dotenv
 from src.types.repository import Repository
 from src.types.basic_types import User, Interaction, Metrics, Place, Label
@@ -10,9 +13,12 @@ load_dotenv()
 
 
 class SqliteController(Repository):
+    transient_errors = (sqlite3.OperationalError,)
+
     def __init__(self, db_name: str = "database.db") -> None:
         logger.info("Database initiating")
         self.db_name = db_name
+        self._write_lock = threading.Lock()
         self._connect()
         self.__generate_tables()
         logger.info("Database initiated")
@@ -28,6 +34,19 @@ class SqliteController(Repository):
     def _disconnect(self):
         self.conn.close()
 
+    @contextmanager
+    def _transaction(self):
+        """One explicit transaction; the connection is in autocommit mode otherwise."""
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN")
+            try:
+                yield cursor
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+
     def __generate_tables(self):
         with self.conn:
             cursor = self.conn.cursor()
@@ -81,6 +100,30 @@ class SqliteController(Repository):
                 return desc.description
         return "Formando perfil"
 
+    def _user(self, cursor: sqlite3.Cursor, row: tuple) -> User:
+        # This schema keeps neither names, genders, tags nor favorites.
+        user_id, age, music_genre, perfil = row
+        cursor.execute("SELECT * FROM metrics WHERE user_id = ?", (user_id,))
+        metrics = [
+            Metrics(
+                user_id=metric[0],
+                place_id=metric[1],
+                interactions=metric[2],
+                interest=None,
+            )
+            for metric in cursor.fetchall()
+        ]
+        return User(
+            user_id=user_id,
+            name="",
+            age=age,
+            gender="",
+            music_genre=music_genre,
+            perfil=perfil,
+            metrics=metrics,
+            favorite_places=None,
+        )
+
     #! USERS
     def get_all_users(self) -> Iterable[User]:
         logger.info("Getting all users")
@@ -90,22 +133,7 @@ class SqliteController(Repository):
             cursor.execute("SELECT * FROM usuarios")
             users_data = cursor.fetchall()
             for data in users_data:
-                user_id, age, music_genre, perfil = data
-                cursor.execute("SELECT * FROM metrics WHERE user_id = ?", (user_id,))
-                metrics_data = cursor.fetchall()
-                metrics = [
-                    Metrics(user_id=row[0], place_id=row[1], interactions=row[2])
-                    for row in metrics_data
-                ]
-                users.append(
-                    User(
-                        user_id=user_id,
-                        age=age,
-                        music_genre=music_genre,
-                        perfil=perfil,
-                        metrics=metrics,
-                    )
-                )
+                users.append(self._user(cursor, data))
         logger.info("Returning %s users", len(users))
         return users
 
@@ -119,42 +147,48 @@ class SqliteController(Repository):
             )
             users_data = cursor.fetchall()
             for data in users_data:
-                user_id, age, music_genre, perfil = data
-                cursor.execute("SELECT * FROM metrics WHERE user_id = ?", (user_id,))
-                metrics_data = cursor.fetchall()
-                metrics = [
-                    Metrics(user_id=row[0], place_id=row[1], interactions=row[2])
-                    for row in metrics_data
-                ]
-                users.append(
-                    User(
-                        user_id=user_id,
-                        age=age,
-                        music_genre=music_genre,
-                        perfil=perfil,
-                        metrics=metrics,
-                    )
-                )
+                users.append(self._user(cursor, data))
         return users
 
+    def iter_user_chunks(self, chunk_size: int = 500) -> Iterator[list[User]]:
+        offset = 0
+        while True:
+            users = self.get_page(quantity=chunk_size, off_set=offset)
+            if not users:
+                return
+            yield users
+            offset += len(users)
+
     def create_user(self, data: User) -> None:
         logger.info("Creating user data")
-        with self.conn:
-            cursor = self.conn.cursor()
-            cursor.execute(
-                """
-                INSERT OR IGNORE INTO usuarios (user_id, age, music_genre, perfil) VALUES (?, ?, ?, ?)
-            """,
-                (data.user_id, data.age, data.music_genre, data.perfil),
-            )
-            for metric in data.metrics:
-                cursor.execute(
+        self.create_users([data])
+
+    def create_users(self, users: Iterable[User], batch_size: int = 1000) -> None:
+        """Insert users and their metrics, one transaction per `batch_size` users."""
+        users = iter(users)
+        while batch := list(islice(users, batch_size)):
+            with self._transaction() as cursor:
+                cursor.executemany(
                     """
-                    INSERT OR REPLACE INTO metrics (user_id, place_id, interactions) VALUES (?, ?, ?)
+                    INSERT OR IGNORE INTO usuarios (user_id, age, music_genre, perfil)
+                    VALUES (?, ?, ?, ?)
                 """,
-                    (metric.user_id, metric.place_id, metric.interactions),
+                    [
+                        (data.user_id, data.age, data.music_genre, data.perfil)
+                        for data in batch
+                    ],
+                )
+                cursor.executemany(
+                    """
+                    INSERT OR REPLACE INTO metrics (user_id, place_id, interactions)
+                    VALUES (?, ?, ?)
+                """,
+                    [
+                        (metric.user_id, metric.place_id, metric.interactions)
+                        for data in batch
+                        for metric in data.metrics or []
+                    ],
                 )
-            self.conn.commit()
 
     def get_user_by_id(self, user_id: str) -> User:
         logger.info("Getting user from database")
@@ -163,27 +197,39 @@ class SqliteController(Repository):
             cursor.execute("SELECT * FROM usuarios WHERE user_id = ?", (user_id,))
             user_data = cursor.fetchone()
             if user_data:
-                user_id, age, music_genre, perfil = user_data
-                cursor.execute("SELECT * FROM metrics WHERE user_id = ?", (user_id,))
-                metrics_data = cursor.fetchall()
-                metrics = [
-                    Metrics(user_id=row[0], place_id=row[1], interactions=row[2])
-                    for row in metrics_data
-                ]
-                user = User(
-                    user_id=user_id,
-                    age=age,
-                    music_genre=music_genre,
-                    perfil=perfil,
-                    metrics=metrics,
-                )
-                return user
+                return self._user(cursor, user_data)
         return None
 
-    def update_user(self, user_id: str, data: User) -> None:
-        logger.info("Updating user data")
+    def get_users_by_ids(self, user_ids: list[str]) -> Iterable[User]:
+        users = [self.get_user_by_id(user_id) for user_id in user_ids]
+        return [user for user in users if user is not None]
+
+    def get_users_sharing_places(self, place_ids: list[str], limit: int) -> list[str]:
+        """
+        Ids of the users with a metric on any of `place_ids`, those sharing
+        the most first, at most `limit`.
+        """
+        if not place_ids:
+            return []
+
         with self.conn:
             cursor = self.conn.cursor()
+            placeholders = ", ".join("?" for _ in place_ids)
+            cursor.execute(
+                f"""
+                SELECT user_id FROM metrics
+                WHERE place_id IN ({placeholders})
+                GROUP BY user_id
+                ORDER BY COUNT(*) DESC
+                LIMIT ?
+            """,
+                (*place_ids, limit),
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def update_user(self, user_id: str, data: User) -> None:
+        logger.info("Updating user data")
+        with self._transaction() as cursor:
             cursor.execute(
                 """
                 UPDATE usuarios SET age = ?, music_genre = ?, perfil = ? WHERE user_id = ?
@@ -191,14 +237,16 @@ class SqliteController(Repository):
                 (data.age, data.music_genre, data.perfil, user_id),
             )
             cursor.execute("DELETE FROM metrics WHERE user_id = ?", (user_id,))
-            for metric in data.metrics:
-                cursor.execute(
-                    """
-                    INSERT OR REPLACE INTO metrics (user_id, place_id, interactions) VALUES (?, ?, ?)
-                """,
-                    (metric.user_id, metric.place_id, metric.interactions),
-                )
-            self.conn.commit()
+            cursor.executemany(
+                """
+                INSERT OR REPLACE INTO metrics (user_id, place_id, interactions)
+                VALUES (?, ?, ?)
+            """,
+                [
+                    (metric.user_id, metric.place_id, metric.interactions)
+                    for metric in data.metrics or []
+                ],
+            )
 
     def delete_user(self, user_id: str) -> None:
         logger.info("Deleting user data")
@@ -227,6 +275,10 @@ class SqliteController(Repository):
             ]
         return places
 
+    def get_metric_place_tags(self) -> list[tuple[str, str]]:
+        # Metrics here have no tags: short pages are filled by rating alone.
+        return []
+
     def create_place(self, place: Place) -> None:
         logger.info("Creating place data")
         with self.conn:
@@ -263,6 +315,23 @@ class SqliteController(Repository):
                 return place
         return None
 
+    def get_places_by_ids(self, place_ids: list[str]) -> Iterable[Place]:
+        if not place_ids:
+            return []
+
+        with self.conn:
+            cursor = self.conn.cursor()
+            placeholders = ", ".join("?" for _ in place_ids)
+            cursor.execute(
+                f"SELECT place_id, name, likes FROM places WHERE place_id IN ({placeholders})",
+                tuple(place_ids),
+            )
+            places = {
+                row[0]: Place(place_id=row[0], slug=row[1], likes=row[2])
+                for row in cursor.fetchall()
+            }
+        return [places[place_id] for place_id in place_ids if place_id in places]
+
     def update_place(self, place_id: str, place: Place) -> None:
         logger.info("Updating place data")
         with self.conn:
@@ -289,20 +358,56 @@ class SqliteController(Repository):
             cursor.execute("DELETE FROM places WHERE place_id = ?", (place_id,))
             self.conn.commit()
 
+    def like_place(self, place_id: str, user_id: str | None = None) -> None:
+        logger.info("Liking a place")
+        with self.conn:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                "UPDATE places SET likes = likes + 1 WHERE place_id = ?", (place_id,)
+            )
+            self.conn.commit()
+
+    def like_many(self, likes: Iterable[tuple[str, str]]) -> None:
+        logger.info("Liking places in batch")
+        counts = {}
+        for place_id, _ in likes:
+            counts[place_id] = counts.get(place_id, 0) + 1
+        with self._transaction() as cursor:
+            cursor.executemany(
+                "UPDATE places SET likes = likes + ? WHERE place_id = ?",
+                [(count, place_id) for place_id, count in counts.items()],
+            )
+
     def interact(self, rate_place: Interaction) -> None:
         logger.info("Interaction with a place")
-        user = self.get_user_by_id(rate_place.user_id)
-        if user:
-            for metric in user.metrics:
-                if metric.place_id == rate_place.place_id:
-                    metric.interactions += rate_place.interactions
-                    break
-            else:
-                user.metrics.append(
-                    Metrics(
-                        user_id=rate_place.user_id,
-                        place_id=rate_place.place_id,
-                        interactions=rate_place.interactions,
-                    )
+        self.interact_many([rate_place])
+
+    def interact_many(
+        self, interactions: Iterable[Interaction], batch_size: int = 1000
+    ) -> None:
+        """
+        Add each interaction to the user's counter for the place with a single
+        upsert, `batch_size` interactions at a time, in one transaction.
+        Interactions of unknown users are ignored.
+        """
+        interactions = iter(interactions)
+        with self._transaction() as cursor:
+            while batch := list(islice(interactions, batch_size)):
+                cursor.executemany(
+                    """
+                    INSERT INTO metrics (user_id, place_id, interactions)
+                    SELECT ?, ?, ?
+                    WHERE EXISTS (SELECT 1 FROM usuarios WHERE user_id = ?)
+                    ON CONFLICT (user_id, place_id)
+                    DO UPDATE SET interactions = interactions + excluded.interactions
+                """,
+                    [
+                        (
+                            rate_place.user_id,
+                            rate_place.place_id,
+                            rate_place.interactions,
+                            rate_place.user_id,
+                        )
+                        for rate_place in batch
+                    ],
                 )
-            self.update_user(rate_place.user_id, user)
@@ -0,0 +1,23 @@
+import os
+from typing import Optional
+from src.dependencies.db import db_controller
+from src.dependencies.model import RecommendationModelSingleton
+from src.controllers.interaction_buffer import InteractionBuffer
+
+# Write-behind buffer for interactions and likes. INTERACTION_BUFFER=false
+# makes those routes write to the database synchronously again.
+interaction_buffer: Optional[InteractionBuffer] = None
+if os.environ.get("INTERACTION_BUFFER", "true").lower() == "true":
+    interaction_buffer = InteractionBuffer(
+        db_controller,
+        flush_size=int(os.environ.get("INTERACTION_FLUSH_SIZE", 500)),
+        flush_interval=float(os.environ.get("INTERACTION_FLUSH_SECONDS", 1.0)),
+        max_pending=int(os.environ.get("INTERACTION_MAX_PENDING", 50_000)),
+        on_add=RecommendationModelSingleton.record_interactions,
+        on_flush=RecommendationModelSingleton.interactions_flushed,
+        on_drop=RecommendationModelSingleton.interactions_dropped,
+    )
+
+
+def get_interaction_buffer() -> Optional[InteractionBuffer]:
+    return interaction_buffer
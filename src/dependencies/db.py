@@ -1,18 +1,43 @@
-from src.controllers.moodydb import PostgressController
-from typing import Generator
+import os
 import logging
+from typing import Generator
+from src.types.repository import AsyncRepository, Repository
+from src.models.metrics import TimedRepository
 
 logger = logging.getLogger("app_logger")
 
 
-db_controller = PostgressController()
-logger.info("Connection opened.")
+# DB_BACKEND=memory serves everything from process memory, so the whole app
+# runs without a database (load tests, benchmarks). Every repository call
+# is timed for /metrics either way.
+if os.environ.get("DB_BACKEND", "postgres").lower() == "memory":
+    from src.controllers.memorydb import AsyncMemoryController, MemoryController
+
+    memory_controller = MemoryController()
+    db_controller = TimedRepository(memory_controller)
+    logger.info("Using the in-memory database.")
+
+    async_db_controller = TimedRepository(AsyncMemoryController(memory_controller))
+else:
+    from src.controllers.moodydb import PostgressController
+    from src.controllers.async_moodydb import AsyncPostgressController
 
+    db_controller = TimedRepository(PostgressController())
+    logger.info("Connection opened.")
 
-def get_db_controller() -> Generator[PostgressController, None, None]:
+    async_db_controller = TimedRepository(AsyncPostgressController())
+
+
+def get_db_controller() -> Generator[Repository, None, None]:
     try:
         logger.debug("Returning db_controller.")
         yield db_controller
 
     except Exception as e:
         logger.error(f"Error: {e}")
+        raise
+
+
+async def get_async_db_controller() -> AsyncRepository:
+    # The pool is opened once by the app's lifespan, before any request.
+    return async_db_controller
@@ -0,0 +1,12 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Bounded pool for CPU-heavy work (NumPy scoring) so it never runs on the
+# event loop and at most this many requests compete for cores at once.
+cpu_executor = ThreadPoolExecutor(
+    max_workers=int(
+        # cpu_count() is None when the platform cannot tell.
+        os.environ.get("CPU_EXECUTOR_WORKERS", min(4, os.cpu_count() or 1))
+    ),
+    thread_name_prefix="cpu-bound",
+)
@@ -0,0 +1,46 @@
+import os
+import time
+import queue
+import logging
+from fastapi import Request
+from logging.handlers import QueueHandler, QueueListener
+
+logger = logging.getLogger("app_logger")
+
+LOG_FORMAT = "%(asctime)s | %(levelname)s | %(message)s"
+LOG_DATE_FORMAT = "%Y-%m-%d | %H:%M:%S |"
+
+
+def configure_logging() -> QueueListener:
+    """
+    Log at LOG_LEVEL (default INFO) to LOG_FILE (default app.log) without
+    blocking: loggers only put records on a queue, and the returned
+    listener writes them to the file from its own thread. Stop it on
+    shutdown to flush what is still queued.
+    """
+    handler = logging.FileHandler(os.environ.get("LOG_FILE", "app.log"))
+    handler.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    listener.start()
+    return listener
+
+
+async def log_request_timing(request: Request, call_next):
+    """One line per request with its status and wall time."""
+    started = time.perf_counter()
+    response = await call_next(request)
+    logger.info(
+        "%s %s %s %.1fms",
+        request.method,
+        request.url.path,
+        response.status_code,
+        (time.perf_counter() - started) * 1000,
+    )
+    return response
@@ -0,0 +1,46 @@
+import time
+from typing import Dict
+from fastapi import APIRouter, Request
+from src.models.metrics import (
+    HTTP_REQUEST_SECONDS,
+    HTTP_REQUESTS,
+    HTTP_REQUESTS_IN_PROGRESS,
+)
+
+# Router prefixes by route id: the matched route only knows its path within
+# its router, which would leave "/user/create" and "/place/create" as one
+# "/create" series.
+_route_prefixes: Dict[int, str] = {}
+
+
+def register_route_prefix(router: APIRouter, prefix: str) -> None:
+    """Label the routes of `router`, included under `prefix`, with full paths."""
+    for route in router.routes:
+        _route_prefixes[id(route)] = prefix
+
+
+def route_label(request: Request) -> str:
+    # The template, not the path: user ids would make a series each.
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    return _route_prefixes.get(id(route), "") + route.path
+
+
+async def record_request_metrics(request: Request, call_next):
+    """Latency, status and in-flight count per route template."""
+    method = request.method
+    HTTP_REQUESTS_IN_PROGRESS.inc(method=method)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_REQUESTS_IN_PROGRESS.dec(method=method)
+        route = route_label(request)
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started, method=method, route=route
+        )
+        HTTP_REQUESTS.inc(method=method, route=route, status=status)
@@ -1,18 +1,48 @@
+import threading
 from fastapi import Depends
-from typing import Generator, Optional
+from typing import Dict, Generator, List, Optional, Tuple
+from src.types.basic_types import Interaction
 from src.dependencies.db import get_db_controller
 from src.models.custom_recommendation_model import CustomRecommendationModel
 
 
 class RecommendationModelSingleton:
     _instance: Optional[CustomRecommendationModel] = None
+    # The first request and the scheduler's warm-up job may race to build it.
+    _lock = threading.Lock()
 
     @classmethod
     def get_instance(cls, db_controller) -> CustomRecommendationModel:
         if cls._instance is None:
-            cls._instance = CustomRecommendationModel(db_controller=db_controller)
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = CustomRecommendationModel(
+                        db_controller=db_controller
+                    )
         return cls._instance
 
+    @classmethod
+    def invalidate_user(cls, user_id: str):
+        # Nothing is cached before the model is first built.
+        if cls._instance is not None:
+            cls._instance.invalidate_user(user_id)
+
+    @classmethod
+    def record_interactions(cls, interactions: List[Interaction]):
+        # A model built later loads the interactions from the database.
+        if cls._instance is not None:
+            cls._instance.record_interactions(interactions)
+
+    @classmethod
+    def interactions_flushed(cls, interactions: Dict[Tuple[str, str], int]):
+        if cls._instance is not None:
+            cls._instance.interactions_flushed(interactions)
+
+    @classmethod
+    def interactions_dropped(cls, interactions: Dict[Tuple[str, str], int]):
+        if cls._instance is not None:
+            cls._instance.interactions_dropped(interactions)
+
 
 def get_recommendation_model(
     db_controller=Depends(get_db_controller),
@@ -0,0 +1,14 @@
+import os
+from src.models.profiling import ProfileStore, StackSampler
+
+# Profiles captured with the X-Profile header or ?profile= on a
+# recommendation request, read back through /admin/profile/requests.
+profile_store = ProfileStore(max_entries=int(os.environ.get("PROFILE_STORE_SIZE", 50)))
+
+# Background sampler over all threads. PROFILE_SAMPLER=true starts it with
+# the app; /admin/profile/sampler/start starts it later.
+sampler = StackSampler(
+    interval=float(os.environ.get("PROFILE_SAMPLER_INTERVAL_MS", 10)) / 1000
+)
+if os.environ.get("PROFILE_SAMPLER", "false").lower() == "true":
+    sampler.start()
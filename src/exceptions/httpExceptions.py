@@ -1,2 +1,6 @@
 class NotFoundException(Exception):
     pass
+
+
+class ServiceUnavailableException(Exception):
+    pass
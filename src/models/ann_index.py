@@ -0,0 +1,270 @@
+import copy
+import time
+import logging
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from src.types.basic_types import User
+from src.models.similarity_engine import (
+    SimilarityEngine,
+    UserFeatureMatrix,
+    select_top_k,
+)
+
+logger = logging.getLogger("app_logger")
+
+AGE_CENTER = 40
+AGE_SCALE = 25
+BUILD_CHUNK_SIZE = 4096
+USERS_PER_BUCKET = 300
+
+# Weight of each feature block in the embedding. The sparse blocks are
+# L2-normalized per user first, so a long history doesn't drown the rest.
+EMBEDDING_WEIGHTS = {
+    "places": 1.0,
+    "favorites": 1.0,
+    "tags": 1.0,
+    "ages": 1.0,
+}
+
+
+class RandomProjection:
+    """
+    Gaussian projection vector per column code of one feature block, drawn
+    on demand since vocabularies keep growing after the index is built.
+    """
+
+    def __init__(self, n_bits: int, seed: int):
+        self.n_bits = n_bits
+        self._rng = np.random.default_rng(seed)
+        self._rows = np.empty((0, n_bits))
+        self._lock = threading.Lock()
+
+    def rows(self, n_cols: int) -> np.ndarray:
+        matrix = self._rows
+        if len(matrix) < n_cols:
+            with self._lock:
+                matrix = self._rows
+                if len(matrix) < n_cols:
+                    grow = max(n_cols, 2 * len(matrix)) - len(matrix)
+                    matrix = np.vstack(
+                        [matrix, self._rng.standard_normal((grow, self.n_bits))]
+                    )
+                    self._rows = matrix
+        return matrix
+
+
+class LSHIndex:
+    """
+    Approximate nearest neighbors by random-projection LSH (SimHash).
+
+    Music genre and gender are exact-match terms worth a third of the score,
+    so they are part of every bucket key rather than hashed. The rest of a
+    user is embedded as the weighted sum of random projections of their
+    places, favorites, tags and age bucket, and the signs of `n_tables` x
+    `n_bits` projections complete one bucket key per table. A query collects
+    the users sharing its bucket in any table, plus the `probes` neighboring
+    buckets per table (its least certain bits flipped), and only those
+    candidates are scored exactly. With fewer than k candidates it falls
+    back to the exact search.
+
+    More tables or probes raise recall and latency; more bits per table
+    shrink the buckets. `keys[row, table]` is the current key of each row:
+    `inserted` leaves old bucket entries behind and queries skip them.
+    """
+
+    def __init__(self, n_tables: int, n_bits: int, probes: int, seed: int = 0):
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.probes = probes
+        self.projections = {
+            name: RandomProjection(n_tables * n_bits, seed + offset)
+            for offset, name in enumerate(EMBEDDING_WEIGHTS)
+        }
+        self.keys = np.empty((0, n_tables), dtype=np.int64)
+        self.buckets: List[Dict[int, np.ndarray]] = [{} for _ in range(n_tables)]
+        self.has_stale_entries = False
+
+    @classmethod
+    def build(
+        cls,
+        features: UserFeatureMatrix,
+        n_tables: int = 16,
+        n_bits: Optional[int] = None,
+        probes: int = 3,
+        seed: int = 0,
+    ) -> "LSHIndex":
+        started = time.perf_counter()
+        n_bits = n_bits or default_bits(features.n_users)
+        index = cls(n_tables, n_bits, probes, seed)
+        index.keys = index._hash_rows(features, np.arange(features.n_users))
+        rows = np.arange(features.n_users)
+        index.buckets = [
+            _group(index.keys[:, table], rows) for table in range(n_tables)
+        ]
+        logger.info(
+            "Built LSH index for %s users (%s tables x %s bits) in %.2fs",
+            features.n_users,
+            n_tables,
+            n_bits,
+            time.perf_counter() - started,
+        )
+        return index
+
+    def inserted(self, features: UserFeatureMatrix, rows: np.ndarray) -> "LSHIndex":
+        """
+        Copy with `rows` of `features` (new or changed users) hashed in.
+        Buckets are copied per table, not per entry, so this is cheap.
+        """
+        updated = copy.copy(self)
+        updated.keys = np.zeros((features.n_users, self.n_tables), dtype=np.int64)
+        updated.keys[: len(self.keys)] = self.keys
+        updated.buckets = [dict(buckets) for buckets in self.buckets]
+        if not len(rows):
+            return updated
+
+        rows = np.asarray(rows, dtype=np.int64)
+        changed = rows[rows < len(self.keys)]
+        updated.keys[rows] = self._hash_rows(features, rows)
+        if np.any(updated.keys[changed] != self.keys[changed]):
+            updated.has_stale_entries = True
+        for table, buckets in enumerate(updated.buckets):
+            for key, new_rows in _group(updated.keys[rows, table], rows).items():
+                old_rows = buckets.get(key)
+                buckets[key] = (
+                    new_rows if old_rows is None else np.union1d(old_rows, new_rows)
+                )
+        return updated
+
+    def top_k(
+        self, engine: SimilarityEngine, user: User, k: int, min_similarity: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Same contract as `SimilarityEngine.top_k`, scoring only candidates."""
+        features = engine.features
+        query = features.encode([user])
+        rows = self.candidates(query)
+        # The engine may be older than this index, or have deactivated rows.
+        rows = rows[rows < features.n_users]
+        rows = rows[features.active[rows]]
+        own_row = features.row_by_user_id.get(user.user_id)
+        if own_row is not None:
+            rows = rows[rows != own_row]
+        if len(rows) < k:
+            return engine.top_k(user, k, min_similarity)
+
+        # Candidates are sorted by row, so ties keep row order like the exact path.
+        positions, scores = select_top_k(
+            engine.score_candidates(query, rows), k, min_similarity
+        )
+        return rows[positions], scores
+
+    def candidates(self, query: tuple) -> np.ndarray:
+        """Sorted rows that share a probed bucket with the encoded query user."""
+        projected = self._project(query)[0].reshape(self.n_tables, self.n_bits)
+        keys = self._keys(projected > 0, query[5], query[6])[0]
+        # Bits closest to zero are the likeliest to differ for a neighbor.
+        flipped = np.argsort(np.abs(projected), axis=1)[:, : self.probes]
+        probe_keys = np.column_stack([keys, keys[:, None] ^ (1 << flipped)])
+
+        found = np.zeros(len(self.keys), dtype=bool)
+        for table, buckets in enumerate(self.buckets):
+            for key in probe_keys[table].tolist():
+                bucket = buckets.get(key)
+                if bucket is None:
+                    continue
+                if self.has_stale_entries:
+                    bucket = bucket[self.keys[bucket, table] == key]
+                found[bucket] = True
+        return np.flatnonzero(found)
+
+    def _hash_rows(self, features: UserFeatureMatrix, rows: np.ndarray) -> np.ndarray:
+        keys = np.empty((len(rows), self.n_tables), dtype=np.int64)
+        for start in range(0, len(rows), BUILD_CHUNK_SIZE):
+            chunk = rows[start : start + BUILD_CHUNK_SIZE]
+            encoded = features.take(chunk)
+            projected = self._project(encoded)
+            keys[start : start + len(chunk)] = self._keys(
+                projected.reshape(len(chunk), self.n_tables, self.n_bits) > 0,
+                encoded[5],
+                encoded[6],
+            )
+        return keys
+
+    def _keys(
+        self, bits: np.ndarray, genres: np.ndarray, genders: np.ndarray
+    ) -> np.ndarray:
+        """Bucket key per user and table: (genre, gender, packed sign bits)."""
+        packed = bits.astype(np.int64) @ (1 << np.arange(self.n_bits, dtype=np.int64))
+        # +1 so the -1 of values the vocabulary has never seen stays apart.
+        stratum = ((genres.astype(np.int64) + 1) << 16) | (genders + 1)
+        return (stratum[:, None] << self.n_bits) | packed
+
+    def _project(self, encoded: tuple) -> np.ndarray:
+        """Embedding of each encoded user, projected: (users, tables * bits)."""
+        places, favorites, tags, _, ages, _, _ = encoded
+        n_users = len(ages)
+        projected = np.zeros((n_users, self.n_tables * self.n_bits))
+
+        for name, sparse in (
+            ("places", places),
+            ("favorites", favorites),
+            ("tags", tags),
+        ):
+            columns, owner = sparse.expand(np.arange(n_users))
+            if not len(columns):
+                continue
+            lengths = sparse.row_lengths()
+            weights = EMBEDDING_WEIGHTS[name] / np.sqrt(lengths[owner])
+            vectors = self.projections[name].rows(int(columns.max()) + 1)[columns]
+            nonempty = np.flatnonzero(lengths)
+            starts = (np.cumsum(lengths) - lengths)[nonempty]
+            projected[nonempty] += np.add.reduceat(
+                vectors * weights[:, None], starts, axis=0
+            )
+
+        # Age along one direction, so close ages stay close after hashing.
+        direction = self.projections["ages"].rows(1)[0]
+        projected += EMBEDDING_WEIGHTS["ages"] * np.outer(
+            (ages - AGE_CENTER) / AGE_SCALE, direction
+        )
+        return projected
+
+
+def default_bits(n_users: int) -> int:
+    """Bits per table for about USERS_PER_BUCKET users per sign pattern."""
+    return int(np.clip(round(np.log2(max(n_users, 1) / USERS_PER_BUCKET)), 4, 24))
+
+
+def _group(keys: np.ndarray, rows: np.ndarray) -> Dict[int, np.ndarray]:
+    """Bucket key -> sorted rows with that key."""
+    order = np.lexsort((rows, keys))
+    unique, starts = np.unique(keys[order], return_index=True)
+    return dict(zip(unique.tolist(), np.split(rows[order], starts[1:])))
+
+
+def recall_at_k(
+    engine: SimilarityEngine,
+    index: LSHIndex,
+    users: Sequence[User],
+    k: int,
+    min_similarity: float,
+) -> float:
+    """
+    Fraction of the exact top-k neighbors the index also returns, over
+    `users`. A tie at the k-th score counts as found when the index
+    returned any user with that score.
+    """
+    found = 0
+    expected = 0
+    for user in users:
+        exact_rows, exact_scores = engine.top_k(user, k, min_similarity)
+        ann_rows, ann_scores = index.top_k(engine, user, k, min_similarity)
+        if not len(exact_rows):
+            continue
+        kth = exact_scores[-1]
+        found += len(np.intersect1d(exact_rows[exact_scores > kth], ann_rows))
+        found += min(
+            np.count_nonzero(exact_scores == kth), np.count_nonzero(ann_scores == kth)
+        )
+        expected += len(exact_rows)
+    return found / expected if expected else 1.0
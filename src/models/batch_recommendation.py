@@ -0,0 +1,109 @@
+import os
+import time
+import shutil
+import logging
+import multiprocessing
+import tempfile
+import numpy as np
+from typing import List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from src.models.similarity_engine import SimilarityEngine
+from src.models.place_ranking import rank_places
+from src.models.neighbor_index import default_chunk_size, select_top_k_rows
+
+logger = logging.getLogger("app_logger")
+
+# Engine opened by each worker process over the memory-mapped arrays.
+_worker_engine: Optional[SimilarityEngine] = None
+
+
+def _mp_context():
+    # Not fork: the server is multithreaded, and a forked child inherits locks
+    # other threads held at fork time, such as the logging handlers'.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+
+
+def _init_worker(directory: str):
+    global _worker_engine
+    _worker_engine = SimilarityEngine.load_arrays(directory)
+
+
+def _recommend_shard(
+    start: int, stop: int, k: int, min_similarity: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[Tuple[List[int], List[float]]]]:
+    """Neighbors, ranked place codes and their scores for users `start` to `stop`."""
+    engine = _worker_engine
+    rows = np.arange(start, stop)
+    neighbors, scores = select_top_k_rows(engine.score_rows(rows), k, min_similarity)
+    rankings = []
+    for user_neighbors, user_scores in zip(neighbors, scores):
+        found = user_neighbors >= 0
+        codes, place_scores = rank_places(
+            engine.features,
+            user_neighbors[found].astype(np.int64),
+            user_scores[found].astype(np.float64),
+        )
+        rankings.append((codes.tolist(), place_scores.tolist()))
+    return rows, neighbors, scores, rankings
+
+
+def recommend_in_parallel(
+    engine: SimilarityEngine,
+    k: int,
+    min_similarity: float,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+):
+    """
+    Shard every user across a process pool. Workers memory-map the feature
+    arrays from a temporary directory instead of receiving pickled copies.
+
+    Yields (row, neighbor rows, neighbor scores, (ranked place codes, their
+    scores)) per user.
+    """
+    n_users = engine.features.n_users
+    workers = workers or int(os.environ.get("RECOMMENDATION_WORKERS", os.cpu_count()))
+    chunk_size = chunk_size or default_chunk_size(n_users)
+
+    directory = tempfile.mkdtemp(prefix="moody-features-")
+    try:
+        engine.save_arrays(directory)
+        logger.info(
+            "Batch recommendation for %s users with %s workers", n_users, workers
+        )
+        started = time.perf_counter()
+        done = 0
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=_mp_context(),
+            initializer=_init_worker,
+            initargs=(directory,),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _recommend_shard,
+                    start,
+                    min(start + chunk_size, n_users),
+                    k,
+                    min_similarity,
+                )
+                for start in range(0, n_users, chunk_size)
+            ]
+            for future in as_completed(futures):
+                rows, neighbors, scores, rankings = future.result()
+                yield from zip(rows, neighbors, scores, rankings)
+
+                done += len(rows)
+                elapsed = time.perf_counter() - started
+                logger.info(
+                    "Batch recommendation: %s/%s users (%.1f users/s)",
+                    done,
+                    n_users,
+                    done / elapsed if elapsed > 0 else 0.0,
+                )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -1,28 +1,138 @@
 import os
+import asyncio
+import tempfile
 import logging
 import threading
 import numpy as np
-from typing import List, Dict, Optional
-from collections import defaultdict
-from src.types.repository import Repository
-from src.types.basic_types import User, PlaceDTO
+from concurrent.futures import Executor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from collections import Counter, defaultdict
+from src.types.repository import AsyncRepository, Repository
+from src.types.basic_types import User, Place, PlaceDTO, Metrics, Interaction
 from src.exceptions.httpExceptions import NotFoundException
-from src.controllers.cache import CacheWithTTL
+from src.controllers.cache_backends import (
+    CacheBackend,
+    NetworkCacheClient,
+    create_cache,
+)
+from src.models.similarity_engine import SimilarityEngine, UserFeatureMatrix
+from src.models.user_store import UserStore, UserView
+from src.models.neighbor_index import NeighborIndex
+from src.models.ann_index import LSHIndex
+from src.models.batch_recommendation import recommend_in_parallel
+from src.models.place_ranking import rank_places
+from src.models.popularity_index import PopularityIndex
+from src.models.hot_set import HotSet
+from src.models.stage_timer import StageTimer
+from src.models.metrics import RECOMMEND_STAGE_SECONDS
 
 logger = logging.getLogger("app_logger")
 
+SIMILARITY_MODES = ("exact", "ann")
+LOAD_MODES = ("eager", "lazy")
+
+
+def _fingerprint(user: User) -> tuple:
+    """What the model encodes of a user, independent of row order."""
+    return (
+        user.name,
+        user.age,
+        user.gender,
+        user.music_genre,
+        sorted(
+            (metric.place_id, metric.interactions, metric.interest or "")
+            for metric in user.metrics or []
+        ),
+        sorted({favorite.place_id for favorite in user.favorite_places or []}),
+    )
+
 
 class CustomRecommendationModel:
-    def __init__(self, db_controller: Repository):
+    def __init__(
+        self,
+        db_controller: Repository,
+        cache_client: Optional[NetworkCacheClient] = None,
+        similarity_mode: Optional[str] = None,
+        load_mode: Optional[str] = None,
+    ):
         logger.info("Initializing recommendation model")
         self.db_controller = db_controller
-        self.user_data = self._load_user_data()
-        self.similarity_cache = CacheWithTTL(ttl=300)
-        self.recommendation_cache = CacheWithTTL(ttl=300)
+
+        # "eager" loads every user up front; "lazy" starts empty and loads
+        # each requested user's neighborhood on demand (see `_load_neighborhood`).
+        self.load_mode = load_mode or os.environ.get(
+            "RECOMMENDATION_LOAD_MODE", "eager"
+        )
+        if self.load_mode not in LOAD_MODES:
+            raise ValueError(f"Unknown load mode: {self.load_mode}")
+        self.hot_set: Optional[HotSet] = None
+        if self.load_mode == "lazy":
+            self.hot_set = HotSet(int(os.environ.get("LAZY_HOT_USERS", 1000)))
+        self.neighborhood_size = int(os.environ.get("LAZY_NEIGHBORHOOD_SIZE", 500))
+        self._load_lock = threading.RLock()
+
+        # Read before the users, so changes made while they load are pulled
+        # again by the first `refresh_users`. None when the repository keeps
+        # no change log: then only `reconcile_users` sees outside writes.
+        self._change_cursor: Optional[int] = self.db_controller.last_user_change()
+
+        # The feature matrix doubles as the columnar user store: no User
+        # objects are kept once it is built.
+        self.similarity_engine = SimilarityEngine(
+            UserFeatureMatrix(self._load_users() if self.hot_set is None else ())
+        )
+        # Cached values hold user ids, not User objects, so any backend
+        # (including ones shared between processes) can store them.
+        self.similarity_cache = create_cache("similarity", 300, cache_client)
+        self.recommendation_cache = create_cache("recommendation", 300, cache_client)
+        # Rankings of every user from `recommend_all_users`, kept apart so the
+        # request caches above neither evict them nor expire them early.
+        self._cache_client = cache_client
+        self.batch_recommendations: Optional[CacheBackend] = None
+        self.batch_ttl = (
+            float(os.environ.get("BATCH_RECOMMENDATION_TTL_HOURS", 4)) * 3600
+        )
+        self.cache_hits = 0
+        self.cache_misses = 0
 
         self.similarity_min = float(os.environ.get("SIMILARITY2", 0.1))
 
-        logger.info("Loaded %s users", len(self.user_data))
+        # Generated data lives outside the checkout; /tmp is also the only
+        # writable directory on serverless hosts.
+        self.neighbor_index_path = os.environ.get(
+            "NEIGHBOR_INDEX_PATH",
+            os.path.join(
+                os.environ.get("DATA_DIR", tempfile.gettempdir()), "neighbor_index.npz"
+            ),
+        )
+        self.neighbor_index_k = int(os.environ.get("NEIGHBOR_INDEX_K", 20))
+        self.neighbor_index = NeighborIndex.load(self.neighbor_index_path)
+
+        # "exact" scores everyone per query; "ann" only the LSH candidates.
+        self.ann_index: Optional[LSHIndex] = None
+        self.similarity_mode = "exact"
+        self.set_similarity_mode(
+            similarity_mode or os.environ.get("SIMILARITY_MODE", "exact")
+        )
+
+        # Places that fill short pages, rebuilt by `refresh_popularity`.
+        self.popularity: Optional[PopularityIndex] = None
+        self.refresh_popularity()
+
+        # Change feed: ids of users written through this process since the
+        # last refresh, and users whose precomputed neighbors are out of date
+        # until the next rebuild. Writes from other processes or straight to
+        # the database come from the repository's change log.
+        self._refresh_lock = threading.Lock()
+        self._dirty_users: set = set()
+        self._stale_neighbors: set = set()
+
+        # Interactions not yet in the feature matrix, per user and place:
+        # still in the write-behind buffer, or written but not reloaded.
+        self._unflushed: Dict[str, Counter] = defaultdict(Counter)
+        self._flushed: Dict[str, Counter] = defaultdict(Counter)
+
+        logger.info("Loaded %s users", len(self.user_store))
         logger.info("Similarity threshold: %s", self.similarity_min)
         logger.info("Recommendation model initialized")
 
@@ -33,82 +143,290 @@ class CustomRecommendationModel:
         items_per_page: int = 5,
         k_neighboors: int = 5,
     ) -> List[PlaceDTO]:
-        logger.info("Recommending to user %s", user_id)
-        user_info = self.db_controller.get_user_by_id(user_id)
+        timer = StageTimer(RECOMMEND_STAGE_SECONDS)
+        with timer.stage("user"):
+            user_info = self.db_controller.get_user_by_id(user_id)
+        self._check_user_found(user_info, user_id)
+
+        ranking = self._rank(user_info, k_neighboors, timer)
+        page_ids, start_index = self._page(ranking[0], page, items_per_page)
+        with timer.stage("places"):
+            places = self.db_controller.get_places_by_ids(page_ids)
+        page_places = self._to_place_dtos(page_ids, places)
+
+        # fill the remaining items with top places
+        top_places = []
+        start, limit = self._fill_range(start_index, items_per_page, len(page_places))
+        if limit > 0:
+            with timer.stage("fill"):
+                top_places = self._popular_places(start, limit, user_info)
+                if top_places is None:
+                    top_places = self.db_controller.get_top_places(
+                        start=start, limit=limit
+                    )
+
+        return self._finish_page(
+            user_info, page_places, top_places, ranking, start_index, timer
+        )
+
+    async def recommend_async(
+        self,
+        user_id: str,
+        db_controller: AsyncRepository,
+        page: int = 0,
+        items_per_page: int = 5,
+        k_neighboors: int = 5,
+        executor: Optional[Executor] = None,
+    ) -> List[PlaceDTO]:
+        """
+        Same steps as `recommend`, but awaits the database and runs the
+        CPU-bound ranking on `executor` so the event loop stays free.
+        """
+        timer = StageTimer(RECOMMEND_STAGE_SECONDS)
+        with timer.stage("user"):
+            user_info = await db_controller.get_user_by_id(user_id)
+        self._check_user_found(user_info, user_id)
+
+        loop = asyncio.get_running_loop()
+        ranking = await loop.run_in_executor(
+            executor, self._rank, user_info, k_neighboors, timer
+        )
+        page_ids, start_index = self._page(ranking[0], page, items_per_page)
+        with timer.stage("places"):
+            places = await db_controller.get_places_by_ids(page_ids)
+        page_places = self._to_place_dtos(page_ids, places)
+
+        top_places = []
+        start, limit = self._fill_range(start_index, items_per_page, len(page_places))
+        if limit > 0:
+            with timer.stage("fill"):
+                top_places = self._popular_places(start, limit, user_info)
+                if top_places is None:
+                    top_places = await db_controller.get_top_places(
+                        start=start, limit=limit
+                    )
+
+        return self._finish_page(
+            user_info, page_places, top_places, ranking, start_index, timer
+        )
 
+    def _check_user_found(self, user_info: Optional[User], user_id: str):
         if not user_info:
             logger.error("User not found: %s", user_id)
             raise NotFoundException("User not found")
 
+    def _page(
+        self, recommendations: List[str], page: int, items_per_page: int
+    ) -> Tuple[List[str], int]:
+        """The page's place ids and the index of its first one in the ranking."""
         start_index = page * items_per_page
-        end_index = start_index + items_per_page
+        return recommendations[start_index : start_index + items_per_page], start_index
 
-        similar_users = self.similarity_cache.get(user_id)
+    def _fill_range(
+        self, start_index: int, items_per_page: int, found: int
+    ) -> Tuple[int, int]:
+        """Start and count of the top places that fill a page of `found` places."""
+        return start_index + found, items_per_page - found
 
-        if not similar_users:
-            similar_users = self.find_similar_users(user_info, k_neighboors)
-            self.similarity_cache[user_id] = similar_users
-
-        recommendations = self.recommendation_cache.get(user_id)
-        if not recommendations:
-            recommendations = self.aggregate_recommendations(similar_users)
-            self.recommendation_cache[user_id] = recommendations
-
-        recommendations_slice = recommendations[start_index:end_index]
-        recommendations_slice_result = []
-
-        for place_id in recommendations_slice:
-            place = self.db_controller.get_place_by_id(place_id)
-            if not place:
-                logger.warning("Place not found: %s", place_id)
-                continue
-            recommendations_slice_result.append(
-                PlaceDTO(place_id=place.place_id, slug=place.slug)
-            )
+    def _finish_page(
+        self,
+        user_info: User,
+        page_places: List[PlaceDTO],
+        top_places: List[Place],
+        ranking: Tuple[List[str], List[float]],
+        start_index: int,
+        timer: StageTimer,
+    ) -> List[PlaceDTO]:
+        """Append the top places filling the page, score it and log the timings."""
+        filled = len(top_places)
+        page_places.extend(self._sort_top_places(top_places, user_info))
+        recommendations, scores = ranking
+        self._score_places(page_places, recommendations, scores, start_index)
+        timer.log(
+            logger,
+            "Recommended %s places (%s filled) to user %s",
+            len(page_places),
+            filled,
+            user_info.user_id,
+        )
+        return page_places
 
-        # fill the remaining items with top places
-        if len(recommendations_slice_result) < items_per_page:
-            remaining_items = items_per_page - len(recommendations_slice_result)
-            offset = start_index + len(recommendations_slice_result)
-            additional_places = self._get_top_places(offset, remaining_items, user_info)
-            logger.warning(
-                "Filling recommendations with top places, params, %s, %s",
-                offset,
-                remaining_items,
-            )
-            top_places = self._get_top_places(offset, remaining_items, user_info)
+    def _rank(
+        self, user_info: User, k_neighboors: int, timer: Optional[StageTimer] = None
+    ) -> Tuple[List[str], List[float]]:
+        """
+        The full ranked list of place ids and their scores. Both are cached per
+        user until they expire or `invalidate_user` is called, so every page
+        after the first is just a slice.
+        """
+        timer = timer or StageTimer(RECOMMEND_STAGE_SECONDS)
+        user_id = user_info.user_id
+        with timer.stage("cache"):
+            cached = self.recommendation_cache.get(user_id)
+            batch = self.batch_recommendations
+            if cached is None and batch is not None:
+                cached = batch.get(user_id)
+        # Entries without scores come from before they were cached.
+        if cached is not None and cached[0] == k_neighboors and len(cached) == 4:
+            self.cache_hits += 1
+            return cached[2], cached[3]
+
+        self.cache_misses += 1
+        if self.hot_set is not None:
+            with timer.stage("load"):
+                self._load_neighborhood(user_info)
+        user_info = self._with_recent_interactions(user_info)
+        with timer.stage("neighbors"):
+            similar_users = self.find_similar_users(user_info, k_neighboors)
+        with timer.stage("ranking"):
+            recommendations, scores = self.rank_places(similar_users)
+        self.recommendation_cache[user_id] = (
+            k_neighboors,
+            self._to_neighbor_ids(similar_users),
+            recommendations,
+            scores,
+        )
+        return recommendations, scores
 
-            top_places_filtered = self.filter_by_user_preferences(user_info, top_places)
-            recommendations_slice_result.extend(top_places_filtered[:remaining_items])
+    def _to_neighbor_ids(self, similar_users: list) -> List[Tuple[str, float]]:
+        return [(user.user_id, score) for user, score in similar_users]
 
-        for place in recommendations_slice_result:
-            place.score = self._calculate_average_similarity(
-                similar_users, place.place_id
-            )
+    def _from_neighbor_ids(self, neighbors: List[Tuple[str, float]]) -> list:
+        user_store = self.user_store
+        return [
+            (user_store[user_id], score)
+            for user_id, score in neighbors
+            if user_id in user_store
+        ]
 
-        return recommendations_slice_result
+    def _to_place_dtos(
+        self, place_ids: List[str], places: List[Place]
+    ) -> List[PlaceDTO]:
+        place_dtos = [
+            PlaceDTO(place_id=place.place_id, slug=place.slug) for place in places
+        ]
+        if len(place_dtos) < len(place_ids):
+            found = {place.place_id for place in place_dtos}
+            for place_id in place_ids:
+                if place_id not in found:
+                    logger.warning("Place not found: %s", place_id)
+        return place_dtos
+
+    def _score_places(
+        self,
+        places: List[PlaceDTO],
+        recommendations: List[str],
+        scores: List[float],
+        start_index: int,
+    ):
+        end_index = start_index + len(places)
+        page_scores = dict(
+            zip(recommendations[start_index:end_index], scores[start_index:end_index])
+        )
+        all_scores = None
+        for place in places:
+            score = page_scores.get(place.place_id)
+            if score is None:
+                # Top places filling the page may be ranked on another page.
+                if all_scores is None:
+                    all_scores = dict(zip(recommendations, scores))
+                score = all_scores.get(place.place_id, 0.0)
+            place.score = score
 
     def find_similar_users(self, user_info: User, k: int = 10) -> List[User]:
-        cache_key = f"similar_users_{user_info.user_id}"
-        if cache_key in self.similarity_cache.keys():
-            return self.similarity_cache[cache_key]
-
-        similar_users = [
-            (data, self.calculate_similarity(user_info, data))
-            for user_id, data in self.user_data.items()
-            if user_id != user_info.user_id
+        cached = self.similarity_cache.get(user_info.user_id)
+        if cached is not None and cached[0] == k:
+            return self._from_neighbor_ids(cached[1])
+
+        similar_users = self._lookup_neighbors(user_info.user_id, k)
+        if similar_users is None:
+            engine = self.similarity_engine
+            ann_index = self.ann_index
+            if self.similarity_mode == "ann" and ann_index is not None:
+                rows, scores = ann_index.top_k(
+                    engine, user_info, k, self.similarity_min
+                )
+            else:
+                rows, scores = engine.top_k(user_info, k, self.similarity_min)
+            similar_users = [
+                (UserView(engine.features, int(row)), float(score))
+                for row, score in zip(rows, scores)
+            ]
+
+        self.similarity_cache[user_info.user_id] = (
+            k,
+            self._to_neighbor_ids(similar_users),
+        )
+        return similar_users
+
+    def _lookup_neighbors(self, user_id: str, k: int) -> Optional[list]:
+        """O(k) neighbors from the precomputed index, when it covers the user."""
+        index = self.neighbor_index
+        if index is None or index.min_similarity > self.similarity_min:
+            return None
+        if user_id in self._stale_neighbors:
+            return None
+
+        neighbors = index.lookup(user_id, k)
+        if neighbors is None:
+            return None
+        user_store = self.user_store
+        return [
+            (user_store[neighbor_id], score)
+            for neighbor_id, score in neighbors
+            if neighbor_id in user_store and score > self.similarity_min
         ]
-        similar_users = [u for u in similar_users if u[1] > self.similarity_min]
-        similar_users.sort(key=lambda x: x[1], reverse=True)
 
-        self.similarity_cache[cache_key] = similar_users[:k]
-        return similar_users[:k]
+    def refresh_neighbor_index(self, chunk_size: Optional[int] = None):
+        """Rebuild the top-k neighbor index offline, persist it and swap it in."""
+        if self.hot_set is not None:
+            # Built over the hot set alone, it would overwrite the full index
+            # that lazy instances load neighborhoods from.
+            logger.info("Lazy load mode: keeping the neighbor index on disk")
+            return
+        stale = set(self._stale_neighbors)
+        index = NeighborIndex.build(
+            self.similarity_engine,
+            k=self.neighbor_index_k,
+            min_similarity=self.similarity_min,
+            chunk_size=chunk_size,
+        )
+        index.save(self.neighbor_index_path)
+        self.neighbor_index = index
+        self._stale_neighbors -= stale
+        self.similarity_cache.clear()
+        self.recommendation_cache.clear()
 
-    def calculate_similarity(self, user1: User, user2: User) -> float:
-        logger.debug(
-            "Calculating similarity between %s and %s", user1.user_id, user2.user_id
+    def set_similarity_mode(self, mode: str):
+        """
+        Switch between exact and approximate (LSH) neighbor search. The LSH
+        index is built on first use and kept up to date by `upsert_users`.
+        Tune it with ANN_TABLES, ANN_BITS and ANN_PROBES.
+        """
+        if mode not in SIMILARITY_MODES:
+            raise ValueError(f"Unknown similarity mode: {mode}")
+        if mode == "ann" and self.ann_index is None:
+            self.ann_index = self._build_ann_index()
+        if mode != self.similarity_mode:
+            self.similarity_mode = mode
+            self.clear_cache()
+        logger.info("Similarity mode: %s", mode)
+
+    def _build_ann_index(self) -> LSHIndex:
+        return LSHIndex.build(
+            self.similarity_engine.features,
+            n_tables=int(os.environ.get("ANN_TABLES", 16)),
+            # Unset: grows with the number of users.
+            n_bits=int(os.environ.get("ANN_BITS", 0)) or None,
+            probes=int(os.environ.get("ANN_PROBES", 3)),
         )
 
+    def calculate_similarity(self, user1: User, user2: User) -> float:
+        """
+        Similarity of one pair of users. `SimilarityEngine` computes the same
+        score for many users at once and serves every request; this per-pair
+        version is the reference it is tested against.
+        """
         metrics_similarity = self._cosine_similarity(
             [metric.place_id for metric in user1.metrics],
             [metric.place_id for metric in user2.metrics],
@@ -152,55 +470,418 @@ class CustomRecommendationModel:
 
         return 0.0
 
-    def aggregate_recommendations(self, similar_users: List[User]) -> List[str]:
-        logger.debug("Aggregating recommendations")
-        recommendations = defaultdict(int)
+    def _calculate_tag_similarity(self, user1: User, user2: User) -> float:
+        tags1 = {metric.interest for metric in user1.metrics}
+        tags2 = {metric.interest for metric in user2.metrics}
+
+        common_tags = tags1.intersection(tags2)
+        all_tags = tags1.union(tags2)
+
+        if all_tags:
+            return len(common_tags) / len(all_tags)
+        return 0.0
+
+    def aggregate_recommendations(self, similar_users: List[UserView]) -> List[str]:
+        return self.rank_places(similar_users)[0]
 
-        for user, similarity in similar_users:
-            for metric in user.metrics:
-                recommendations[metric.place_id] += metric.interactions
+    def rank_places(self, similar_users: list) -> Tuple[List[str], List[float]]:
+        """
+        Place ids ranked by the neighbors' total interactions, and for each the
+        interaction-weighted mean similarity of the neighbors who visited it.
+        """
+        features = self.similarity_engine.features
+        neighbors = np.array([user.row for user, _ in similar_users], dtype=np.int64)
+        similarities = np.array(
+            [similarity for _, similarity in similar_users], dtype=np.float64
+        )
 
-        sorted_recommendations = sorted(
-            recommendations, key=recommendations.get, reverse=True
+        extra_places = []
+        extra_interactions = []
+        if self._unflushed or self._flushed:
+            for user, _ in similar_users:
+                for place_id, interactions in self._recent_interactions(
+                    user.user_id
+                ).items():
+                    extra_places.append(features.place_vocab.add(place_id))
+                    extra_interactions.append(interactions)
+
+        codes, scores = rank_places(
+            features,
+            neighbors,
+            similarities,
+            np.array(extra_places, dtype=np.int64),
+            np.array(extra_interactions, dtype=np.int64),
         )
-        logger.debug("Found %s recommendations", len(sorted_recommendations))
-        return sorted_recommendations
+        place_ids = features.place_ids
+        return [place_ids[code] for code in codes.tolist()], scores.tolist()
 
     def clear_cache(self, user_id: Optional[str] = None):
         logger.info("Clearing cache")
         if user_id is None:
             self.similarity_cache.clear()
             self.recommendation_cache.clear()
+            self.batch_recommendations = None
         else:
-            self.similarity_cache.clear(user_id)
-            self.recommendation_cache.clear(user_id)
+            self._forget_user(user_id)
 
-    def _load_user_data(self) -> Dict[str, User]:
-        logger.debug("Loading user data")
-        user_data = {}
-        for user in self.db_controller.get_all_users():
-            try:
-                user_data[user.user_id] = user
-            except Exception as e:
-                logger.error("Error loading user data: %s", str(user))
-        return user_data
-
-    def filter_by_user_preferences(
-        self, user: User, recommendations: List[PlaceDTO]
-    ) -> List[PlaceDTO]:
-        preferred_tags = {metric.interest for metric in user.metrics}
-        filtered_recommendations = [
-            place
-            for place in recommendations
-            if place.tags.intersection(preferred_tags)
+    def _forget_user(self, user_id: str):
+        """Drop every cached result of one user, batch ones included."""
+        self.similarity_cache.clear(user_id)
+        self.recommendation_cache.clear(user_id)
+        batch = self.batch_recommendations
+        if batch is not None:
+            batch.clear(user_id)
+
+    def invalidate_user(self, user_id: str):
+        """
+        Drop cached results for a user whose metrics or favorites changed and
+        queue the user for the next `refresh_users`.
+        """
+        logger.debug("Invalidating cache for user %s", user_id)
+        self._forget_user(user_id)
+        self.mark_dirty(user_id)
+
+    def mark_dirty(self, user_id: str):
+        with self._refresh_lock:
+            self._dirty_users.add(user_id)
+
+    def record_interactions(self, interactions: List[Interaction]):
+        """
+        Count interactions that are still in the write-behind buffer, so they
+        show in recommendations before they reach the database.
+        """
+        with self._refresh_lock:
+            for interaction in interactions:
+                self._unflushed[interaction.user_id][
+                    interaction.place_id
+                ] += interaction.interactions
+        for user_id in {interaction.user_id for interaction in interactions}:
+            self._forget_user(user_id)
+
+    def interactions_flushed(self, interactions: Dict[Tuple[str, str], int]):
+        """
+        Buffered interactions reached the database: keep counting them until
+        their users are reloaded by the next `refresh_users`.
+        """
+        with self._refresh_lock:
+            for (user_id, place_id), count in interactions.items():
+                self._discount_unflushed(user_id, place_id, count)
+                self._flushed[user_id][place_id] += count
+                self._dirty_users.add(user_id)
+
+    def interactions_dropped(self, interactions: Dict[Tuple[str, str], int]):
+        """Buffered interactions the database rejected: stop counting them."""
+        with self._refresh_lock:
+            for (user_id, place_id), count in interactions.items():
+                self._discount_unflushed(user_id, place_id, count)
+        for user_id in {user_id for user_id, _ in interactions}:
+            self._forget_user(user_id)
+
+    def _discount_unflushed(self, user_id: str, place_id: str, count: int):
+        unflushed = self._unflushed.get(user_id)
+        if unflushed is None:
+            return
+        unflushed[place_id] -= count
+        if unflushed[place_id] <= 0:
+            del unflushed[place_id]
+        if not unflushed:
+            del self._unflushed[user_id]
+
+    def _recent_interactions(self, user_id: str) -> Counter:
+        with self._refresh_lock:
+            recent = Counter(self._unflushed.get(user_id, ()))
+            recent.update(self._flushed.get(user_id, ()))
+        return recent
+
+    def _with_recent_interactions(self, user: User) -> User:
+        """`user` with interactions that are not in the database yet."""
+        recent = self._recent_interactions(user.user_id)
+        if not recent:
+            return user
+
+        metrics = []
+        for metric in user.metrics or []:
+            if metric.place_id in recent:
+                metric = metric.model_copy(
+                    update={
+                        "interactions": metric.interactions
+                        + recent.pop(metric.place_id)
+                    }
+                )
+            metrics.append(metric)
+        # The tags of a new place are only known once the user is reloaded.
+        metrics.extend(
+            Metrics(
+                place_id=place_id,
+                user_id=user.user_id,
+                interactions=interactions,
+                interest=None,
+            )
+            for place_id, interactions in recent.items()
+        )
+        return user.model_copy(update={"metrics": metrics})
+
+    def refresh_users(self) -> int:
+        """
+        Reload only the users changed since the last call and upsert them into
+        the in-memory data: those marked dirty by this process and those in
+        the repository's change log, which also has writes from other
+        instances. Users no longer in the database are removed.
+        """
+        self._pull_user_changes()
+        with self._refresh_lock:
+            user_ids, self._dirty_users = self._dirty_users, set()
+        if self.hot_set is not None:
+            # Users that are not loaded are read fresh when next needed.
+            user_store = self.user_store
+            user_ids = {user_id for user_id in user_ids if user_id in user_store}
+        if not user_ids:
+            return 0
+
+        try:
+            users = list(self.db_controller.get_users_by_ids(sorted(user_ids)))
+        except Exception:
+            # Retry these users on the next refresh.
+            with self._refresh_lock:
+                self._dirty_users |= user_ids
+            raise
+
+        found = {user.user_id for user in users}
+        self.upsert_users(users, removed_user_ids=user_ids - found)
+        return len(user_ids)
+
+    def _pull_user_changes(self):
+        """Mark dirty the users in the repository's change log since the last pull."""
+        if self._change_cursor is None:
+            return
+        user_ids, cursor = self.db_controller.get_user_changes(self._change_cursor)
+        with self._refresh_lock:
+            self._dirty_users.update(user_ids)
+            self._change_cursor = cursor
+
+    def reconcile_users(self, chunk_size: int = 2000) -> int:
+        """
+        Rare safety net for the change feed: compare every loaded user (every
+        user in eager mode) with the database and upsert the ones that
+        differ. It catches what the change log can miss, such as a change
+        committed after a later one was read, or a repository without a log.
+        Returns how many users changed.
+        """
+        if self.hot_set is None:
+            chunks = self.db_controller.iter_user_chunks()
+        else:
+            loaded = list(self.user_store)
+            chunks = (
+                self.db_controller.get_users_by_ids(loaded[start : start + chunk_size])
+                for start in range(0, len(loaded), chunk_size)
+            )
+
+        seen = set()
+        changed = []
+        for chunk in chunks:
+            user_store = self.user_store
+            for user in chunk:
+                seen.add(user.user_id)
+                view = user_store.get(user.user_id)
+                if view is None:
+                    # New to an eager model; lazy ones load users on demand.
+                    if self.hot_set is None:
+                        changed.append(user)
+                elif _fingerprint(view.to_user()) != _fingerprint(user):
+                    changed.append(user)
+
+        removed = [user_id for user_id in self.user_store if user_id not in seen]
+        if self.hot_set is not None:
+            # Only users loaded when the scan started were looked for.
+            loaded = set(loaded)
+            removed = [user_id for user_id in removed if user_id in loaded]
+        self.upsert_users(changed, removed_user_ids=removed)
+        if changed or removed:
+            logger.info(
+                "Reconciled %s users changed outside the change feed",
+                len(changed) + len(removed),
+            )
+        return len(changed) + len(removed)
+
+    def upsert_users(self, users: Iterable[User], removed_user_ids: Iterable = ()):
+        """
+        Replace or add `users` and drop `removed_user_ids` without reloading
+        everyone: only their rows are re-encoded and the engine is swapped in
+        one assignment, so concurrent requests see either version.
+        """
+        users = list(users)
+        with self._load_lock:
+            user_store = self.user_store
+            removed_user_ids = [
+                user_id for user_id in removed_user_ids if user_id in user_store
+            ]
+            if not users and not removed_user_ids:
+                return
+            self._swap_users(users, removed_user_ids)
+
+        changed = [user.user_id for user in users] + removed_user_ids
+        self._stale_neighbors.update(changed)
+        with self._refresh_lock:
+            for user_id in changed:
+                self._flushed.pop(user_id, None)
+        for user_id in changed:
+            self._forget_user(user_id)
+        logger.info("Upserted %s users, removed %s", len(users), len(removed_user_ids))
+
+    def _swap_users(self, users: List[User], removed_user_ids: List[str]):
+        """Swap in an engine with `users` upserted and `removed_user_ids` removed."""
+        engine = self.similarity_engine.upserted(users, removed_user_ids)
+        features = engine.features
+        n_active = int(np.count_nonzero(features.active))
+        if self.hot_set is not None and features.n_users - n_active > max(
+            n_active, self.neighborhood_size
+        ):
+            # Unloaded users leave inactive rows behind: once they outnumber
+            # the loaded ones, rebuild the matrix from the loaded users only.
+            engine = SimilarityEngine(
+                UserFeatureMatrix(
+                    view.to_user() for view in UserStore(features).values()
+                )
+            )
+            self.similarity_engine = engine
+            if self.ann_index is not None:
+                self.ann_index = self._build_ann_index()
+            logger.info("Compacted the user matrix to %s users", n_active)
+            return
+
+        self.similarity_engine = engine
+        if self.ann_index is not None:
+            # Removed users stay hashed; they are inactive in the engine.
+            self.ann_index = self.ann_index.inserted(
+                features,
+                np.array([features.row_by_user_id[user.user_id] for user in users]),
+            )
+
+    def _load_neighborhood(self, user_info: User):
+        """
+        Lazy mode: load the user and its neighborhood if it is not hot yet.
+
+        The neighborhood is the user's precomputed neighbors when the neighbor
+        index has them, so pages are the same as in eager mode; otherwise the
+        LAZY_NEIGHBORHOOD_SIZE users sharing the most places with it. Users
+        the index misses are searched among every loaded user, so their
+        neighbors are approximate, as in "ann" mode, and their pages can
+        differ from eager mode's.
+        """
+        user_id = user_info.user_id
+        with self._load_lock:
+            if self.hot_set.touch(user_id):
+                return
+
+        neighborhood = [user_id, *self._neighborhood_ids(user_info)]
+        user_store = self.user_store
+        users = [user_info] if user_id not in user_store else []
+        users.extend(
+            self.db_controller.get_users_by_ids(
+                [member for member in neighborhood[1:] if member not in user_store]
+            )
+        )
+
+        with self._load_lock:
+            loaded = {user.user_id for user in users}
+            user_store = self.user_store
+            # Unloaded by a concurrent request since they were checked.
+            missing = [
+                member
+                for member in neighborhood
+                if member not in loaded and member not in user_store
+            ]
+            if missing:
+                users.extend(self.db_controller.get_users_by_ids(missing))
+            unloaded = self.hot_set.add(user_id, neighborhood)
+            self._swap_users(users, unloaded)
+
+        # The reloaded users include their flushed interactions.
+        with self._refresh_lock:
+            for user in users:
+                self._flushed.pop(user.user_id, None)
+        logger.debug(
+            "Loaded %s users for %s, unloaded %s", len(users), user_id, len(unloaded)
+        )
+
+    def _neighborhood_ids(self, user_info: User) -> List[str]:
+        index = self.neighbor_index
+        if index is not None and user_info.user_id not in self._stale_neighbors:
+            neighbors = index.lookup(user_info.user_id, index.k)
+            if neighbors:
+                return [neighbor_id for neighbor_id, _ in neighbors]
+
+        place_ids = {metric.place_id for metric in user_info.metrics or []}
+        place_ids.update(place.place_id for place in user_info.favorite_places or [])
+        shared = self.db_controller.get_users_sharing_places(
+            sorted(place_ids), self.neighborhood_size
+        )
+        return [
+            neighbor_id
+            for neighbor_id in shared or []
+            if neighbor_id != user_info.user_id
         ]
-        return filtered_recommendations if filtered_recommendations else recommendations
 
-    def _get_top_places(self, start: int, limit: int, user: User) -> List[PlaceDTO]:
-        logger.debug("Getting top places")
-        places = self.db_controller.get_top_places(start=start, limit=limit)
-        places.sort(key=lambda x: x.likes, reverse=True)
-        # sort by user interest
+    def cache_stats(self) -> dict:
+        requests = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": self.cache_hits / requests if requests else 0.0,
+            "similarity_cache": self.similarity_cache.stats(),
+            "recommendation_cache": self.recommendation_cache.stats(),
+            "batch_recommendations": (
+                self.batch_recommendations.stats()
+                if self.batch_recommendations is not None
+                else None
+            ),
+        }
+
+    @property
+    def user_store(self) -> UserStore:
+        """Users currently loaded, read from the live feature matrix."""
+        return UserStore(self.similarity_engine.features)
+
+    def _load_users(self) -> Iterator[User]:
+        """Stream users chunk by chunk; only one chunk of User objects is alive."""
+        logger.debug("Loading user data")
+        for chunk in self.db_controller.iter_user_chunks():
+            logger.debug("Loaded a chunk of %s users", len(chunk))
+            yield from chunk
+
+    def refresh_popularity(self):
+        """
+        Rebuild the in-memory place ranking from the database. Its tags come
+        from the repository too, not from the loaded users, so lazy and eager
+        models fill short pages the same way.
+        """
+        try:
+            places = self.db_controller.get_all_places()
+            place_tags = self.db_controller.get_metric_place_tags()
+        except Exception as e:
+            # Short pages keep the previous ranking, or the database.
+            logger.error("Could not load places for the popularity index: %s", e)
+            return
+        self.popularity = PopularityIndex.build(places, place_tags)
+
+    def _popular_places(
+        self, start: int, limit: int, user: User
+    ) -> Optional[List[Place]]:
+        """
+        Top places from memory the user has no metric or favorite for, ones
+        matching the user's tags first.
+        """
+        popularity = self.popularity
+        # Empty when built before any place existed: ask the database.
+        if not popularity:
+            return None
+        preferred_tags = {metric.interest for metric in user.metrics} - {None}
+        known = {metric.place_id for metric in user.metrics}
+        known.update(place.place_id for place in user.favorite_places or [])
+        return popularity.top(start, limit, preferred_tags, exclude=known)
+
+    def _sort_top_places(self, places: List[Place], user: User) -> List[PlaceDTO]:
+        # sort by user interest, keeping the popularity order otherwise
         user_metrics = {metric.place_id: metric.interactions for metric in user.metrics}
         sorted_places = sorted(
             places,
@@ -213,45 +894,52 @@ class CustomRecommendationModel:
             for place in sorted_places
         ]
 
-    def _calculate_tag_similarity(self, user1: User, user2: User) -> float:
-        tags1 = {metric.interest for metric in user1.metrics}
-        tags2 = {metric.interest for metric in user2.metrics}
-
-        common_tags = tags1.intersection(tags2)
-        all_tags = tags1.union(tags2)
-
-        if all_tags:
-            return len(common_tags) / len(all_tags)
-        return 0.0
-
-    def _calculate_average_similarity(
-        self,
-        similar_users: List[User],
-        place_id: str,
-    ) -> float:
-        total_similarity = 0.0
-        total_weight = 0.0
-
-        for user, similarity in similar_users:
-            user_metrics = {
-                metric.place_id: metric.interactions for metric in user.metrics
-            }
-            if place_id in user_metrics:
-                interaction_weight = user_metrics[place_id]
-                total_similarity += similarity * interaction_weight
-                total_weight += interaction_weight
-
-        if total_weight == 0:
-            return 0.0
-        return total_similarity / total_weight
-
-    def recommend_all_users(self):
+    def recommend_all_users(
+        self, workers: Optional[int] = None, k_neighboors: int = 5
+    ) -> threading.Thread:
+        """
+        Rank every user in the background into `batch_recommendations`, a
+        store sized for all of them that `_rank` reads after the request
+        cache. Its entries expire after BATCH_RECOMMENDATION_TTL_HOURS, so
+        run this at least that often to keep it warm.
+        """
         logger.info("Recommending to all users in background")
         background_thread = threading.Thread(
-            target=self._recommend_all_users_in_background
+            target=self._recommend_all_users_in_background,
+            args=(workers, k_neighboors),
         )
         background_thread.start()
+        return background_thread
+
+    def _recommend_all_users_in_background(
+        self, workers: Optional[int], k_neighboors: int
+    ):
+        features = self.similarity_engine.features
+        user_ids = features.user_ids
+        place_ids = features.place_ids
+        batch = create_cache(
+            "batch",
+            self.batch_ttl,
+            self._cache_client,
+            max_entries=max(len(user_ids), 1),
+        )
 
-    def _recommend_all_users_in_background(self):
-        for user in self.db_controller.get_all_users():
-            self.recommend(user.user_id)
+        for row, neighbors, scores, (ranking, place_scores) in recommend_in_parallel(
+            self.similarity_engine,
+            k=k_neighboors,
+            min_similarity=self.similarity_min,
+            workers=workers,
+        ):
+            neighbor_ids = [
+                (user_ids[neighbor], float(score))
+                for neighbor, score in zip(neighbors, scores)
+                if neighbor >= 0
+            ]
+            batch[user_ids[row]] = (
+                k_neighboors,
+                neighbor_ids,
+                [place_ids[code] for code in ranking],
+                place_scores,
+            )
+        # Swapped in whole, so requests never see half a batch.
+        self.batch_recommendations = batch
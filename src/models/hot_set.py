@@ -0,0 +1,65 @@
+from collections import Counter, OrderedDict
+from typing import Iterable, List, Tuple
+
+
+class HotSet:
+    """
+    The `capacity` most recently active users and the neighborhood loaded
+    for each, for the lazy load mode.
+
+    A user stays loaded while any hot user's neighborhood holds it, so
+    neighborhoods that overlap are loaded once. Adding a user past
+    `capacity` evicts the least recently active one, and with it the
+    members no other hot user still needs. Not thread-safe: callers lock.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._neighborhoods: "OrderedDict[str, Tuple[str, ...]]" = OrderedDict()
+        self._references: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._neighborhoods)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._neighborhoods
+
+    @property
+    def loaded(self) -> int:
+        """Distinct users held by the hot users' neighborhoods."""
+        return len(self._references)
+
+    def is_loaded(self, user_id: str) -> bool:
+        return user_id in self._references
+
+    def touch(self, user_id: str) -> bool:
+        """Mark a hot user as active again; False when it is not hot."""
+        if user_id not in self._neighborhoods:
+            return False
+        self._neighborhoods.move_to_end(user_id)
+        return True
+
+    def add(self, user_id: str, neighborhood: Iterable[str]) -> List[str]:
+        """
+        Make `user_id` hot with `neighborhood`, replacing its previous one.
+        Returns the users no longer held by any hot user, to unload.
+        """
+        neighborhood = tuple(dict.fromkeys(neighborhood))
+        released = list(self._neighborhoods.pop(user_id, ()))
+        self._neighborhoods[user_id] = neighborhood
+        self._references.update(neighborhood)
+        while len(self._neighborhoods) > self.capacity:
+            _, evicted = self._neighborhoods.popitem(last=False)
+            released.extend(evicted)
+
+        unloaded = []
+        for member in released:
+            self._references[member] -= 1
+            if self._references[member] <= 0:
+                del self._references[member]
+                unloaded.append(member)
+        return unloaded
+
+    def clear(self) -> None:
+        self._neighborhoods.clear()
+        self._references.clear()
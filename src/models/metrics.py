@@ -0,0 +1,232 @@
+import time
+import bisect
+import inspect
+import functools
+import threading
+from typing import Any, Dict, List, Sequence, Tuple
+
+# Seconds; covers cached pages (sub-millisecond) to cold full scans.
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric:
+    """One metric family: a value per combination of label values."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues, **extra: str) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra.items())
+        if not pairs:
+            return ""
+        return "{%s}" % ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key: LabelValues, value) -> List[str]:
+        return [f"{self.name}{self._labels(key)} {_number(value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """
+    Cumulative buckets, sum and count per label values, as Prometheus
+    expects; quantiles such as p99 are computed on the server side.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket plus +Inf, then the sum.
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bucket] += 1
+            counts[-1] += value
+
+    def time(self, **labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def _samples(self, key: LabelValues, counts: list) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _number(bound)
+            lines.append(f"{self.name}_bucket{self._labels(key, le=le)} {cumulative}")
+        lines.append(f"{self.name}_sum{self._labels(key)} {_number(counts[-1])}")
+        lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self._started, **self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Everything registered, in the Prometheus text exposition format."""
+        return "\n".join(line for m in self.metrics for line in m.render()) + "\n"
+
+
+class TimedRepository:
+    """
+    Proxy timing every public method of a repository (sync or async) into
+    `DB_CALL_SECONDS`, labelled by method name.
+    """
+
+    def __init__(self, repository):
+        self._repository = repository
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._repository, name)
+        # Generators would only be timed until their first chunk is asked for.
+        if (
+            name.startswith("_")
+            or not callable(attribute)
+            or inspect.isgeneratorfunction(attribute)
+        ):
+            return attribute
+
+        if inspect.iscoroutinefunction(attribute):
+
+            @functools.wraps(attribute)
+            async def timed_async(*args, **kwargs):
+                with DB_CALL_SECONDS.time(method=name):
+                    return await attribute(*args, **kwargs)
+
+            return timed_async
+
+        @functools.wraps(attribute)
+        def timed(*args, **kwargs):
+            with DB_CALL_SECONDS.time(method=name):
+                return attribute(*args, **kwargs)
+
+        return timed
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by route",
+        ("method", "route"),
+    )
+)
+HTTP_REQUESTS = REGISTRY.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests by route and status",
+        ("method", "route", "status"),
+    )
+)
+HTTP_REQUESTS_IN_PROGRESS = REGISTRY.register(
+    Gauge("http_requests_in_progress", "HTTP requests being served", ("method",))
+)
+RECOMMEND_STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "recommend_stage_duration_seconds",
+        "Time spent in each stage of a recommendation",
+        ("stage",),
+    )
+)
+DB_CALL_SECONDS = REGISTRY.register(
+    Histogram(
+        "db_call_duration_seconds",
+        "Repository call latency by method",
+        ("method",),
+    )
+)
@@ -0,0 +1,149 @@
+import os
+import time
+import logging
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from src.models.similarity_engine import SimilarityEngine
+
+logger = logging.getLogger("app_logger")
+
+# Upper bound on the size of a (chunk x users) score block.
+MAX_BLOCK_CELLS = 4_000_000
+
+
+class NeighborIndex:
+    """
+    Precomputed top-k neighbors of every user.
+
+    Row `i` of `neighbors` holds the rows (into `user_ids`) of the k most
+    similar users of `user_ids[i]`, padded with -1, and `scores` holds their
+    similarities as float32.
+    """
+
+    def __init__(
+        self,
+        user_ids: List[str],
+        neighbors: np.ndarray,
+        scores: np.ndarray,
+        min_similarity: float,
+    ):
+        self.user_ids = user_ids
+        self.neighbors = neighbors
+        self.scores = scores
+        self.min_similarity = min_similarity
+        self.row_by_user_id: Dict[str, int] = {
+            user_id: row for row, user_id in enumerate(user_ids)
+        }
+
+    @property
+    def k(self) -> int:
+        return self.neighbors.shape[1]
+
+    @classmethod
+    def build(
+        cls,
+        engine: SimilarityEngine,
+        k: int,
+        min_similarity: float,
+        chunk_size: Optional[int] = None,
+    ) -> "NeighborIndex":
+        """
+        Score users in blocks of `chunk_size` rows against everyone, keeping
+        only each block's top-k, so peak memory is one block of scores.
+        """
+        n_users = engine.features.n_users
+        chunk_size = chunk_size or default_chunk_size(n_users)
+
+        logger.info("Building neighbor index for %s users (k=%s)", n_users, k)
+        started = time.perf_counter()
+
+        neighbors = np.full((n_users, k), -1, dtype=np.int32)
+        scores = np.zeros((n_users, k), dtype=np.float32)
+
+        for start in range(0, n_users, chunk_size):
+            rows = np.arange(start, min(start + chunk_size, n_users))
+            block_rows, block_scores = select_top_k_rows(
+                engine.score_rows(rows), k, min_similarity
+            )
+            neighbors[rows] = block_rows
+            scores[rows] = block_scores
+
+        logger.info("Neighbor index built in %.2fs", time.perf_counter() - started)
+        return cls(list(engine.features.user_ids), neighbors, scores, min_similarity)
+
+    def lookup(self, user_id: str, k: int) -> Optional[List[Tuple[str, float]]]:
+        """Neighbors of `user_id` as (user_id, score), or None if not indexed."""
+        row = self.row_by_user_id.get(user_id)
+        if row is None or k > self.k:
+            return None
+        return [
+            (self.user_ids[neighbor], float(score))
+            for neighbor, score in zip(self.neighbors[row, :k], self.scores[row, :k])
+            if neighbor >= 0
+        ]
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            user_ids=np.array(self.user_ids, dtype=np.str_),
+            neighbors=self.neighbors,
+            scores=self.scores,
+            min_similarity=np.float64(self.min_similarity),
+        )
+        os.replace(tmp_path, path)
+        logger.info("Neighbor index saved to %s", path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["NeighborIndex"]:
+        if not os.path.exists(path):
+            logger.info("No neighbor index found at %s", path)
+            return None
+        with np.load(path) as data:
+            index = cls(
+                data["user_ids"].tolist(),
+                data["neighbors"],
+                data["scores"],
+                float(data["min_similarity"]),
+            )
+        logger.info("Loaded neighbor index for %s users", len(index.user_ids))
+        return index
+
+
+def default_chunk_size(n_users: int) -> int:
+    return max(1, min(512, MAX_BLOCK_CELLS // max(n_users, 1)))
+
+
+def select_top_k_rows(
+    scores: np.ndarray, k: int, min_similarity: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-row top-k of a score block, -1 padded where below `min_similarity`."""
+    n_rows, n_cols = scores.shape
+    top = min(k, n_cols)
+    if top == 0:
+        return (
+            np.full((n_rows, k), -1, dtype=np.int32),
+            np.zeros((n_rows, k), dtype=np.float32),
+        )
+
+    # Keep everything above the k-th score, then the lowest rows among ties.
+    kth = -np.partition(-scores, top - 1, axis=1)[:, top - 1 : top]
+    above = scores > kth
+    ties = scores == kth
+    needed = top - above.sum(axis=1, keepdims=True)
+    selected = above | (ties & (np.cumsum(ties, axis=1) <= needed))
+    candidates = np.nonzero(selected)[1].reshape(n_rows, top)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+
+    # Descending score, ties by row like the exact path.
+    order = np.lexsort((candidates, -candidate_scores), axis=1)
+    candidates = np.take_along_axis(candidates, order, axis=1)
+    candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+    neighbors = np.full((n_rows, k), -1, dtype=np.int32)
+    neighbor_scores = np.zeros((n_rows, k), dtype=np.float32)
+    valid = candidate_scores > min_similarity
+    neighbors[:, :top] = np.where(valid, candidates, -1)
+    neighbor_scores[:, :top] = np.where(valid, candidate_scores, 0)
+    return neighbors, neighbor_scores
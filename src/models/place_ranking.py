@@ -0,0 +1,62 @@
+import numpy as np
+from typing import Optional, Tuple
+from src.models.similarity_engine import UserFeatureMatrix
+
+
+def rank_places(
+    features: UserFeatureMatrix,
+    neighbors: np.ndarray,
+    similarities: np.ndarray,
+    extra_places: Optional[np.ndarray] = None,
+    extra_interactions: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ranked place codes and the score of each, from one pass over the
+    metrics of `neighbors` (rows, with their `similarities`).
+
+    The rank is total interactions, descending, with ties in order of first
+    appearance (neighbor order, then metric order), as when summing into a
+    dict. The score is the interaction-weighted mean similarity of the
+    neighbors who interacted with the place, each counting only their last
+    metric for it. `extra_*` (interactions not in `features` yet) are
+    appended to the metrics and count towards the rank only.
+    """
+    places, owner, interactions = features.metric_places.gather(
+        neighbors, features.metric_interactions
+    )
+    all_places, all_interactions = places, interactions
+    if extra_places is not None and len(extra_places):
+        all_places = np.concatenate([places, extra_places])
+        all_interactions = np.concatenate([interactions, extra_interactions])
+    if not len(all_places):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    codes, first, inverse = np.unique(
+        all_places, return_index=True, return_inverse=True
+    )
+    totals = np.bincount(inverse, weights=all_interactions, minlength=len(codes))
+    order = np.lexsort((first, -totals))
+
+    # Last metric per (neighbor, place), kept in metric order so the sums
+    # below add up in the same order as a loop over the neighbors would.
+    metric_codes = inverse[: len(places)]
+    pairs = owner * len(codes) + metric_codes
+    _, last_reversed = np.unique(pairs[::-1], return_index=True)
+    last = np.sort(len(pairs) - 1 - last_reversed)
+
+    weights = interactions[last].astype(np.float64)
+    weighted = np.bincount(
+        metric_codes[last],
+        weights=similarities[owner[last]] * weights,
+        minlength=len(codes),
+    )
+    total_weights = np.bincount(
+        metric_codes[last], weights=weights, minlength=len(codes)
+    )
+    scores = np.divide(
+        weighted,
+        total_weights,
+        out=np.zeros(len(codes), dtype=np.float64),
+        where=total_weights != 0,
+    )
+    return codes[order], scores[order]
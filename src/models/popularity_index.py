@@ -0,0 +1,117 @@
+import time
+import logging
+import numpy as np
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from src.types.basic_types import Place
+
+logger = logging.getLogger("app_logger")
+
+
+class PopularityIndex:
+    """
+    Every place ranked by rating, then likes (unrated places last), held in
+    memory to fill pages that run short of neighbor recommendations.
+
+    `by_tag` holds, per tag, the ranks of the places users interacted with
+    under that tag, so `top` can page through the places matching a user's
+    tags first instead of filtering a page of all places down to a few,
+    skipping the places the user already knows.
+    The index is immutable; `build` again to refresh it.
+    """
+
+    def __init__(self, places: List[Place], by_tag: Dict[str, np.ndarray]):
+        self.places = places
+        self.by_tag = by_tag
+        self._rank_by_place_id = {
+            place.place_id: rank for rank, place in enumerate(places)
+        }
+
+    @classmethod
+    def build(
+        cls, places: Iterable[Place], place_tags: Iterable[Tuple[str, str]]
+    ) -> "PopularityIndex":
+        """
+        Rank `places` and group them by the (tag, place_id) pairs of the
+        users' metrics, as read from the repository, so the index is the
+        same whichever users the model has loaded.
+        """
+        started = time.perf_counter()
+        places = sorted(
+            places,
+            key=lambda place: (
+                place.rating is None,
+                -(place.rating or 0),
+                -place.likes,
+            ),
+        )
+
+        rank_by_place_id = {place.place_id: rank for rank, place in enumerate(places)}
+        ranks_by_tag = defaultdict(list)
+        for tag, place_id in place_tags:
+            rank = rank_by_place_id.get(place_id)
+            if rank is not None:
+                ranks_by_tag[tag].append(rank)
+        # Sorted and without repeats: each tag's places in rank order.
+        by_tag = {
+            tag: np.unique(np.array(ranks, dtype=np.int64))
+            for tag, ranks in ranks_by_tag.items()
+        }
+        logger.info(
+            "Built popularity index for %s places and %s tags in %.2fs",
+            len(places),
+            len(by_tag),
+            time.perf_counter() - started,
+        )
+        return cls(places, by_tag)
+
+    def top(
+        self,
+        start: int,
+        limit: int,
+        tags: Optional[Iterable[str]] = None,
+        exclude: Iterable[str] = (),
+    ) -> List[Place]:
+        """
+        Places `start` to `start + limit` of the ranking without the places
+        in `exclude`, where places tagged with any of `tags` come before the
+        rest.
+        """
+        stop = start + limit
+        excluded = np.unique(
+            np.array(
+                [
+                    self._rank_by_place_id[place_id]
+                    for place_id in exclude
+                    if place_id in self._rank_by_place_id
+                ],
+                dtype=np.int64,
+            )
+        )
+        # Each excluded place hides at most one of the first `stop` of a list.
+        window = stop + len(excluded)
+        tag_ranks = [self.by_tag[tag] for tag in tags or () if tag in self.by_tag]
+        if not tag_ranks:
+            if not len(excluded):
+                return self.places[start:stop]
+            ranking = np.setdiff1d(
+                np.arange(min(window, len(self.places))), excluded, assume_unique=True
+            )
+            return [self.places[rank] for rank in ranking[start:stop].tolist()]
+
+        # The first `stop` of the union are among the first `window` of each.
+        preferred = np.setdiff1d(
+            np.concatenate([ranks[:window] for ranks in tag_ranks]), excluded
+        )
+        if stop <= len(preferred):
+            return [self.places[rank] for rank in preferred[start:stop].tolist()]
+
+        preferred = np.setdiff1d(np.concatenate(tag_ranks), excluded)
+        rest = np.ones(len(self.places), dtype=bool)
+        rest[preferred] = False
+        rest[excluded] = False
+        ranking = np.concatenate([preferred, np.flatnonzero(rest)])
+        return [self.places[rank] for rank in ranking[start:stop].tolist()]
+
+    def __len__(self) -> int:
+        return len(self.places)
@@ -0,0 +1,216 @@
+import io
+import os
+import sys
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+PROFILE_MODES = ("cprofile", "sample")
+
+# Leaf frames of threads blocked waiting for work: locks, queues, the event
+# loop's select and idle executor workers. Skipped unless include_idle is set.
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+    ("handlers.py", "dequeue"),
+}
+
+
+class StackSampler:
+    """
+    Low-overhead statistical profiler: a daemon thread snapshots the Python
+    stacks of the other threads every `interval` seconds (or only of
+    `thread_ids`) and counts them in folded form, root first, frames
+    separated by ";", which flame graph tools read directly. Threads idling
+    in one of `IDLE_FRAMES` are left out unless `include_idle` is set.
+
+    No tracing hooks are installed, so the profiled code runs at full speed;
+    the cost is one `sys._current_frames()` walk per tick on the sampler
+    thread.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.01,
+        thread_ids: Optional[Iterable[int]] = None,
+        include_idle: bool = False,
+    ):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.thread_ids = set(thread_ids) if thread_ids is not None else None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopped.clear()
+        self._started_at = time.time()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+            self._started_at = time.time() if self.running else None
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            self.sample(own_id)
+
+    def sample(self, own_id: Optional[int] = None) -> None:
+        folded = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            if self.thread_ids is not None and thread_id not in self.thread_ids:
+                continue
+            if not self.include_idle and _is_idle(frame):
+                continue
+            folded.append(_fold(frame))
+        with self._lock:
+            self.stacks.update(folded)
+            self.samples += 1
+
+    def folded(self, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        with self._lock:
+            return self.stacks.most_common(limit)
+
+    def top_functions(self, limit: int = 20) -> List[Tuple[str, int, int]]:
+        """
+        (frame, self samples, total samples) of the hottest frames: self
+        counts stacks ending in the frame, total counts stacks containing it.
+        """
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.folded():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [(frame, count, total[frame]) for frame, count in own.most_common(limit)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "distinct_stacks": len(self.stacks),
+            "since": self._started_at,
+        }
+
+    def report(self, limit: int = 30) -> str:
+        lines = [f"{self.samples} samples every {self.interval * 1000:g}ms", ""]
+        lines.append(f"{'self':>7} {'total':>7}  frame")
+        for frame, own, total in self.top_functions(limit):
+            lines.append(f"{own:7d} {total:7d}  {frame}")
+        lines.append("")
+        lines.extend(f"{stack} {count}" for stack, count in self.folded(limit))
+        return "\n".join(lines)
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+def _fold(frame) -> str:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(
+            f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+        )
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+def profile_call(
+    mode: str, fn: Callable, *args, interval: float = 0.001, **kwargs
+) -> Tuple[Any, str]:
+    """
+    Run `fn` under `mode` ("cprofile" or "sample") in the calling thread.
+    Returns its result and a text report. Only this thread is profiled, so
+    `fn` should do its work here rather than hand it to another executor.
+    Sampling only sees calls that outlast the interpreter's switch interval
+    (5ms by default); cProfile counts every call at some cost in speed.
+    """
+    if mode == "cprofile":
+        profile = cProfile.Profile()
+        result = profile.runcall(fn, *args, **kwargs)
+        stream = io.StringIO()
+        pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(40)
+        return result, stream.getvalue()
+
+    if mode == "sample":
+        sampler = StackSampler(
+            interval, thread_ids=[threading.get_ident()], include_idle=True
+        )
+        sampler.start()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            sampler.stop()
+        return result, sampler.report()
+
+    raise ValueError(f"Unknown profile mode {mode!r}, expected one of {PROFILE_MODES}")
+
+
+class ProfileStore:
+    """The last `max_entries` request profiles, by id."""
+
+    def __init__(self, max_entries: int = 50):
+        self.max_entries = max_entries
+        self._profiles: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, mode: str, path: str, seconds: float, report: str) -> str:
+        profile_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._profiles[profile_id] = {
+                "id": profile_id,
+                "mode": mode,
+                "path": path,
+                "created": time.time(),
+                "duration_ms": seconds * 1000,
+                "report": report,
+            }
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [
+            {key: value for key, value in profile.items() if key != "report"}
+            for profile in reversed(profiles)
+        ]
@@ -0,0 +1,792 @@
+import os
+import copy
+import logging
+import itertools
+import threading
+import numpy as np
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from src.types.basic_types import User
+
+logger = logging.getLogger("app_logger")
+
+MAX_AGE_DIFFERENCE = 100
+SIMILARITY_TERMS = 6
+
+SPARSE_FEATURES = ("places", "favorites", "tags", "metric_places")
+DENSE_FEATURES = (
+    "n_tags",
+    "ages",
+    "genres",
+    "genders",
+    "active",
+    "metric_interactions",
+    "metric_tags",
+)
+INVERTED_INDEXES = ("place_users", "favorite_users", "tag_users")
+INDEXED_FEATURES = dict(zip(INVERTED_INDEXES, ("places", "favorites", "tags")))
+
+# `top_k` scores everyone instead of the candidates once the inverted-index
+# entries of the query's items outnumber this share of all users.
+MAX_CANDIDATE_SHARE = 0.5
+
+
+class SparseRows:
+    """
+    Row-compressed (CSR) sparse matrix using plain NumPy arrays.
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray):
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_rows(cls, rows: List[List[int]]) -> "SparseRows":
+        lengths = np.fromiter(
+            (len(row) for row in rows), dtype=np.int64, count=len(rows)
+        )
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.fromiter(
+            itertools.chain.from_iterable(rows), dtype=np.int32, count=int(indptr[-1])
+        )
+        return cls(indptr, indices)
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.indptr) - 1
+
+    def row_lengths(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def transpose(self, n_cols: int) -> "SparseRows":
+        """Inverted index: column -> rows that contain it."""
+        rows = np.repeat(np.arange(self.n_rows, dtype=np.int32), self.row_lengths())
+        order = np.argsort(self.indices, kind="stable")
+        counts = np.bincount(self.indices, minlength=n_cols)
+        indptr = np.zeros(n_cols + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return SparseRows(indptr, rows[order])
+
+    def expand(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Concatenate the rows listed in `keys`. Returns the concatenated column
+        indices and, for each of them, the position in `keys` it came from.
+        """
+        positions, owner, _ = self._positions(keys)
+        return self.indices[positions], owner
+
+    def gather(
+        self, keys: np.ndarray, values: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """`expand`, plus the entries of `values` (aligned with the indices)."""
+        positions, owner, _ = self._positions(keys)
+        return self.indices[positions], owner, values[positions]
+
+    def _positions(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Flat positions of the rows in `keys`, their owner and in-row offset."""
+        starts = self.indptr[keys]
+        lengths = self.indptr[keys + 1] - starts
+        total = int(lengths.sum())
+        owner = np.repeat(np.arange(len(keys)), lengths)
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return np.repeat(starts, lengths) + offsets, owner, offsets
+
+    def take(self, rows: np.ndarray) -> "SparseRows":
+        """Sub-matrix with only the given rows."""
+        indices, _ = self.expand(rows)
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(self.indptr[rows + 1] - self.indptr[rows], out=indptr[1:])
+        return SparseRows(indptr, indices)
+
+    def replace_rows(
+        self,
+        rows: np.ndarray,
+        new: "SparseRows",
+        data: Sequence[np.ndarray] = (),
+        new_data: Sequence[np.ndarray] = (),
+    ) -> Tuple["SparseRows", List[np.ndarray]]:
+        """
+        Copy with `rows` replaced by the rows of `new`; rows past the end are
+        appended. `data`/`new_data` are value arrays aligned with the indices,
+        spliced the same way.
+        """
+        n_rows = max(self.n_rows, int(rows.max()) + 1 if len(rows) else 0)
+        lengths = np.zeros(n_rows, dtype=np.int64)
+        lengths[: self.n_rows] = self.row_lengths()
+        lengths[rows] = new.row_lengths()
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+
+        indices = np.empty(indptr[-1], dtype=self.indices.dtype)
+        values = [np.empty(indptr[-1], dtype=column.dtype) for column in data]
+
+        kept = np.ones(self.n_rows, dtype=bool)
+        kept[rows[rows < self.n_rows]] = False
+        kept = np.flatnonzero(kept)
+        for source, source_rows, target_rows, source_data in (
+            (self, kept, kept, data),
+            (new, np.arange(len(rows)), rows, new_data),
+        ):
+            positions, owner, offsets = source._positions(source_rows)
+            target = indptr[target_rows][owner] + offsets
+            indices[target] = source.indices[positions]
+            for column, source_column in zip(values, source_data):
+                column[target] = source_column[positions]
+
+        return SparseRows(indptr, indices), values
+
+
+class Vocabulary(dict):
+    """Value -> integer code, plus `by_code` to decode. Only ever grows."""
+
+    def __init__(self):
+        super().__init__()
+        self.by_code: List = []
+        self._lock = threading.Lock()
+
+    def add(self, value) -> int:
+        code = self.get(value)
+        if code is None:
+            with self._lock:
+                code = self.get(value)
+                if code is None:
+                    # Decodable before it is visible to concurrent readers.
+                    code = len(self.by_code)
+                    self.by_code.append(value)
+                    self[value] = code
+        return code
+
+
+class UserFeatureMatrix:
+    """
+    Encodes users once into NumPy arrays: place/favorite/tag incidence (CSR),
+    age vector and integer codes for music_genre and gender. The raw metrics
+    are kept as CSR too (place, interactions and tag per metric), so this is
+    also the in-memory user store (see `src.models.user_store`).
+    """
+
+    def __init__(self, users: Iterable[User]):
+        self.user_ids: List[str] = []
+        self.names: List[str] = []
+        self.row_by_user_id: Dict[str, int] = {}
+        self.place_vocab = Vocabulary()
+        self.tag_vocab = Vocabulary()
+        self.genre_vocab = Vocabulary()
+        self.gender_vocab = Vocabulary()
+
+        def registered(users: Iterable[User]) -> Iterator[User]:
+            for user in users:
+                self.row_by_user_id[user.user_id] = len(self.user_ids)
+                self.user_ids.append(user.user_id)
+                self.names.append(user.name)
+                yield user
+
+        # Encoded in one pass, so `users` can be a stream that is never held
+        # in memory as a whole.
+        (
+            self.places,
+            self.favorites,
+            self.tags,
+            self.n_tags,
+            self.ages,
+            self.genres,
+            self.genders,
+            self.metric_places,
+            self.metric_interactions,
+            self.metric_tags,
+        ) = self._encode_rows(registered(users))
+        self.active = np.ones(self.n_users, dtype=bool)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "UserFeatureMatrix":
+        """
+        Rebuild from exported arrays only. Ids and vocabularies are left empty,
+        so the result can score and aggregate rows but not encode new users.
+        """
+        features = cls([])
+        for name in SPARSE_FEATURES:
+            setattr(
+                features,
+                name,
+                SparseRows(arrays[f"{name}_indptr"], arrays[f"{name}_indices"]),
+            )
+        for name in DENSE_FEATURES:
+            setattr(features, name, arrays[name])
+        return features
+
+    @property
+    def n_users(self) -> int:
+        return len(self.ages)
+
+    def upserted(
+        self, users: Iterable[User], removed_user_ids: Iterable[str] = ()
+    ) -> "UserFeatureMatrix":
+        """
+        Copy with `users` re-encoded in place (appended when new) and
+        `removed_user_ids` deactivated. Only the touched rows are encoded;
+        vocabularies are shared with the original and only ever grow.
+        """
+        updated = copy.copy(self)
+        updated.user_ids = list(self.user_ids)
+        updated.names = list(self.names)
+        updated.row_by_user_id = dict(self.row_by_user_id)
+
+        users = list(users)
+        rows = []
+        for user in users:
+            row = updated.row_by_user_id.get(user.user_id)
+            if row is None:
+                row = len(updated.user_ids)
+                updated.row_by_user_id[user.user_id] = row
+                updated.user_ids.append(user.user_id)
+                updated.names.append(user.name)
+            else:
+                updated.names[row] = user.name
+            rows.append(row)
+        rows = np.array(rows, dtype=np.int64)
+
+        (
+            places,
+            favorites,
+            tags,
+            n_tags,
+            ages,
+            genres,
+            genders,
+            metric_places,
+            metric_interactions,
+            metric_tags,
+        ) = self._encode_rows(users)
+
+        updated.places, _ = self.places.replace_rows(rows, places)
+        updated.favorites, _ = self.favorites.replace_rows(rows, favorites)
+        updated.tags, _ = self.tags.replace_rows(rows, tags)
+        updated.metric_places, (
+            updated.metric_interactions,
+            updated.metric_tags,
+        ) = self.metric_places.replace_rows(
+            rows,
+            metric_places,
+            (self.metric_interactions, self.metric_tags),
+            (metric_interactions, metric_tags),
+        )
+
+        n_users = len(updated.user_ids)
+        for name, values in (
+            ("n_tags", n_tags),
+            ("ages", ages),
+            ("genres", genres),
+            ("genders", genders),
+            ("active", True),
+        ):
+            column = getattr(self, name)
+            resized = np.zeros(n_users, dtype=column.dtype)
+            resized[: len(column)] = column
+            resized[rows] = values
+            setattr(updated, name, resized)
+
+        for user_id in removed_user_ids:
+            row = updated.row_by_user_id.get(user_id)
+            if row is not None:
+                updated.active[row] = False
+        return updated
+
+    @property
+    def place_ids(self) -> List[str]:
+        """Place ids by their integer code."""
+        return self.place_vocab.by_code
+
+    def encode(self, users: Iterable[User]) -> tuple:
+        """Encode query users with the current vocabularies, without growing them."""
+        return self._to_arrays([self._encode_user(user, grow=False) for user in users])
+
+    def take(self, rows: np.ndarray) -> tuple:
+        """Already encoded users, in the same layout returned by `encode`."""
+        return (
+            self.places.take(rows),
+            self.favorites.take(rows),
+            self.tags.take(rows),
+            self.n_tags[rows],
+            self.ages[rows],
+            self.genres[rows],
+            self.genders[rows],
+        )
+
+    def _encode_rows(self, users: Iterable[User]) -> tuple:
+        """Stored-user layout: `encode`'s arrays plus the raw metrics."""
+        encoded = []
+        metric_rows = []
+        metric_interactions = []
+        metric_tags = []
+        for user in users:
+            encoded.append(self._encode_user(user, grow=True))
+
+            # Raw metrics, duplicates and order preserved, for aggregation.
+            metrics = user.metrics or []
+            metric_rows.append([self.place_vocab[m.place_id] for m in metrics])
+            metric_interactions.extend(m.interactions for m in metrics)
+            metric_tags.extend(self.tag_vocab[m.interest] for m in metrics)
+
+        return self._to_arrays(encoded) + (
+            SparseRows.from_rows(metric_rows),
+            np.array(metric_interactions, dtype=np.int64),
+            np.array(metric_tags, dtype=np.int32),
+        )
+
+    def _encode_user(self, user: User, grow: bool) -> tuple:
+        metrics = user.metrics or []
+        favorites = user.favorite_places or []
+        tags = {metric.interest for metric in metrics}
+        return (
+            self._lookup(self.place_vocab, {m.place_id for m in metrics}, grow),
+            self._lookup(self.place_vocab, {f.place_id for f in favorites}, grow),
+            self._lookup(self.tag_vocab, tags, grow),
+            len(tags),
+            user.age,
+            self._code(self.genre_vocab, user.music_genre, grow),
+            self._code(self.gender_vocab, user.gender, grow),
+        )
+
+    @staticmethod
+    def _lookup(vocab: Vocabulary, values: set, grow: bool) -> List[int]:
+        # Values unknown to the vocabulary can't be shared with anyone, so
+        # queries simply drop them.
+        if grow:
+            return sorted(vocab.add(value) for value in values)
+        return sorted(vocab[value] for value in values if value in vocab)
+
+    @staticmethod
+    def _code(vocab: Vocabulary, value, grow: bool) -> int:
+        if grow:
+            return vocab.add(value)
+        return vocab.get(value, -1)
+
+    @staticmethod
+    def _to_arrays(encoded: list) -> tuple:
+        columns = list(zip(*encoded)) if encoded else [()] * 7
+        return (
+            SparseRows.from_rows(list(columns[0])),
+            SparseRows.from_rows(list(columns[1])),
+            SparseRows.from_rows(list(columns[2])),
+            np.array(columns[3], dtype=np.int32),
+            np.array(columns[4], dtype=np.float64),
+            np.array(columns[5], dtype=np.int32),
+            np.array(columns[6], dtype=np.int32),
+        )
+
+
+class DemographicIndex:
+    """
+    Rows grouped by (music_genre, gender) code, sorted by age and then row.
+
+    A user who shares no place, favorite or tag with a query scores on age,
+    music_genre and gender alone, so within a group the best of them are
+    simply the closest in age.
+    """
+
+    def __init__(self, features: UserFeatureMatrix):
+        rows = np.arange(features.n_users)
+        order = np.lexsort((rows, features.ages, features.genders, features.genres))
+        genres, genders = features.genres[order], features.genders[order]
+        starts = np.flatnonzero(
+            np.diff(genres, prepend=-2) | np.diff(genders, prepend=-2)
+        )
+        self.groups: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]] = {
+            (int(genres[start]), int(genders[start])): (
+                features.ages[group],
+                group,
+            )
+            for start, group in zip(starts, np.split(order, starts[1:]))
+        }
+
+    def upserted(
+        self, previous: UserFeatureMatrix, features: UserFeatureMatrix, rows: np.ndarray
+    ) -> "DemographicIndex":
+        """Copy with `rows` moved to their groups in `features`; only those re-sort."""
+        updated = copy.copy(self)
+        updated.groups = dict(self.groups)
+        existing = rows[rows < previous.n_users]
+        touched = set(
+            zip(previous.genres[existing].tolist(), previous.genders[existing].tolist())
+        )
+        new_keys = list(
+            zip(features.genres[rows].tolist(), features.genders[rows].tolist())
+        )
+        touched.update(new_keys)
+
+        for key in touched:
+            _, members = self.groups.get(key, (None, np.empty(0, dtype=np.int64)))
+            members = np.concatenate(
+                [
+                    members[~np.isin(members, rows)],
+                    rows[[new_key == key for new_key in new_keys]],
+                ]
+            )
+            if not len(members):
+                updated.groups.pop(key, None)
+                continue
+            members = members[np.lexsort((members, features.ages[members]))]
+            updated.groups[key] = (features.ages[members], members)
+        return updated
+
+    def shortlist(
+        self, genre: int, gender: int, age: float, k: int, excluded: np.ndarray
+    ) -> np.ndarray:
+        """
+        A superset of the k best users outside `excluded`, for users who
+        share nothing with the query: the closest in age per group (ties
+        with the k-th included), visiting groups by how many of genre and
+        gender they match and stopping once the next tier can't compete.
+        """
+        tiers: Dict[int, list] = {}
+        for (group_genre, group_gender), group in self.groups.items():
+            matches = int(group_genre == genre) + int(group_gender == gender)
+            tiers.setdefault(matches, []).append(group)
+
+        found = []
+        values = []
+        for matches in sorted(tiers, reverse=True):
+            # A user of this tier scores at most `matches + 1` (same age);
+            # the margin keeps float rounding on the safe side.
+            if sum(map(len, values)) >= k:
+                kth = -np.partition(-np.concatenate(values), k - 1)[k - 1]
+                if kth > matches + 1 + 1e-9:
+                    break
+            for ages, rows in tiers[matches]:
+                closest, distances = _closest_ages(ages, rows, age, k, excluded)
+                found.append(closest)
+                values.append(matches + 1 - distances / MAX_AGE_DIFFERENCE)
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(found)
+
+
+def _closest_ages(
+    ages: np.ndarray, rows: np.ndarray, age: float, k: int, excluded: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The k rows (sorted by age) closest to `age` that are not `excluded`,
+    plus any tied with the k-th, and their age distances.
+    """
+    position = np.searchsorted(ages, age)
+    width = k
+    while True:
+        low, high = max(0, position - width), min(len(rows), position + width)
+        distances = np.abs(ages[low:high] - age)[~excluded[rows[low:high]]]
+        if len(distances) >= k or (low == 0 and high == len(rows)):
+            break
+        width *= 2
+    if not len(distances):
+        return rows[:0], distances
+
+    # The window's k-th distance bounds the true one: take everything
+    # within it, so rows tied with the k-th are all there.
+    top = min(k, len(distances))
+    kth = np.partition(distances, top - 1)[top - 1]
+    low = np.searchsorted(ages, np.nextafter(age - kth, -np.inf))
+    high = np.searchsorted(ages, np.nextafter(age + kth, np.inf), "right")
+    window = rows[low:high]
+    eligible = ~excluded[window]
+    distances = np.abs(ages[low:high] - age)[eligible]
+    closest = distances <= kth
+    return window[eligible][closest], distances[closest]
+
+
+class SimilarityEngine:
+    """
+    Scores users against encoded users with a handful of array ops.
+
+    The result is the same six-term mean as
+    `CustomRecommendationModel.calculate_similarity`: shared places, shared
+    favorites, age, music_genre, gender and tag Jaccard.
+    """
+
+    def __init__(self, features: UserFeatureMatrix):
+        self.features = features
+        self.place_users = features.places.transpose(len(features.place_vocab))
+        self.favorite_users = features.favorites.transpose(len(features.place_vocab))
+        self.tag_users = features.tags.transpose(len(features.tag_vocab))
+        self.demographics = DemographicIndex(features)
+
+    def upserted(
+        self, users: Iterable[User], removed_user_ids: Iterable[str] = ()
+    ) -> "SimilarityEngine":
+        """
+        Engine over `features.upserted(users, removed_user_ids)`. The inverted
+        and demographic indexes are patched for the touched rows instead of
+        rebuilt; removed users stay in them and are masked as inactive.
+        """
+        users = list(users)
+        features = self.features.upserted(users, removed_user_ids)
+        rows = np.array(
+            [features.row_by_user_id[user.user_id] for user in users], dtype=np.int64
+        )
+
+        engine = copy.copy(self)
+        engine.features = features
+        for name, feature in INDEXED_FEATURES.items():
+            setattr(
+                engine,
+                name,
+                _patch_inverted(
+                    getattr(self, name),
+                    getattr(self.features, feature),
+                    getattr(features, feature),
+                    rows,
+                ),
+            )
+        engine.demographics = self.demographics.upserted(self.features, features, rows)
+        return engine
+
+    def save_arrays(self, directory: str) -> None:
+        """Dump every array as .npy so other processes can memory-map them."""
+        arrays = {name: getattr(self.features, name) for name in DENSE_FEATURES}
+        for owner, names in (
+            (self.features, SPARSE_FEATURES),
+            (self, INVERTED_INDEXES),
+        ):
+            for name in names:
+                sparse = getattr(owner, name)
+                arrays[f"{name}_indptr"] = sparse.indptr
+                arrays[f"{name}_indices"] = sparse.indices
+
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+
+    @classmethod
+    def load_arrays(cls, directory: str) -> "SimilarityEngine":
+        """Read-only engine over the memory-mapped output of `save_arrays`."""
+        arrays = {
+            file_name[: -len(".npy")]: np.load(
+                os.path.join(directory, file_name), mmap_mode="r"
+            )
+            for file_name in os.listdir(directory)
+            if file_name.endswith(".npy")
+        }
+        engine = cls.__new__(cls)
+        engine.features = UserFeatureMatrix.from_arrays(arrays)
+        for name in INVERTED_INDEXES:
+            setattr(
+                engine,
+                name,
+                SparseRows(arrays[f"{name}_indptr"], arrays[f"{name}_indices"]),
+            )
+        engine.demographics = DemographicIndex(engine.features)
+        return engine
+
+    def _overlap(
+        self, query: SparseRows, inverted: SparseRows, n_queries: int
+    ) -> np.ndarray:
+        """Number of shared columns between each query row and every user."""
+        columns, entry_owner = query.expand(np.arange(n_queries))
+        # Codes added to the shared vocabularies after this engine was built.
+        known = columns < inverted.n_rows
+        columns, entry_owner = columns[known], entry_owner[known]
+        users, column_owner = inverted.expand(columns)
+        flat = entry_owner[column_owner] * self.features.n_users + users
+        counts = np.bincount(flat, minlength=n_queries * self.features.n_users)
+        return counts.reshape(n_queries, self.features.n_users)
+
+    def score(self, query: tuple) -> np.ndarray:
+        """Similarity of each encoded query user (rows) against every user."""
+        places, favorites, tags = query[:3]
+        n_queries = len(query[4])
+        return self._combine(
+            query,
+            slice(None),
+            self._overlap(places, self.place_users, n_queries),
+            self._overlap(favorites, self.favorite_users, n_queries),
+            self._overlap(tags, self.tag_users, n_queries),
+        )
+
+    def score_candidates(self, query: tuple, rows: np.ndarray) -> np.ndarray:
+        """
+        Similarity of one encoded query user against the given rows only, the
+        same values `score` gives for them, without a pass over every user.
+        `rows` must be sorted.
+        """
+        places, favorites, tags = query[:3]
+        return self._combine(
+            query,
+            rows,
+            _row_overlap(places, self.place_users, rows)[None, :],
+            _row_overlap(favorites, self.favorite_users, rows)[None, :],
+            _row_overlap(tags, self.tag_users, rows)[None, :],
+        )[0]
+
+    def _combine(
+        self,
+        query: tuple,
+        rows,
+        common_places: np.ndarray,
+        common_favorites: np.ndarray,
+        common_tags: np.ndarray,
+    ) -> np.ndarray:
+        """The six-term mean, queries x `rows`, from the shared-item counts."""
+        n_tags, ages, genres, genders = query[3:]
+        features = self.features
+
+        metrics_similarity = _binary_cosine(common_places)
+        favorites_similarity = _binary_cosine(common_favorites)
+        age_similarity = (
+            1 - np.abs(ages[:, None] - features.ages[None, rows]) / MAX_AGE_DIFFERENCE
+        )
+        genre_similarity = genres[:, None] == features.genres[None, rows]
+        gender_similarity = genders[:, None] == features.genders[None, rows]
+
+        all_tags = n_tags[:, None] + features.n_tags[None, rows] - common_tags
+        tag_similarity = np.divide(
+            common_tags,
+            all_tags,
+            out=np.zeros(common_tags.shape, dtype=np.float64),
+            where=all_tags > 0,
+        )
+
+        # Same summation order as np.mean over the six-term dict.
+        total = metrics_similarity
+        total += favorites_similarity
+        total += age_similarity
+        total += genre_similarity
+        total += gender_similarity
+        total += tag_similarity
+        return total / SIMILARITY_TERMS
+
+    def top_k(
+        self, user: User, k: int, min_similarity: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows and scores of the k most similar users above `min_similarity`."""
+        query = self.features.encode([user])
+        own_row = self.features.row_by_user_id.get(user.user_id)
+
+        rows = self.candidates(query, k, own_row)
+        if rows is not None:
+            positions, scores = select_top_k(
+                self.score_candidates(query, rows), k, min_similarity
+            )
+            return rows[positions], scores
+
+        scores = self.score(query)[0]
+        scores[~self.features.active] = -np.inf
+        if own_row is not None:
+            scores[own_row] = -np.inf
+        return select_top_k(scores, k, min_similarity)
+
+    def candidates(self, query: tuple, k: int, own_row=None) -> Optional[np.ndarray]:
+        """
+        Sorted rows that can be in the query's top k: every active user who
+        shares a place, favorite or tag with it, plus the demographic
+        shortlist of those who don't. None when the query's items are so
+        common that scoring everyone is cheaper.
+        """
+        features = self.features
+        shared_columns = []
+        cost = 0
+        for name, sparse in zip(INVERTED_INDEXES, query[:3]):
+            inverted = getattr(self, name)
+            columns = sparse.indices[sparse.indptr[0] : sparse.indptr[1]]
+            columns = columns[columns < inverted.n_rows]
+            cost += int((inverted.indptr[columns + 1] - inverted.indptr[columns]).sum())
+            shared_columns.append((inverted, columns))
+        if cost > features.n_users * MAX_CANDIDATE_SHARE:
+            return None
+
+        excluded = ~features.active
+        if own_row is not None:
+            excluded[own_row] = True
+        selected = np.zeros(features.n_users, dtype=bool)
+        for inverted, columns in shared_columns:
+            users, _ = inverted.expand(columns)
+            selected[users] = True
+        selected &= ~excluded
+        excluded |= selected
+
+        _, _, _, _, ages, genres, genders = query
+        selected[
+            self.demographics.shortlist(genres[0], genders[0], ages[0], k, excluded)
+        ] = True
+        return np.flatnonzero(selected)
+
+    def score_rows(self, rows: np.ndarray) -> np.ndarray:
+        """Scores of encoded users against everyone, excluding themselves."""
+        scores = self.score(self.features.take(rows))
+        scores[:, ~self.features.active] = -np.inf
+        scores[np.arange(len(rows)), rows] = -np.inf
+        return scores
+
+
+def _patch_inverted(
+    inverted: SparseRows, previous: SparseRows, sparse: SparseRows, rows: np.ndarray
+) -> SparseRows:
+    """
+    `inverted` (column -> rows of `previous`) updated for `rows` now reading
+    as in `sparse`. Only the columns those rows left or joined are rewritten.
+    """
+    old_columns, _ = previous.expand(rows[rows < previous.n_rows])
+    new_columns, new_owner = sparse.expand(rows)
+    columns = np.union1d(old_columns, new_columns)
+    if not len(columns):
+        return inverted
+
+    known = columns[columns < inverted.n_rows]
+    touched = int((inverted.indptr[known + 1] - inverted.indptr[known]).sum())
+    if touched * 2 > len(inverted.indices):
+        # Mostly hot columns (popular tags): rebuilding is cheaper.
+        return sparse.transpose(max(inverted.n_rows, int(columns[-1]) + 1))
+    users, owner = inverted.expand(known)
+    kept = ~np.isin(users, rows)
+    column_positions = np.concatenate(
+        [
+            np.searchsorted(columns, known)[owner[kept]],
+            np.searchsorted(columns, new_columns),
+        ]
+    )
+    column_users = np.concatenate([users[kept], rows[new_owner]])
+    order = np.lexsort((column_users, column_positions))
+
+    indptr = np.zeros(len(columns) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(column_positions, minlength=len(columns)), out=indptr[1:])
+    patch = SparseRows(indptr, column_users[order].astype(inverted.indices.dtype))
+    patched, _ = inverted.replace_rows(columns.astype(np.int64), patch)
+    return patched
+
+
+def _row_overlap(
+    query: SparseRows, inverted: SparseRows, rows: np.ndarray
+) -> np.ndarray:
+    """Number of columns of the single `query` row shared with each of `rows`."""
+    columns = query.indices[query.indptr[0] : query.indptr[1]]
+    users, _ = inverted.expand(columns[columns < inverted.n_rows])
+    if not len(rows):
+        return np.zeros(0, dtype=np.int64)
+    # Dense rows: count every user once. Sparse rows: look each one up.
+    if len(rows) * 16 > rows[-1]:
+        return np.bincount(users, minlength=int(rows[-1]) + 1)[rows]
+    users.sort()
+    return np.searchsorted(users, rows, "right") - np.searchsorted(users, rows, "left")
+
+
+def _binary_cosine(common: np.ndarray) -> np.ndarray:
+    """
+    Cosine between the all-ones vectors restricted to the shared items, as in
+    `_cosine_similarity`: 1.0 when anything is shared (up to rounding), else 0.
+    """
+    norm = np.sqrt(common)
+    norm = norm * norm
+    return np.divide(
+        common, norm, out=np.zeros(common.shape, dtype=np.float64), where=common > 0
+    )
+
+
+def select_top_k(
+    scores: np.ndarray, k: int, min_similarity: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Stable descending top-k: ties keep row order, like `list.sort`."""
+    rows = np.flatnonzero(scores > min_similarity)
+    if k <= 0 or len(rows) == 0:
+        return rows[:0], scores[rows[:0]]
+    if len(rows) > k:
+        kth = np.partition(scores[rows], len(rows) - k)[len(rows) - k]
+        rows = rows[scores[rows] >= kth]
+    order = np.argsort(-scores[rows], kind="stable")[:k]
+    rows = rows[order]
+    return rows, scores[rows]
@@ -0,0 +1,48 @@
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from src.models.metrics import Histogram
+
+
+class StageTimer:
+    """
+    Wall time of the named stages of one request, summed per stage, so a
+    request logs a single line instead of one per step. Each stage is also
+    observed into `histogram`, labelled by stage, when one is given.
+    """
+
+    def __init__(self, histogram: Optional[Histogram] = None):
+        self.stages: Dict[str, float] = {}
+        self.histogram = histogram
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        if self.histogram is not None:
+            self.histogram.observe(seconds, stage=name)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def log(
+        self, logger: logging.Logger, message: str, *args, level: int = logging.INFO
+    ) -> None:
+        """`message % args`, then the total and per-stage milliseconds."""
+        if not logger.isEnabledFor(level):
+            return
+        stages = ", ".join(
+            f"{name} {seconds * 1000:.1f}ms" for name, seconds in self.stages.items()
+        )
+        logger.log(
+            level, message + " in %.1fms (%s)", *args, self.elapsed * 1000, stages
+        )
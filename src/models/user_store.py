@@ -0,0 +1,147 @@
+import numpy as np
+from typing import Iterator, List, Optional
+from src.types.basic_types import User, Metrics, FavoritePlaces
+from src.models.similarity_engine import UserFeatureMatrix
+
+
+class UserView:
+    """
+    One stored user, read straight from the columnar arrays.
+
+    Quacks like `User` (`user_id`, `age`, `metrics`, ...) so existing code
+    keeps working, but hot paths should use the `metric_*` arrays instead of
+    `metrics`, which builds pydantic objects on every access.
+    """
+
+    __slots__ = ("features", "row")
+
+    def __init__(self, features: UserFeatureMatrix, row: int):
+        self.features = features
+        self.row = row
+
+    @property
+    def user_id(self) -> str:
+        return self.features.user_ids[self.row]
+
+    @property
+    def name(self) -> str:
+        return self.features.names[self.row]
+
+    @property
+    def age(self) -> int:
+        return int(self.features.ages[self.row])
+
+    @property
+    def music_genre(self) -> str:
+        return self.features.genre_vocab.by_code[self.features.genres[self.row]]
+
+    @property
+    def gender(self) -> str:
+        return self.features.gender_vocab.by_code[self.features.genders[self.row]]
+
+    @property
+    def _metric_slice(self) -> slice:
+        indptr = self.features.metric_places.indptr
+        return slice(indptr[self.row], indptr[self.row + 1])
+
+    @property
+    def metric_place_codes(self) -> np.ndarray:
+        return self.features.metric_places.indices[self._metric_slice]
+
+    @property
+    def metric_interactions(self) -> np.ndarray:
+        return self.features.metric_interactions[self._metric_slice]
+
+    @property
+    def metric_tag_codes(self) -> np.ndarray:
+        return self.features.metric_tags[self._metric_slice]
+
+    @property
+    def favorite_place_codes(self) -> np.ndarray:
+        indptr = self.features.favorites.indptr
+        return self.features.favorites.indices[indptr[self.row] : indptr[self.row + 1]]
+
+    @property
+    def metrics(self) -> List[Metrics]:
+        place_ids = self.features.place_vocab.by_code
+        tags = self.features.tag_vocab.by_code
+        return [
+            Metrics(
+                place_id=place_ids[place],
+                user_id=self.user_id,
+                interactions=interactions,
+                interest=tags[tag],
+            )
+            for place, interactions, tag in zip(
+                self.metric_place_codes.tolist(),
+                self.metric_interactions.tolist(),
+                self.metric_tag_codes.tolist(),
+            )
+        ]
+
+    @property
+    def favorite_places(self) -> List[FavoritePlaces]:
+        place_ids = self.features.place_vocab.by_code
+        return [
+            FavoritePlaces(place_id=place_ids[place], user_id=self.user_id)
+            for place in self.favorite_place_codes.tolist()
+        ]
+
+    def to_user(self) -> User:
+        return User(
+            user_id=self.user_id,
+            name=self.name,
+            age=self.age,
+            gender=self.gender,
+            music_genre=self.music_genre,
+            metrics=self.metrics,
+            favorite_places=self.favorite_places,
+        )
+
+    def __repr__(self) -> str:
+        return f"UserView(user_id={self.user_id!r}, row={self.row})"
+
+
+class UserStore:
+    """
+    Dict-like access by user id to the users held in a `UserFeatureMatrix`:
+    interned ids and codes, CSR metrics and favorites, NumPy demographics.
+    Deactivated (deleted) users are hidden.
+    """
+
+    def __init__(self, features: UserFeatureMatrix):
+        self.features = features
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.features.active))
+
+    def __contains__(self, user_id: str) -> bool:
+        return self._row(user_id) is not None
+
+    def __getitem__(self, user_id: str) -> UserView:
+        row = self._row(user_id)
+        if row is None:
+            raise KeyError(user_id)
+        return UserView(self.features, row)
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.features.user_ids[row] for row in self._active_rows())
+
+    def get(self, user_id: str) -> Optional[UserView]:
+        row = self._row(user_id)
+        return None if row is None else UserView(self.features, row)
+
+    def view(self, row: int) -> UserView:
+        return UserView(self.features, int(row))
+
+    def values(self) -> Iterator[UserView]:
+        return (UserView(self.features, row) for row in self._active_rows())
+
+    def _row(self, user_id: str) -> Optional[int]:
+        row = self.features.row_by_user_id.get(user_id)
+        if row is None or not self.features.active[row]:
+            return None
+        return row
+
+    def _active_rows(self) -> List[int]:
+        return np.flatnonzero(self.features.active).tolist()
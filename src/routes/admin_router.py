@@ -0,0 +1,72 @@
+from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi.responses import PlainTextResponse
+from src.dependencies.profiling import profile_store, sampler
+
+router = APIRouter()
+
+
+@router.get("/profile/requests/")
+async def list_request_profiles():
+    """
+    Profiles captured from recommendation requests, newest first.
+    """
+    return {"data": profile_store.list()}
+
+
+@router.get("/profile/requests/{profile_id}", response_class=PlainTextResponse)
+async def get_request_profile(
+    profile_id: str = Path(..., description="The X-Profile-Id of the request"),
+):
+    """
+    The cProfile or sampling report of one request.
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile["report"])
+
+
+@router.get("/profile/sampler/")
+async def sampler_stats():
+    """
+    State of the background stack sampler.
+    """
+    return {"data": sampler.stats()}
+
+
+@router.get("/profile/sampler/report", response_class=PlainTextResponse)
+async def sampler_report(
+    limit: int = Query(30, description="Number of frames and stacks to show"),
+):
+    """
+    Hottest frames and stacks seen by the sampler, stacks in folded format.
+    """
+    return PlainTextResponse(sampler.report(limit))
+
+
+@router.get("/profile/sampler/folded", response_class=PlainTextResponse)
+async def sampler_folded():
+    """
+    Every sampled stack in folded format, for flame graph tools.
+    """
+    return PlainTextResponse(
+        "\n".join(f"{stack} {count}" for stack, count in sampler.folded())
+    )
+
+
+@router.post("/profile/sampler/start")
+async def start_sampler():
+    sampler.start()
+    return {"message": "success"}
+
+
+@router.post("/profile/sampler/stop")
+async def stop_sampler():
+    sampler.stop()
+    return {"message": "success"}
+
+
+@router.delete("/profile/sampler/")
+async def reset_sampler():
+    sampler.reset()
+    return {"message": "success"}
@@ -1,4 +1,6 @@
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from src.models.metrics import REGISTRY
 
 router = APIRouter()
 
@@ -17,3 +19,14 @@ async def status():
     Get the status of the API.
     """
     return {"message": "running"}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Request, recommendation stage and database latencies, in the Prometheus
+    text format.
+    """
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
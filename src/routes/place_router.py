@@ -1,34 +1,80 @@
-from fastapi import APIRouter, Path, Depends
+from fastapi import APIRouter, Path, Depends, HTTPException
 from src.dependencies.db import get_db_controller
+from src.dependencies.buffer import get_interaction_buffer
+from src.dependencies.model import RecommendationModelSingleton
 from src.types.basic_types import Place, Interaction
+from src.exceptions.httpExceptions import ServiceUnavailableException
 
 router = APIRouter()
 
 
 @router.post("/interact/")
-async def interact(interaction: Interaction, db_controller=Depends(get_db_controller)):
+async def interact(
+    interaction: Interaction,
+    db_controller=Depends(get_db_controller),
+    interaction_buffer=Depends(get_interaction_buffer),
+):
     """
     Rate a place.
     """
-    db_controller.interact(interaction)
+    if interaction_buffer is None:
+        db_controller.interact(interaction)
+        RecommendationModelSingleton.invalidate_user(interaction.user_id)
+    else:
+        _buffer(lambda: interaction_buffer.add(interaction))
     return {"message": "success"}
 
 
+@router.post("/interact/batch")
+async def interact_batch(
+    interactions: list[Interaction],
+    db_controller=Depends(get_db_controller),
+    interaction_buffer=Depends(get_interaction_buffer),
+):
+    """
+    Rate many places in a single call.
+    """
+    if interaction_buffer is None:
+        db_controller.interact_many(interactions)
+        for user_id in {interaction.user_id for interaction in interactions}:
+            RecommendationModelSingleton.invalidate_user(user_id)
+    else:
+        _buffer(lambda: interaction_buffer.add_many(interactions))
+    return {"message": "success", "count": len(interactions)}
+
+
 @router.post("/like/{user_id}/{place_id}")
 async def like_place(
     place_id: str = Path(..., description="The ID of the place"),
     user_id: str = Path(..., description="The ID of the user"),
     db_controller=Depends(get_db_controller),
+    interaction_buffer=Depends(get_interaction_buffer),
 ):
     """
     Like a place.
     """
-    db_controller.like_place(place_id=place_id)
-    like_interaction = Interaction(user_id=user_id, place_id=place_id, interactions=1)
-    db_controller.interact(like_interaction)
+    if interaction_buffer is None:
+        db_controller.like_place(place_id=place_id, user_id=user_id)
+        like_interaction = Interaction(
+            user_id=user_id, place_id=place_id, interactions=1
+        )
+        db_controller.interact(like_interaction)
+        RecommendationModelSingleton.invalidate_user(user_id)
+    else:
+        _buffer(lambda: interaction_buffer.add_like(place_id=place_id, user_id=user_id))
     return {"message": "success"}
 
 
+def _buffer(add):
+    # A full buffer means the database is falling behind: ask clients to retry.
+    try:
+        add()
+    except ServiceUnavailableException as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "1"}
+        )
+
+
 @router.get("/get/all")
 def get_all_places(db_controller=Depends(get_db_controller)):
     """
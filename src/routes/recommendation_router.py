@@ -1,5 +1,13 @@
-from fastapi import APIRouter, Path, Query, Depends, HTTPException
+import time
+import asyncio
+from functools import partial
+from typing import Optional
+from fastapi import APIRouter, Path, Query, Header, Depends, HTTPException, Response
 from src.dependencies.model import get_recommendation_model
+from src.dependencies.db import get_async_db_controller
+from src.dependencies.executor import cpu_executor
+from src.dependencies.profiling import profile_store
+from src.models.profiling import PROFILE_MODES, profile_call
 
 from src.exceptions.httpExceptions import NotFoundException
 
@@ -12,20 +20,47 @@ async def get_recommendation_params(
     page: int = Path(..., description="Page number"),
     items_per_page: int = Query(10, description="Number of items per page"),
     k_neighboors: int = Query(default=7, description="Number of neighbors to consider"),
+    profile: Optional[str] = Query(
+        default=None, description="Profile this request: cprofile or sample"
+    ),
+    x_profile: Optional[str] = Header(default=None),
+    response: Response = None,
     recommendation_model=Depends(get_recommendation_model),
+    db_controller=Depends(get_async_db_controller),
 ):
     """
     Get recommendations for a user with specified parameters.
+
+    With `?profile=` or an `X-Profile` header (cprofile or sample) the request
+    is profiled and the report is stored under the X-Profile-Id response
+    header, readable at /admin/profile/requests/{id}.
     """
+    mode = profile or x_profile
+    if mode is not None and mode not in PROFILE_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"profile must be one of {', '.join(PROFILE_MODES)}",
+        )
 
     try:
-        recommendation_model.clear_cache(user_id=user_id)
+        if mode is not None:
+            return await _profiled_recommendation(
+                mode,
+                response,
+                recommendation_model,
+                user_id=user_id,
+                k_neighboors=k_neighboors,
+                page=page,
+                items_per_page=items_per_page,
+            )
 
-        return recommendation_model.recommend(
+        return await recommendation_model.recommend_async(
             user_id=user_id,
+            db_controller=db_controller,
             k_neighboors=k_neighboors,
             page=page,
             items_per_page=items_per_page,
+            executor=cpu_executor,
         )
 
     except NotFoundException as e:
@@ -35,6 +70,25 @@ async def get_recommendation_params(
         return {"message": str(e)}
 
 
+async def _profiled_recommendation(mode, response, recommendation_model, **kwargs):
+    """
+    Runs the whole request through the synchronous `recommend` on one
+    executor thread, since the profilers only see the thread they run on.
+    """
+    started = time.perf_counter()
+    recommendations, report = await asyncio.get_running_loop().run_in_executor(
+        cpu_executor,
+        partial(profile_call, mode, recommendation_model.recommend, **kwargs),
+    )
+    response.headers["X-Profile-Id"] = profile_store.add(
+        mode,
+        f"/recommendation/{kwargs['user_id']}/{kwargs['page']}/",
+        time.perf_counter() - started,
+        report,
+    )
+    return recommendations
+
+
 @router.delete("/clear_cache/")
 async def clear_cache(
     user_id: str = Query(default=None, description="User to delete from cache"),
@@ -45,3 +99,11 @@ async def clear_cache(
     """
     recommendation_model.clear_cache(user_id=user_id)
     return {"message": "success"}
+
+
+@router.get("/cache_stats/")
+async def cache_stats(recommendation_model=Depends(get_recommendation_model)):
+    """
+    Get the recommendation cache hit rate.
+    """
+    return {"data": recommendation_model.cache_stats()}
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, Path
 from src.types.basic_types import User
 from src.dependencies.db import get_db_controller
+from src.dependencies.model import RecommendationModelSingleton
 
 router = APIRouter()
 
@@ -19,6 +20,7 @@ async def create_user(user: User, db_controller=Depends(get_db_controller)):
     Create a new user.
     """
     db_controller.create_user(user)
+    RecommendationModelSingleton.invalidate_user(user.user_id)
 
 
 @router.get("/get/{user_id}")
@@ -42,6 +44,7 @@ async def update_user(
     Update a user.
     """
     db_controller.update(user_id=user_id, data=user)
+    RecommendationModelSingleton.invalidate_user(user_id)
 
 
 @router.delete("delete/{user_id}")
@@ -53,3 +56,4 @@ async def delete_user(
     Delete a user.
     """
     db_controller.delete(user_id=user_id)
+    RecommendationModelSingleton.invalidate_user(user_id)
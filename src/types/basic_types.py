@@ -6,6 +6,7 @@ class Place(BaseModel):
     place_id: str
     slug: str
     likes: int
+    rating: float | None = None
 
 
 class PlaceDTO(BaseModel):
@@ -1,13 +1,29 @@
-from typing import Iterable
-from src.types.basic_types import User, Place
+from typing import Iterable, Iterator
+from src.types.basic_types import User, Place, Interaction
 
 
 class Repository:
+    # Errors after which the same write is worth retrying: the database was
+    # unreachable, not the data wrong.
+    transient_errors: tuple = (ConnectionError, TimeoutError)
+
     def __init__(self, conn_url: str | None = None): ...
 
     # def create_user(self, user: User) -> None: ...
+    def create_users(self, users: Iterable[User]) -> None: ...
     def get_all_users(self) -> Iterable[User]: ...
+    def iter_user_chunks(
+        self, chunk_size: int | None = None
+    ) -> Iterator[list[User]]: ...
     def get_user_by_id(self, user_id: str) -> User: ...
+    def get_users_by_ids(self, user_ids: list[str]) -> Iterable[User]: ...
+    def get_users_sharing_places(
+        self, place_ids: list[str], limit: int
+    ) -> list[str]: ...
+    def last_user_change(self) -> int: ...
+    def get_user_changes(
+        self, after: int, limit: int = 10000
+    ) -> tuple[list[str], int]: ...
 
     # def update(self, user_id: str, data: User) -> None: ...
     # def delete(self, user_id: str) -> None: ...
@@ -15,7 +31,19 @@ class Repository:
     # def create_place(self, place: Place) -> None: ...
     def get_all_places(self) -> Iterable[Place]: ...
     def get_place_by_id(self, place_id: str) -> Place: ...
+    def get_places_by_ids(self, place_ids: list[str]) -> Iterable[Place]: ...
     def get_top_places(self, start: int, limit: int) -> Iterable[Place]: ...
+    def get_metric_place_tags(self) -> Iterable[tuple[str, str]]: ...
+
+    def interact(self, interaction: Interaction) -> None: ...
+    def interact_many(self, interactions: Iterable[Interaction]) -> None: ...
+    def like_many(self, likes: Iterable[tuple[str, str]]) -> None: ...
 
     # def update_place(self, place_id: str, data: Place) -> None: ...
     # def delete_place(self, place_id: str) -> None: ...
+
+
+class AsyncRepository:
+    async def get_user_by_id(self, user_id: str) -> User: ...
+    async def get_top_places(self, start: int, limit: int) -> Iterable[Place]: ...
+    async def get_places_by_ids(self, place_ids: list[str]) -> Iterable[Place]: ...
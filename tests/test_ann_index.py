@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from local.benchmarks.synthetic import SyntheticConfig, build_repository
+from src.models.ann_index import LSHIndex, recall_at_k
+from src.models.similarity_engine import SimilarityEngine, UserFeatureMatrix
+
+MIN_SIMILARITY = 0.1
+
+
+@pytest.fixture(scope="module")
+def users():
+    return build_repository(
+        SyntheticConfig(n_users=600, n_tags=20, seed=2)
+    ).get_all_users()
+
+
+def test_inserted_index_matches_a_rebuilt_one(users):
+    loaded, new = users[:450], users[450:]
+    engine = SimilarityEngine(UserFeatureMatrix(loaded))
+    index = LSHIndex.build(engine.features, n_tables=8, n_bits=5, probes=2)
+
+    # Existing users take another user's history, so most move bucket.
+    changed = [
+        user.model_copy(
+            update={
+                "metrics": [
+                    metric.model_copy(update={"user_id": user.user_id})
+                    for metric in other.metrics
+                ],
+                "age": other.age,
+            }
+        )
+        for user, other in zip(loaded[:40], loaded[200:240])
+    ]
+    removed = [user.user_id for user in loaded[300:320]]
+    engine = engine.upserted(changed + new, removed)
+    features = engine.features
+    rows = np.array(
+        [features.row_by_user_id[user.user_id] for user in changed + new],
+        dtype=np.int64,
+    )
+
+    updated = index.inserted(features, rows)
+    rebuilt = LSHIndex.build(features, n_tables=8, n_bits=5, probes=2)
+
+    assert updated.has_stale_entries
+    np.testing.assert_array_equal(updated.keys, rebuilt.keys)
+    for user in changed + new + loaded[40:120]:
+        query = features.encode([user])
+        np.testing.assert_array_equal(
+            updated.candidates(query), rebuilt.candidates(query)
+        )
+        for found, expected in zip(
+            updated.top_k(engine, user, 7, MIN_SIMILARITY),
+            rebuilt.top_k(engine, user, 7, MIN_SIMILARITY),
+        ):
+            np.testing.assert_array_equal(found, expected)
+
+
+def test_recall_against_the_exact_top_k(users):
+    engine = SimilarityEngine(UserFeatureMatrix(users))
+    # The model's defaults: 16 tables, 3 probes, bits from the user count.
+    index = LSHIndex.build(engine.features)
+
+    # 0.80 on this dataset; recall grows with the number of users.
+    assert recall_at_k(engine, index, users[:300], 7, MIN_SIMILARITY) >= 0.75
@@ -0,0 +1,93 @@
+import time
+import threading
+from src.controllers.cache import LRUCacheWithTTL
+
+
+def test_returns_values_until_the_ttl_passes():
+    cache = LRUCacheWithTTL(ttl=0.05)
+    cache["u1"] = ["p1"]
+    assert cache["u1"] == ["p1"]
+    assert "u1" in cache
+
+    time.sleep(0.1)
+    assert cache.get("u1") is None
+    assert "u1" not in cache
+    assert cache.stats()["expirations"] == 1
+
+
+def test_writes_drop_expired_entries_nobody_reads():
+    cache = LRUCacheWithTTL(ttl=0.05)
+    cache["old"] = 1
+    time.sleep(0.1)
+    cache["new"] = 2
+
+    assert cache.keys() == ["new"]
+    assert cache.stats()["entries"] == 1
+
+
+def test_evicts_the_least_recently_used_entry():
+    cache = LRUCacheWithTTL(ttl=300, max_entries=2)
+    cache["a"] = 1
+    cache["b"] = 2
+    cache["a"]
+    cache["c"] = 3
+
+    assert cache.keys() == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_evicts_by_size_when_max_bytes_is_set():
+    cache = LRUCacheWithTTL(ttl=300, max_bytes=2_000)
+    cache["a"] = list(range(50))
+    cache["b"] = list(range(50))
+
+    assert cache.keys() == ["b"]
+    assert 0 < cache.stats()["bytes"] <= 2_000
+
+
+def test_bytes_is_none_without_byte_accounting():
+    cache = LRUCacheWithTTL(ttl=300)
+    cache["a"] = list(range(50))
+
+    assert cache.stats()["bytes"] is None
+
+
+def test_counts_hits_and_misses():
+    cache = LRUCacheWithTTL(ttl=300)
+    cache["a"] = 1
+    cache["a"]
+    cache["b"]
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_clear_drops_one_key_or_everything():
+    cache = LRUCacheWithTTL(ttl=300)
+    cache["a"] = cache["b"] = 1
+
+    cache.clear("a")
+    assert cache.keys() == ["b"]
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_stays_within_max_entries_under_concurrent_use():
+    cache = LRUCacheWithTTL(ttl=300, max_entries=100)
+
+    def worker(offset):
+        for i in range(2_000):
+            key = (offset * i) % 300
+            if cache.get(key) is None:
+                cache[key] = i
+            if i % 7 == 0:
+                del cache[key]
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(1, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(cache) <= 100
+    assert len(cache._expires) == len(cache._entries)
@@ -0,0 +1,137 @@
+import os
+import time
+import pytest
+from src.controllers import cache_backends
+from src.controllers.cache_backends import NetworkCache, SqliteCache, create_cache
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache" / "cache.db")
+
+
+def test_sqlite_cache_round_trips_values_as_json(cache_path):
+    cache = SqliteCache(cache_path, namespace="recommendation")
+    cache["u1"] = (5, [("u2", 0.5)], ["p1", "p2"], [1.0, 0.5])
+
+    assert cache["u1"] == [5, [["u2", 0.5]], ["p1", "p2"], [1.0, 0.5]]
+    row = cache._connection().execute("SELECT value FROM cache").fetchone()
+    assert row[0] == '[5, [["u2", 0.5]], ["p1", "p2"], [1.0, 0.5]]'
+    assert cache.get("missing") is None
+    assert cache.keys() == ["u1"]
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_sqlite_cache_creates_a_private_directory(cache_path):
+    SqliteCache(cache_path, namespace="recommendation")
+
+    assert os.stat(os.path.dirname(cache_path)).st_mode & 0o777 == 0o700
+
+
+def test_sqlite_cache_refuses_a_shared_directory(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+
+    with pytest.raises(PermissionError):
+        SqliteCache(str(shared / "cache.db"), namespace="recommendation")
+
+
+def test_sqlite_backend_requires_cache_path(monkeypatch, cache_path):
+    monkeypatch.setenv("CACHE_BACKEND", "sqlite")
+    monkeypatch.delenv("CACHE_PATH", raising=False)
+    with pytest.raises(ValueError):
+        create_cache("recommendation")
+
+    monkeypatch.setenv("CACHE_PATH", cache_path)
+    assert isinstance(create_cache("recommendation"), SqliteCache)
+
+
+def test_sqlite_cache_is_shared_by_instances_and_split_by_namespace(cache_path):
+    SqliteCache(cache_path, namespace="similarity")["u1"] = "neighbors"
+
+    assert SqliteCache(cache_path, namespace="similarity")["u1"] == "neighbors"
+    assert SqliteCache(cache_path, namespace="recommendation")["u1"] is None
+
+
+def test_sqlite_cache_entries_expire_after_ttl(cache_path):
+    cache = SqliteCache(cache_path, namespace="recommendation", ttl=0.05)
+    cache["u1"] = "page"
+    assert cache["u1"] == "page"
+
+    time.sleep(0.1)
+    assert cache["u1"] is None
+    assert cache.keys() == []
+
+
+def test_sqlite_cache_purges_expired_rows(cache_path):
+    cache = SqliteCache(cache_path, namespace="recommendation", ttl=0.05)
+    cache["old"] = 1
+    time.sleep(0.1)
+    cache._purge_expired()
+
+    rows = cache._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+    assert rows == 0
+
+
+def test_sqlite_cache_clear_drops_one_key_or_the_namespace(cache_path):
+    cache = SqliteCache(cache_path, namespace="recommendation")
+    other = SqliteCache(cache_path, namespace="similarity")
+    cache["u1"] = cache["u2"] = other["u1"] = 1
+
+    del cache["u1"]
+    assert cache.keys() == ["u2"]
+    cache.clear()
+    assert cache.keys() == []
+    assert other.keys() == ["u1"]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key.decode() if isinstance(key, bytes) else key, None)
+
+    def scan_iter(self, match):
+        return [key.encode() for key in self.values if key.startswith(match[:-1])]
+
+
+def test_network_cache_round_trips_json_through_the_client():
+    client = FakeRedis()
+    cache = NetworkCache(client, namespace="recommendation")
+    cache["u1"] = ["p1"]
+    NetworkCache(client, namespace="similarity")["u1"] = ["u2"]
+
+    assert cache["u1"] == ["p1"]
+    assert client.values["moody:recommendation:u1"] == '["p1"]'
+    assert cache.keys() == ["u1"]
+    cache.clear()
+    assert cache["u1"] is None
+    assert list(client.values) == ["moody:similarity:u1"]
+
+
+def test_network_backend_builds_its_client_from_cache_url(monkeypatch):
+    clients = {}
+    monkeypatch.setattr(
+        cache_backends,
+        "network_client",
+        lambda url: clients.setdefault(url, FakeRedis()),
+    )
+    monkeypatch.setenv("CACHE_BACKEND", "network")
+    monkeypatch.setenv("CACHE_URL", "redis://cache:6379/0")
+
+    cache = create_cache("recommendation")
+    cache["u1"] = 1
+    assert "moody:recommendation:u1" in clients["redis://cache:6379/0"].values
+
+    monkeypatch.delenv("CACHE_URL")
+    with pytest.raises(ValueError):
+        create_cache("recommendation")
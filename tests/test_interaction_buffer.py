@@ -0,0 +1,132 @@
+import threading
+import pytest
+from src.types.basic_types import Interaction
+from src.controllers.interaction_buffer import InteractionBuffer
+from src.exceptions.httpExceptions import ServiceUnavailableException
+
+
+class FakeRepository:
+    def __init__(self, bad_users=(), failures=0):
+        self.bad_users = set(bad_users)
+        self.failures = failures
+        self.interaction_batches = []
+        self.like_batches = []
+
+    def interact_many(self, interactions):
+        interactions = list(interactions)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database unreachable")
+        if any(interaction.user_id in self.bad_users for interaction in interactions):
+            raise ValueError("foreign key violation")
+        self.interaction_batches.append(
+            {(i.user_id, i.place_id): i.interactions for i in interactions}
+        )
+
+    def like_many(self, likes):
+        self.like_batches.append(list(likes))
+
+
+def interaction(user_id, place_id, count=1):
+    return Interaction(user_id=user_id, place_id=place_id, interactions=count)
+
+
+def test_coalesces_interactions_and_likes_into_one_batch():
+    repository = FakeRepository()
+    flushed = []
+    buffer = InteractionBuffer(repository, flush_size=100, on_flush=flushed.append)
+
+    buffer.add_many([interaction("u1", "p1", 2), interaction("u1", "p1", 3)])
+    buffer.add(interaction("u2", "p1"))
+    buffer.add_like(place_id="p2", user_id="u1")
+    buffer.add_like(place_id="p2", user_id="u1")
+
+    assert buffer.flush()
+    assert repository.interaction_batches == [
+        {("u1", "p1"): 5, ("u2", "p1"): 1, ("u1", "p2"): 2}
+    ]
+    assert repository.like_batches == [[("p2", "u1"), ("p2", "u1")]]
+    assert flushed == repository.interaction_batches
+    assert buffer.pending == 0
+
+
+def test_transient_failure_keeps_the_batch_pending():
+    repository = FakeRepository(failures=1)
+    buffer = InteractionBuffer(repository, flush_size=100)
+    buffer.add(interaction("u1", "p1", 2))
+
+    assert not buffer.flush()
+    assert buffer.stats()["consecutive_failures"] == 1
+    buffer.add(interaction("u1", "p1", 1))
+
+    assert buffer.flush()
+    assert repository.interaction_batches == [{("u1", "p1"): 3}]
+    assert buffer.stats()["consecutive_failures"] == 0
+
+
+def test_rejected_rows_are_dropped_and_the_rest_written():
+    repository = FakeRepository(bad_users={"ghost"})
+    flushed, dropped = [], []
+    buffer = InteractionBuffer(
+        repository, flush_size=100, on_flush=flushed.append, on_drop=dropped.append
+    )
+    buffer.add_many(
+        [
+            interaction("u1", "p1"),
+            interaction("ghost", "p1", 4),
+            interaction("u2", "p2"),
+        ]
+    )
+
+    assert buffer.flush()
+    assert repository.interaction_batches == [{("u1", "p1"): 1}, {("u2", "p2"): 1}]
+    assert flushed == [{("u1", "p1"): 1, ("u2", "p2"): 1}]
+    assert dropped == [{("ghost", "p1"): 4}]
+    assert buffer.stats()["dropped"] == 4
+    assert buffer.pending == 0
+
+    # Later flushes are not blocked by the rejected row.
+    buffer.add(interaction("u1", "p1"))
+    assert buffer.flush()
+    assert repository.interaction_batches[-1] == {("u1", "p1"): 1}
+
+
+def test_full_buffer_rejects_adds():
+    buffer = InteractionBuffer(FakeRepository(), flush_size=100, max_pending=1)
+    buffer.add(interaction("u1", "p1"))
+    with pytest.raises(ServiceUnavailableException):
+        buffer.add(interaction("u2", "p1"))
+    assert buffer.stats()["rejected"] == 1
+
+
+def test_on_add_runs_outside_the_lock_and_before_the_flush():
+    release = threading.Event()
+    entered = threading.Event()
+    seen = []
+
+    def on_add(interactions):
+        if interactions[0].user_id == "slow":
+            entered.set()
+            release.wait(5)
+        seen.append(interactions[0].user_id)
+
+    repository = FakeRepository()
+    buffer = InteractionBuffer(repository, flush_size=100, on_add=on_add)
+    slow = threading.Thread(target=buffer.add, args=(interaction("slow", "p1"),))
+    slow.start()
+    assert entered.wait(5)
+
+    # Another add is not held up by the slow callback...
+    buffer.add(interaction("fast", "p1"))
+    assert seen == ["fast"]
+
+    # ...but a flush waits for it, so on_add sees everything it writes first.
+    flusher = threading.Thread(target=buffer.flush)
+    flusher.start()
+    flusher.join(0.2)
+    assert flusher.is_alive() and not repository.interaction_batches
+    release.set()
+    flusher.join(5)
+    slow.join(5)
+    assert seen == ["fast", "slow"]
+    assert repository.interaction_batches == [{("fast", "p1"): 1, ("slow", "p1"): 1}]
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+from local.benchmarks.synthetic import SyntheticConfig, build_repository
+from src.controllers.sqldb import SqliteController
+from src.models.hot_set import HotSet
+from src.models.custom_recommendation_model import CustomRecommendationModel
+
+
+@pytest.fixture(scope="module")
+def repository():
+    return build_repository(SyntheticConfig(n_users=300, n_tags=20, seed=5))
+
+
+@pytest.fixture(scope="module")
+def models(repository, tmp_path_factory):
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv(
+            "NEIGHBOR_INDEX_PATH",
+            str(tmp_path_factory.mktemp("index") / "neighbor_index.npz"),
+        )
+        eager = CustomRecommendationModel(repository)
+        eager.refresh_neighbor_index()
+        # Loads the index eager just saved.
+        lazy = CustomRecommendationModel(repository, load_mode="lazy")
+    return eager, lazy
+
+
+def test_lazy_pages_match_eager_pages_with_a_neighbor_index(repository, models):
+    eager, lazy = models
+    for user_id in repository.get_user_ids()[:60]:
+        for page in (0, 1, 3):
+            expected = eager.recommend(user_id, page=page)
+            found = lazy.recommend(user_id, page=page)
+
+            assert [place.place_id for place in found] == [
+                place.place_id for place in expected
+            ]
+            np.testing.assert_allclose(
+                [place.score for place in found],
+                [place.score for place in expected],
+                atol=1e-12,
+            )
+
+
+def test_hot_set_evicts_the_least_recently_active_user():
+    hot_set = HotSet(2)
+    assert hot_set.add("a", ["a", "x"]) == []
+    assert hot_set.add("b", ["b", "x", "y"]) == []
+    assert hot_set.touch("a")
+    assert not hot_set.touch("unknown")
+
+    # "b" is now the least recently active; "x" is still in a's neighborhood.
+    assert hot_set.add("c", ["c"]) == ["b", "y"]
+    assert "b" not in hot_set and "a" in hot_set and "c" in hot_set
+    assert hot_set.is_loaded("x") and not hot_set.is_loaded("y")
+    assert hot_set.loaded == 3
+
+    # A new neighborhood replaces the old one and releases what it dropped.
+    assert hot_set.add("a", ["a", "z"]) == ["x"]
+    assert hot_set.add("d", ["d", "a"]) == ["c"]
+    assert len(hot_set) == 2 and hot_set.loaded == 3
+
+
+def test_lazy_mode_reloads_an_evicted_user(repository, models, monkeypatch):
+    eager, _ = models
+    monkeypatch.setenv("NEIGHBOR_INDEX_PATH", eager.neighbor_index_path)
+    monkeypatch.setenv("LAZY_HOT_USERS", "2")
+    lazy = CustomRecommendationModel(repository, load_mode="lazy")
+    first, *others = repository.get_user_ids()[:4]
+
+    expected = lazy.recommend(first)
+    neighbors = [
+        neighbor_id
+        for neighbor_id, _ in eager.neighbor_index.lookup(first, eager.neighbor_index.k)
+    ]
+    for user_id in others:
+        lazy.recommend(user_id)
+    assert first not in lazy.hot_set
+    assert not all(map(lazy.hot_set.is_loaded, [first, *neighbors]))
+
+    lazy.clear_cache(first)
+    found = lazy.recommend(first)
+
+    assert first in lazy.hot_set
+    assert all(map(lazy.hot_set.is_loaded, [first, *neighbors]))
+    assert [(place.place_id, place.score) for place in found] == [
+        (place.place_id, place.score) for place in expected
+    ]
+    assert [place.place_id for place in found] == [
+        place.place_id for place in eager.recommend(first)
+    ]
+
+
+def test_popularity_does_not_depend_on_the_loaded_users(models):
+    eager, lazy = models
+    assert [place.place_id for place in lazy.popularity.places] == [
+        place.place_id for place in eager.popularity.places
+    ]
+    assert lazy.popularity.by_tag.keys() == eager.popularity.by_tag.keys()
+    for tag, ranks in eager.popularity.by_tag.items():
+        np.testing.assert_array_equal(lazy.popularity.by_tag[tag], ranks)
+
+
+def test_lazy_mode_loads_neighborhoods_from_sqlite(repository, tmp_path, monkeypatch):
+    monkeypatch.setenv("NEIGHBOR_INDEX_PATH", str(tmp_path / "neighbor_index.npz"))
+    sqlite = SqliteController(str(tmp_path / "users.db"))
+    sqlite.create_users(repository.get_users_by_ids(repository.get_user_ids()[:80]))
+    model = CustomRecommendationModel(sqlite, load_mode="lazy")
+
+    user_info = sqlite.get_user_by_id(repository.get_user_ids()[0])
+    shared = sqlite.get_users_sharing_places(
+        [metric.place_id for metric in user_info.metrics], limit=20
+    )
+    model.neighborhood_size = 20
+    model._load_neighborhood(user_info)
+
+    assert shared
+    assert set(model.user_store) == {user_info.user_id, *shared}
@@ -0,0 +1,62 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from src.models.metrics import Counter, Histogram, HTTP_REQUESTS
+from src.dependencies.metrics import record_request_metrics, register_route_prefix
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    histogram = Histogram("latency_seconds", "Latency", ("stage",), buckets=(1, 0.1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, stage="rank")
+
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{stage="rank",le="0.1"} 2',
+        'latency_seconds_bucket{stage="rank",le="1"} 3',
+        'latency_seconds_bucket{stage="rank",le="+Inf"} 4',
+        'latency_seconds_sum{stage="rank"} 3.65',
+        'latency_seconds_count{stage="rank"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter("requests_total", "Requests", ("route",))
+    counter.inc(route='/a"b\\c')
+
+    assert counter.render()[-1] == 'requests_total{route="/a\\"b\\\\c"} 1'
+
+
+def test_route_label_includes_the_router_prefix():
+    users = APIRouter()
+    places = APIRouter()
+
+    @users.get("/create/{name}")
+    def create_user(name: str):
+        return name
+
+    @places.get("/create/{name}")
+    def create_place(name: str):
+        return name
+
+    app = FastAPI()
+    app.middleware("http")(record_request_metrics)
+    for router, prefix in ((users, "/user"), (places, "/place")):
+        app.include_router(router, prefix=prefix)
+        register_route_prefix(router, prefix)
+
+    with TestClient(app) as client:
+        client.get("/user/create/ana")
+        client.get("/place/create/bar")
+        client.get("/missing")
+
+    lines = HTTP_REQUESTS.render()
+    assert (
+        'http_requests_total{method="GET",route="/user/create/{name}",status="200"} 1'
+        in lines
+    )
+    assert (
+        'http_requests_total{method="GET",route="/place/create/{name}",status="200"} 1'
+        in lines
+    )
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"} 1' in lines
@@ -0,0 +1,110 @@
+from collections import defaultdict
+import numpy as np
+import pytest
+from local.benchmarks.synthetic import SyntheticConfig, build_repository
+from src.models.custom_recommendation_model import CustomRecommendationModel
+from src.types.basic_types import Interaction
+
+
+@pytest.fixture(scope="module")
+def repository():
+    return build_repository(SyntheticConfig(n_users=300, n_tags=20, seed=3))
+
+
+@pytest.fixture
+def model(repository, tmp_path, monkeypatch):
+    monkeypatch.setenv("NEIGHBOR_INDEX_PATH", str(tmp_path / "neighbor_index.npz"))
+    return CustomRecommendationModel(repository)
+
+
+def loop_aggregate_recommendations(model, similar_users):
+    """The dict aggregation `rank_places` replaced, with the totals it sorted by."""
+    recommendations = defaultdict(int)
+    for user, similarity in similar_users:
+        for place, interactions in zip(
+            user.metric_place_codes.tolist(), user.metric_interactions.tolist()
+        ):
+            recommendations[place] += interactions
+
+    place_vocab = model.similarity_engine.features.place_vocab
+    if model._unflushed or model._flushed:
+        for user, similarity in similar_users:
+            recent = model._recent_interactions(user.user_id)
+            for place_id, interactions in recent.items():
+                recommendations[place_vocab.add(place_id)] += interactions
+
+    place_ids = place_vocab.by_code
+    ranked = sorted(recommendations, key=recommendations.get, reverse=True)
+    return [place_ids[place] for place in ranked], [
+        recommendations[place] for place in ranked
+    ]
+
+
+def loop_average_similarity(model, similar_users, place_id):
+    total_similarity = 0.0
+    total_weight = 0.0
+    place = model.similarity_engine.features.place_vocab.get(place_id)
+    if place is None:
+        return 0.0
+    for user, similarity in similar_users:
+        matches = np.flatnonzero(user.metric_place_codes == place)
+        if len(matches):
+            interaction_weight = int(user.metric_interactions[matches[-1]])
+            total_similarity += similarity * interaction_weight
+            total_weight += interaction_weight
+    if total_weight == 0:
+        return 0.0
+    return total_similarity / total_weight
+
+
+def assert_same_ranking(model, similar_users):
+    """Checks one ranking; returns how many places tie with the one before."""
+    place_ids, scores = model.rank_places(similar_users)
+    expected, totals = loop_aggregate_recommendations(model, similar_users)
+
+    assert place_ids == expected
+    np.testing.assert_allclose(
+        scores,
+        [
+            loop_average_similarity(model, similar_users, place_id)
+            for place_id in expected
+        ],
+        rtol=0,
+        atol=1e-12,
+    )
+    return sum(a == b for a, b in zip(totals, totals[1:]))
+
+
+def test_rank_places_matches_the_loop_aggregation(repository, model):
+    ties = 0
+    for user_id in repository.get_user_ids()[:60]:
+        user_info = repository.get_user_by_id(user_id)
+        for k in (1, 5, 20):
+            ties += assert_same_ranking(model, model.find_similar_users(user_info, k))
+
+    # Equal totals keep the order the dict first saw them in.
+    assert ties > 0
+
+
+def test_rank_places_counts_buffered_interactions_like_the_loops(repository, model):
+    user_info = repository.get_user_by_id(repository.get_user_ids()[0])
+    similar_users = model.find_similar_users(user_info, 10)
+    place_ids, totals = loop_aggregate_recommendations(model, similar_users)
+    neighbor_ids = [user.user_id for user, _ in similar_users]
+
+    model.record_interactions(
+        [
+            # Ties the last place with the second, and adds a place no user
+            # has a metric for yet.
+            Interaction(
+                user_id=neighbor_ids[0],
+                place_id=place_ids[-1],
+                interactions=totals[1] - totals[-1],
+            ),
+            Interaction(user_id=neighbor_ids[1], place_id="new-place", interactions=3),
+            Interaction(user_id=neighbor_ids[2], place_id="new-place", interactions=1),
+        ]
+    )
+    model.interactions_flushed({(neighbor_ids[3], place_ids[2]): 1})
+
+    assert assert_same_ranking(model, similar_users) > 0
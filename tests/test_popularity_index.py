@@ -0,0 +1,117 @@
+import random
+import pytest
+from local.benchmarks.synthetic import SyntheticConfig, build_repository
+from src.models.custom_recommendation_model import CustomRecommendationModel
+from src.models.popularity_index import PopularityIndex
+from src.types.basic_types import Interaction, Place
+
+
+@pytest.fixture
+def repository(tmp_path, monkeypatch):
+    monkeypatch.setenv("NEIGHBOR_INDEX_PATH", str(tmp_path / "neighbor_index.npz"))
+    return build_repository(SyntheticConfig(n_users=150, n_tags=12, seed=9))
+
+
+def expected_top(repository, start, limit, tags=(), exclude=()):
+    """The popularity order without `exclude`, places tagged with `tags` first."""
+    ranked = sorted(
+        repository.get_all_places(),
+        key=lambda place: (place.rating is None, -(place.rating or 0), -place.likes),
+    )
+    tagged = {
+        place_id for tag, place_id in repository.get_metric_place_tags() if tag in tags
+    }
+    ranked = [place for place in ranked if place.place_id not in exclude]
+    ranked = [place for place in ranked if place.place_id in tagged] + [
+        place for place in ranked if place.place_id not in tagged
+    ]
+    return [place.place_id for place in ranked[start : start + limit]]
+
+
+def place_ids(places):
+    return [place.place_id for place in places]
+
+
+def tagged(popularity, tag):
+    return {popularity.places[rank].place_id for rank in popularity.by_tag.get(tag, ())}
+
+
+def test_top_pages_each_tags_places_in_rank_order_first(repository):
+    index = PopularityIndex.build(
+        repository.get_all_places(), repository.get_metric_place_tags()
+    )
+    tags = sorted(index.by_tag)
+    # Pages inside the tagged places, across the boundary and past it.
+    for chosen in ([tags[0]], [tags[-1]], tags[:3]):
+        tagged = len(set().union(*(index.by_tag[tag].tolist() for tag in chosen)))
+        for start in (0, 7, tagged - 3, tagged + 5):
+            assert place_ids(index.top(start, 10, chosen)) == expected_top(
+                repository, start, 10, chosen
+            )
+
+    assert place_ids(index.top(0, 10, ["unknown-tag"])) == expected_top(
+        repository, 0, 10
+    )
+
+
+def test_top_skips_excluded_places(repository):
+    index = PopularityIndex.build(
+        repository.get_all_places(), repository.get_metric_place_tags()
+    )
+    tags = sorted(index.by_tag)[:2]
+    rng = random.Random(4)
+    all_place_ids = [place.place_id for place in index.places]
+    for _ in range(20):
+        exclude = set(rng.sample(all_place_ids[:60], 15))
+        exclude.add("not-a-place")
+        for chosen in ((), tags):
+            for start in (0, 12, 40):
+                found = place_ids(index.top(start, 10, chosen, exclude=exclude))
+
+                assert found == expected_top(repository, start, 10, chosen, exclude)
+                assert not exclude.intersection(found)
+
+
+def test_fill_skips_places_the_user_already_knows(repository):
+    model = CustomRecommendationModel(repository)
+    for user_id in repository.get_user_ids()[:30]:
+        user_info = repository.get_user_by_id(user_id)
+        known = {metric.place_id for metric in user_info.metrics}
+        known.update(place.place_id for place in user_info.favorite_places or [])
+
+        filled = place_ids(model._popular_places(0, 40, user_info))
+
+        assert len(filled) == 40
+        assert not known.intersection(filled)
+
+
+def test_refresh_popularity_picks_up_changed_places_and_tags(repository):
+    model = CustomRecommendationModel(repository)
+    last = model.popularity.places[-1]
+    repository.update_place(
+        last.place_id, last.model_copy(update={"rating": 5.0, "likes": 10**6})
+    )
+    repository.create_place(Place(place_id="new-place", slug="new", likes=0))
+    user_id = repository.get_user_ids()[0]
+    # A place no metric carries its first tag for yet: the interaction adds one.
+    metric_place_tags = set(repository.get_metric_place_tags())
+    place_id, tag = next(
+        (place.place_id, repository.get_place_tags(place.place_id)[0])
+        for place in model.popularity.places
+        if repository.get_place_tags(place.place_id)
+        and (repository.get_place_tags(place.place_id)[0], place.place_id)
+        not in metric_place_tags
+    )
+    repository.interact(Interaction(user_id=user_id, place_id=place_id, interactions=1))
+
+    # The index is a snapshot until it is rebuilt.
+    assert model.popularity.places[0].place_id != last.place_id
+    assert place_id not in tagged(model.popularity, tag)
+    model.refresh_popularity()
+
+    assert model.popularity.places[0].place_id == last.place_id
+    assert model.popularity.places[-1].place_id == "new-place"
+    assert place_ids(model.popularity.top(0, 1000, [tag])) == expected_top(
+        repository, 0, 1000, [tag]
+    )
+    assert place_id in tagged(model.popularity, tag)
@@ -0,0 +1,55 @@
+import asyncio
+import numpy as np
+import pytest
+from local.benchmarks.synthetic import SyntheticConfig, build_repository
+from src.controllers.memorydb import AsyncMemoryController
+from src.models.custom_recommendation_model import CustomRecommendationModel
+
+
+@pytest.fixture
+def repository(tmp_path, monkeypatch):
+    monkeypatch.setenv("NEIGHBOR_INDEX_PATH", str(tmp_path / "neighbor_index.npz"))
+    return build_repository(SyntheticConfig(n_users=200, n_tags=15, seed=11))
+
+
+def test_recommend_async_serves_the_same_pages_as_recommend(repository):
+    model = CustomRecommendationModel(repository)
+    async_repository = AsyncMemoryController(repository)
+
+    async def recommend_async(user_id, page):
+        return await model.recommend_async(user_id, async_repository, page=page)
+
+    # Late pages run short of neighbor recommendations and are filled.
+    for user_id in repository.get_user_ids()[:20]:
+        for page in (0, 11, 20):
+            expected = model.recommend(user_id, page=page)
+            model.clear_cache(user_id)
+            found = asyncio.run(recommend_async(user_id, page))
+
+            assert [(place.place_id, place.score) for place in found] == [
+                (place.place_id, place.score) for place in expected
+            ]
+
+
+def test_batch_rankings_outlive_the_request_cache(repository, monkeypatch):
+    monkeypatch.setenv("CACHE_MAX_ENTRIES", "10")
+    model = CustomRecommendationModel(repository)
+    user_ids = repository.get_user_ids()
+    expected = {
+        user_id: model._rank(repository.get_user_by_id(user_id), 5)
+        for user_id in user_ids
+    }
+    model.clear_cache()
+
+    model.recommend_all_users(workers=2).join()
+    assert model.batch_recommendations.stats()["entries"] == len(user_ids)
+
+    hits = model.cache_hits
+    for user_id in user_ids:
+        ranking, scores = model._rank(repository.get_user_by_id(user_id), 5)
+        assert ranking == expected[user_id][0]
+        np.testing.assert_allclose(scores, expected[user_id][1], rtol=1e-6)
+    assert model.cache_hits - hits == len(user_ids)
+
+    model.invalidate_user(user_ids[0])
+    assert model.batch_recommendations.get(user_ids[0]) is None
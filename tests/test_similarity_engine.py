@@ -0,0 +1,172 @@
+import numpy as np
+import pytest
+from local.benchmarks.synthetic import SyntheticConfig, build_repository
+from src.models.custom_recommendation_model import CustomRecommendationModel
+from src.models.neighbor_index import NeighborIndex, select_top_k_rows
+from src.models.similarity_engine import (
+    SimilarityEngine,
+    UserFeatureMatrix,
+    select_top_k,
+)
+from src.types.basic_types import FavoritePlaces, Metrics
+
+MIN_SIMILARITY = 0.1
+
+
+@pytest.fixture(scope="module")
+def repository():
+    return build_repository(SyntheticConfig(n_users=120, n_tags=15, seed=7))
+
+
+@pytest.fixture(scope="module")
+def users(repository):
+    return repository.get_all_users()
+
+
+@pytest.fixture(scope="module")
+def model(repository, tmp_path_factory):
+    # calculate_similarity is the per-pair reference the engine vectorizes.
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv(
+            "NEIGHBOR_INDEX_PATH",
+            str(tmp_path_factory.mktemp("index") / "neighbor_index.npz"),
+        )
+        return CustomRecommendationModel(repository)
+
+
+def reference_top_k(model, user, users, k):
+    scored = [
+        (other.user_id, model.calculate_similarity(user, other))
+        for other in users
+        if other.user_id != user.user_id
+    ]
+    scored = [pair for pair in scored if pair[1] > MIN_SIMILARITY]
+    scored.sort(key=lambda pair: pair[1], reverse=True)
+    return scored[:k]
+
+
+def test_scores_match_calculate_similarity(model, users):
+    engine = SimilarityEngine(UserFeatureMatrix(users))
+    queries = users[:15]
+    scores = engine.score(engine.features.encode(queries))
+
+    expected = np.array(
+        [
+            [model.calculate_similarity(query, user) for user in users]
+            for query in queries
+        ]
+    )
+    np.testing.assert_allclose(scores, expected, rtol=0, atol=1e-12)
+
+
+def test_candidate_scores_match_full_scores(users):
+    engine = SimilarityEngine(UserFeatureMatrix(users))
+    query = engine.features.encode(users[:1])
+    rows = np.arange(0, len(users), 3)
+
+    np.testing.assert_array_equal(
+        engine.score_candidates(query, rows), engine.score(query)[0][rows]
+    )
+
+
+def test_top_k_matches_the_reference_ranking(model, users):
+    engine = SimilarityEngine(UserFeatureMatrix(users))
+    user_ids = engine.features.user_ids
+    for user in users[:20]:
+        rows, scores = engine.top_k(user, 5, MIN_SIMILARITY)
+        expected = reference_top_k(model, user, users, 5)
+
+        assert [user_ids[row] for row in rows] == [pair[0] for pair in expected]
+        np.testing.assert_allclose(scores, [pair[1] for pair in expected], atol=1e-12)
+
+
+def test_select_top_k_keeps_row_order_among_ties():
+    scores = np.array([0.5, 0.9, 0.05, 0.5, 0.9, 0.5])
+
+    rows, top = select_top_k(scores, 4, MIN_SIMILARITY)
+    assert rows.tolist() == [1, 4, 0, 3]
+    np.testing.assert_array_equal(top, [0.9, 0.9, 0.5, 0.5])
+
+    rows, _ = select_top_k(scores, 10, 0.6)
+    assert rows.tolist() == [1, 4]
+    assert select_top_k(scores, 0, MIN_SIMILARITY)[0].tolist() == []
+
+
+def test_select_top_k_rows_matches_select_top_k():
+    rng = np.random.default_rng(0)
+    # Few distinct values, so most rows have ties at the cut.
+    scores = rng.integers(0, 5, size=(30, 40)) / 4
+
+    neighbors, top = select_top_k_rows(scores, 6, MIN_SIMILARITY)
+    for row in range(len(scores)):
+        expected_rows, expected_scores = select_top_k(scores[row], 6, MIN_SIMILARITY)
+        found = neighbors[row] >= 0
+        assert neighbors[row][found].tolist() == expected_rows.tolist()
+        np.testing.assert_allclose(top[row][found], expected_scores, rtol=1e-6)
+
+
+def test_neighbor_index_survives_save_and_load(users, tmp_path):
+    engine = SimilarityEngine(UserFeatureMatrix(users))
+    index = NeighborIndex.build(engine, 5, MIN_SIMILARITY, chunk_size=16)
+    path = str(tmp_path / "nested" / "neighbor_index.npz")
+    index.save(path)
+
+    loaded = NeighborIndex.load(path)
+    assert loaded.user_ids == index.user_ids
+    assert loaded.min_similarity == pytest.approx(MIN_SIMILARITY)
+    np.testing.assert_array_equal(loaded.neighbors, index.neighbors)
+    np.testing.assert_array_equal(loaded.scores, index.scores)
+    assert loaded.lookup(users[0].user_id, 3) == index.lookup(users[0].user_id, 3)
+    assert loaded.lookup(users[0].user_id, 6) is None
+    assert NeighborIndex.load(str(tmp_path / "missing.npz")) is None
+
+
+def test_neighbor_index_matches_top_k(users):
+    engine = SimilarityEngine(UserFeatureMatrix(users))
+    index = NeighborIndex.build(engine, 5, MIN_SIMILARITY, chunk_size=7)
+    user_ids = engine.features.user_ids
+    for user in users[:20]:
+        rows, scores = engine.top_k(user, 5, MIN_SIMILARITY)
+        neighbors = index.lookup(user.user_id, 5)
+
+        assert [user_id for user_id, _ in neighbors] == [user_ids[r] for r in rows]
+        np.testing.assert_allclose([score for _, score in neighbors], scores, rtol=1e-6)
+
+
+def test_upserted_matrix_scores_like_a_fresh_build(users):
+    features = UserFeatureMatrix(users)
+    changed = users[3].model_copy(
+        update={
+            "age": users[3].age + 7,
+            "metrics": users[3].metrics[:1]
+            + [
+                Metrics(
+                    place_id="brand-new-place",
+                    user_id=users[3].user_id,
+                    interactions=2,
+                    interest="brand-new-tag",
+                )
+            ],
+            "favorite_places": [
+                FavoritePlaces(place_id="brand-new-place", user_id=users[3].user_id)
+            ],
+        }
+    )
+    added = users[5].model_copy(update={"user_id": "added-user"})
+    removed = users[8].user_id
+
+    upserted = features.upserted([changed, added], removed_user_ids=[removed])
+    current = [changed if user.user_id == changed.user_id else user for user in users]
+    current = [user for user in current if user.user_id != removed] + [added]
+    fresh = UserFeatureMatrix(current)
+
+    assert features.n_users == len(users)
+    assert features.active.all()
+    assert upserted.user_ids[-1] == "added-user"
+    assert not upserted.active[upserted.row_by_user_id[removed]]
+
+    queries = [changed, added, users[0]]
+    upserted_scores = SimilarityEngine(upserted).score(upserted.encode(queries))
+    fresh_scores = SimilarityEngine(fresh).score(fresh.encode(queries))
+    rows = [upserted.row_by_user_id[user.user_id] for user in current]
+    np.testing.assert_allclose(upserted_scores[:, rows], fresh_scores, atol=1e-12)
@@ -0,0 +1,80 @@
+import pytest
+from local.benchmarks.synthetic import SyntheticConfig, build_repository
+from src.models.custom_recommendation_model import CustomRecommendationModel
+from src.types.basic_types import Interaction
+
+
+@pytest.fixture
+def repository(tmp_path, monkeypatch):
+    monkeypatch.setenv("NEIGHBOR_INDEX_PATH", str(tmp_path / "neighbor_index.npz"))
+    return build_repository(SyntheticConfig(n_users=300, n_tags=20, seed=3))
+
+
+@pytest.mark.parametrize("load_mode", ["eager", "lazy"])
+def test_refresh_reads_writes_from_the_change_log(repository, load_mode):
+    model = CustomRecommendationModel(repository, load_mode=load_mode)
+    user_id = repository.get_user_ids()[0]
+    model.recommend(user_id)
+    assert model.refresh_users() == 0
+
+    place_id = repository.get_user_by_id(user_id).metrics[0].place_id
+    # Not through invalidate_user, as if another instance wrote it.
+    repository.interact(Interaction(user_id=user_id, place_id=place_id, interactions=3))
+    assert model.refresh_users() == 1
+    assert model.user_store[user_id].metrics[0].interactions == (
+        repository.get_user_by_id(user_id).metrics[0].interactions
+    )
+    assert model.refresh_users() == 0
+
+    repository.delete(user_id)
+    assert model.refresh_users() == 1
+    assert user_id not in model.user_store
+
+
+def test_refresh_only_reloads_loaded_users_in_lazy_mode(repository, monkeypatch):
+    model = CustomRecommendationModel(repository, load_mode="lazy")
+    user_id = repository.get_user_ids()[0]
+    place_id = repository.get_user_by_id(user_id).metrics[0].place_id
+    repository.interact(Interaction(user_id=user_id, place_id=place_id, interactions=3))
+
+    reloaded = []
+    get_users_by_ids = repository.get_users_by_ids
+    monkeypatch.setattr(
+        repository,
+        "get_users_by_ids",
+        lambda user_ids: reloaded.extend(user_ids) or get_users_by_ids(user_ids),
+    )
+    assert model.refresh_users() == 0
+    assert reloaded == []
+
+
+@pytest.mark.parametrize("load_mode", ["eager", "lazy"])
+def test_reconcile_picks_up_writes_the_change_log_missed(repository, load_mode):
+    model = CustomRecommendationModel(repository, load_mode=load_mode)
+    user_id = repository.get_user_ids()[0]
+    model.recommend(user_id)
+    assert model.reconcile_users() == 0
+
+    place_id = repository.get_user_by_id(user_id).metrics[0].place_id
+    repository.interact(Interaction(user_id=user_id, place_id=place_id, interactions=3))
+    # Past the change, as if it committed after a later one was read.
+    model._change_cursor = repository.last_user_change()
+    assert model.refresh_users() == 0
+    assert model.reconcile_users() == 1
+    assert model.user_store[user_id].metrics[0].interactions == (
+        repository.get_user_by_id(user_id).metrics[0].interactions
+    )
+
+    repository.delete(user_id)
+    assert model.reconcile_users() == 1
+    assert user_id not in model.user_store
+
+
+@pytest.mark.parametrize("catch_up", ["refresh_users", "reconcile_users"])
+def test_users_created_elsewhere_are_added_in_eager_mode(repository, catch_up):
+    model = CustomRecommendationModel(repository)
+    user = repository.get_user_by_id(repository.get_user_ids()[0])
+    repository.create_user(user.model_copy(update={"user_id": "created-elsewhere"}))
+
+    assert getattr(model, catch_up)() == 1
+    assert "created-elsewhere" in model.user_store